@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the DAV interpreters
+Run `python bench_dav.py <benchmark> --help` to see the options of each benchmark
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import interpreteur_anglais as dav_en
+
+
+def max_rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_sample_file(path, size_mb):
+    """Write a CSV-like file of roughly size_mb megabytes, chunk by chunk"""
+    row = "2024-01-01T00:00:00,sensor-042,17.25,OK\n"
+    chunk = row * 4096
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < target:
+            f.write(chunk)
+            written += len(chunk)
+    return written // len(row)
+
+
+def bench_file_lines(args):
+    """Stream a large file through `For each line in file` and report memory use"""
+    path = args.path
+    cleanup = False
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        cleanup = True
+        print(f"Generating {args.size_mb} MB sample file...")
+        write_sample_file(path, args.size_mb)
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    code = f'''
+I have a number called count.
+For each line in file "{path}":
+    Increase count by 1
+'''
+    try:
+        rss_before = max_rss_mb()
+        start = time.perf_counter()
+        dav_en.run_dav_code(code)
+        elapsed = time.perf_counter() - start
+        rss_after = max_rss_mb()
+    finally:
+        if cleanup:
+            os.remove(path)
+
+    lines = dav_en.variables.get('count', 0)
+    print(f"file size      : {size_mb:.1f} MB")
+    print(f"lines          : {lines}")
+    print(f"elapsed        : {elapsed:.2f} s ({lines / elapsed:,.0f} lines/s)")
+    print(f"peak RSS       : {rss_after:.1f} MB (growth during loop: {rss_after - rss_before:.1f} MB)")
+
+
+def bench_text_builder(args):
+    """Assemble reports of growing size with a text builder and with string concatenation"""
+    piece = "x" * 99
+    print(f"{'method':<14}{'size':>10}{'time':>10}{'s/MB':>10}")
+    for fraction in (4, 2, 1):
+        size_mb = args.size_mb / fraction
+        pieces = int(size_mb * 1024 * 1024 / (len(piece) + 1))
+        code = f'''
+I have a text builder called report.
+For j in range 1 to {pieces}:
+    Add the line "{piece}" to report.
+Build report into text.
+'''
+        start = time.perf_counter()
+        dav_en.run_dav_code(code)
+        elapsed = time.perf_counter() - start
+        size = len(dav_en.variables['text']) / (1024 * 1024)
+        print(f"{'builder':<14}{size:>8.1f}MB{elapsed:>9.2f}s{elapsed / size:>10.3f}")
+
+    # Quadratic baseline, kept small so that it finishes
+    pieces = int(args.concat_mb * 1024 * 1024 / len(piece))
+    code = f'''
+I have a text called text.
+For j in range 1 to {pieces}:
+    Set text to text plus "{piece}"
+'''
+    start = time.perf_counter()
+    dav_en.run_dav_code(code)
+    elapsed = time.perf_counter() - start
+    size = len(dav_en.variables['text']) / (1024 * 1024)
+    print(f"{'concatenation':<14}{size:>8.1f}MB{elapsed:>9.2f}s{elapsed / size:>10.3f}")
+
+
+def bench_parallel_for(args):
+    """Compare a CPU-bound for-each loop run serially and in parallel"""
+    if args.workers:
+        dav_en.parallel_worker_count = lambda: args.workers
+    setup = "\n".join(f"Add {k} to numbers." for k in range(args.items))
+    timings = {}
+    for mode in ("", " in parallel"):
+        code = f'''
+I have a list called numbers.
+I have a list called results.
+{setup}
+Create a function named work that takes n.
+    I have a number called total.
+    For j in range 1 to {args.work}:
+        Set total to total plus n.
+    I will return total.
+For each item in numbers{mode} collecting into results:
+    Add work(item) to results.
+'''
+        if not mode:
+            code = code.replace(" collecting into results", "")
+        start = time.perf_counter()
+        dav_en.run_dav_code(code)
+        timings[mode or " serially"] = (time.perf_counter() - start, list(dav_en.variables['results']))
+
+    (serial_time, serial_results), (parallel_time, parallel_results) = timings.values()
+    print(f"items          : {args.items} x {args.work} iterations")
+    print(f"workers        : {dav_en.parallel_worker_count()}")
+    print(f"serial         : {serial_time:.2f} s")
+    print(f"parallel       : {parallel_time:.2f} s (speedup {serial_time / parallel_time:.2f}x)")
+    print(f"same results   : {serial_results == parallel_results}")
+
+
+def bench_channel_pipeline(args):
+    """Time a producer/consumer pipeline over a bounded channel with a growing number of consumers"""
+    print(f"{'consumers':<10}{'time':>10}{'items/s':>12}")
+    for consumers in args.consumers:
+        starts = "\n".join("Start task consumer with 0." for _ in range(consumers))
+        code = f'''
+I have a channel called jobs with capacity {args.capacity}.
+I have a list called done.
+Create a function named consumer that takes n.
+    For each job in jobs:
+        Wait {args.delay} seconds.
+        Add job to done.
+Create a function named producer that takes n.
+    For i in range 1 to {args.items}:
+        Send i to jobs.
+    Close jobs.
+{starts}
+Start task producer with 0.
+Wait for all tasks.
+'''
+        start = time.perf_counter()
+        dav_en.run_dav_code(code)
+        elapsed = time.perf_counter() - start
+        assert len(dav_en.variables['done']) == args.items
+        print(f"{consumers:<10}{elapsed:>9.2f}s{args.items / elapsed:>12,.0f}")
+
+
+def bench_actors(args):
+    """Run many actors that take turns, and report context switches per second and memory per actor"""
+    code = f'''
+I have a number called count.
+Create a function named worker that takes n.
+    For {args.rounds} times:
+        Increase count by 1.
+        Yield.
+For k in range 1 to {args.actors}:
+    Start actor worker with k.
+Run the actors.
+'''
+    rss_before = max_rss_mb()
+    start = time.perf_counter()
+    dav_en.run_dav_code(code)
+    elapsed = time.perf_counter() - start
+    rss_after = max_rss_mb()
+
+    switches = dav_en.actor_scheduler.switches
+    print(f"actors         : {args.actors:,} x {args.rounds} rounds")
+    print(f"statements run : {dav_en.variables['count']:,}")
+    print(f"elapsed        : {elapsed:.2f} s ({switches / elapsed:,.0f} switches/s)")
+    print(f"peak RSS       : {rss_after:.1f} MB ({(rss_after - rss_before) * 1024 * 1024 / args.actors:,.0f} bytes/actor)")
+
+
+def bench_tracing(args):
+    """Run time of a program with no hooks, with hooks that listen to nothing, and with counting hooks"""
+    code = f'''
+I have a number called total.
+Create a function named square that takes a number n.
+    I will return n times n.
+For j in range 1 to {args.iterations}:
+    Increase total by square(j).
+'''
+
+    class CountingHooks(dav_en.Hooks):
+        def __init__(self):
+            self.statements = self.calls = 0
+
+        def on_statement(self, line_no, text):
+            self.statements += 1
+
+        def on_call(self, name, args):
+            self.calls += 1
+
+    counting = CountingHooks()
+    setups = (("no hooks", None), ("idle Hooks()", dav_en.Hooks()), ("counting hooks", counting))
+    baseline = None
+    print(f"{'hooks':<16}{'ms':>9}{'overhead':>10}")
+    for label, hooks in setups:
+        if hooks is not None:
+            dav_en.install_hooks(hooks)
+        best = float('inf')
+        try:
+            for _ in range(args.repeat):
+                dav_en.reset()
+                start = time.perf_counter()
+                dav_en.run_dav_code(code)
+                best = min(best, time.perf_counter() - start)
+        finally:
+            dav_en.remove_hooks()
+        baseline = baseline or best
+        print(f"{label:<16}{best * 1000:>9.1f}{(best / baseline - 1) * 100:>9.1f}%")
+    print(f"events per run: {counting.statements // args.repeat:,} statements, {counting.calls // args.repeat:,} calls")
+
+
+STARTUP_MODULES = ('interpreteur_anglais', 'interpreteur_francais', 'dav_batch')
+
+
+STATEMENT_CORPUS = {
+    'en': [
+        "I have a number called total.", "Create a list named items.", "Set total to total plus 1.",
+        "Put 42 in answer.", "Increase counter by 2.", "Decrease stock by amount.",
+        "Show total line.", "If total is greater than 10:", "Add 5 to items.", "Call greet with name.",
+    ],
+    'fr': [
+        "J'ai un nombre appelé total.", "J'ai une liste appelée éléments.", "Mets total à total plus 1.",
+        "Assigne 42 à réponse.", "Augmente compteur de 2.", "Diminue stock de quantité.",
+        "Affiche total.", "Si total est plus grand que 10:", "Ajoute 5 à éléments.", "Appelle salue avec nom.",
+    ],
+}
+
+
+def bench_statement_matching(args):
+    """Cost per statement of recognizing a statement and extracting its operands"""
+    import interpreteur_francais as dav_fr
+
+    print(f"{'language':<10}{'method':<18}{'ns/statement':>14}")
+    for language, module in (('en', dav_en), ('fr', dav_fr)):
+        corpus = STATEMENT_CORPUS[language] * (args.statements // len(STATEMENT_CORPUS[language]))
+        kind_patterns = list(module.STATEMENT_KIND_PATTERNS.values())
+        combined = module.STATEMENT_PATTERN
+
+        def per_kind():
+            # One search per statement kind, as each handler did on its own
+            for line in corpus:
+                lowered = line.lower()
+                for pattern in kind_patterns:
+                    match = pattern.search(lowered)
+                    if match:
+                        match.groups()
+                        break
+
+        def one_pass():
+            for line in corpus:
+                match = combined.match(line.lower())
+                if match:
+                    match.groups()
+
+        for name, method in (("per-kind search", per_kind), ("one pass", one_pass)):
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                method()
+                best = min(best, time.perf_counter() - start)
+            print(f"{language:<10}{name:<18}{best / len(corpus) * 1e9:>14.0f}")
+
+
+def bench_native_calls(args):
+    """Cost of calling a Python function from DAV: registered native against a built-in entry"""
+    import math
+
+    local_vars = {'x': 3.0}
+    routes = (
+        ("built-in entry", lambda: dav_en.builtin_functions.__setitem__('hyp', math.hypot)),
+        ("native function", lambda: dav_en.register_function('hyp', math.hypot, params=(float, float))),
+    )
+    print(f"{'route':<18}{'expression':<26}{'us/call':>10}")
+    for name, install in routes:
+        install()
+        for expr in ("hyp(x, 4)", "hyp(x, 4) plus hyp(1, 1)"):
+            try:
+                dav_en.eval_expr(expr, local_vars)
+            except Exception as e:
+                # The character-by-character call parser takes the whole line for one call
+                print(f"{name:<18}{expr:<26}{'fails':>10}   {type(e).__name__}: {e}")
+                continue
+            start = time.perf_counter()
+            for _ in range(args.calls):
+                dav_en.eval_expr(expr, local_vars)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<18}{expr:<26}{elapsed / args.calls * 1e6:>10.2f}   = {dav_en.eval_expr(expr, local_vars)}")
+        dav_en.builtin_functions.pop('hyp', None)
+        dav_en.unregister_function('hyp')
+
+
+def bench_snapshot(args):
+    """Boot from a prelude of helper functions and lookup tables: run it, or restore its snapshot"""
+    import shutil
+
+    directory = tempfile.mkdtemp(prefix='dav-snapshot-')
+    prelude = os.path.join(directory, 'prelude.dav')
+    with open(prelude, 'w', encoding='utf-8') as f:
+        f.write("I have a list called squares.\n")
+        f.write(f"For j in range 1 to {args.table}:\n    Add j times j to squares.\n")
+        for k in range(args.functions):
+            f.write(f"Create a function named helper{k} that takes a number n.\n"
+                    f"    If n is greater than {k}:\n        I will return n times {k}.\n"
+                    f"    Otherwise:\n        I will return n plus {k}.\n")
+    snapshot = os.path.join(directory, 'prelude.snapshot')
+    dav_en.MODULE_CACHE_DIR = os.path.join(directory, 'cache')
+
+    print(f"prelude: {args.functions} functions, a {args.table}-entry table")
+    for label, prepare in (("run the prelude", lambda: os.path.exists(snapshot) and os.remove(snapshot)),
+                           ("from snapshot", lambda: None)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            prepare()
+            dav_en.reset()
+            dav_en.compiled_modules.clear()
+            dav_en.expression_cache.clear()
+            start = time.perf_counter()
+            used = dav_en.boot_prelude(prelude, snapshot)
+            best = min(best, time.perf_counter() - start)
+        print(f"{label:<18}{best * 1000:>8.1f} ms   snapshot used: {used}")
+        # Leave a fresh snapshot for the next measurement
+        dav_en.reset()
+        dav_en.boot_prelude(prelude, snapshot)
+    print(f"snapshot size: {os.path.getsize(snapshot) / 1024:.0f} KB, "
+          f"{len(dav_en.variables['squares'])} table entries and {len(dav_en.functions)} functions restored")
+    shutil.rmtree(directory)
+
+
+def import_times(module, env, runs):
+    """Import a module in fresh interpreters with -X importtime.
+
+    Returns the median cumulative import time of the module in ms, and the
+    self time in ms of everything it imported during the last run.
+    """
+    import statistics
+    import subprocess
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                                cwd=here, env=env, capture_output=True, text=True, check=True)
+        self_times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split('|')
+            self_times[name.strip()] = int(self_us) / 1000
+            if name.strip() == module:
+                samples.append(int(cumulative_us) / 1000)
+    return statistics.median(samples), self_times
+
+
+def bench_startup(args):
+    """Measure interpreter startup with -X importtime and fail when it goes over budget"""
+    import statistics
+    import subprocess
+
+    # Measure what users get: bytecode cached, in a private cache so the tree stays clean
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPYCACHEPREFIX'] = tempfile.mkdtemp(prefix='dav-pycache-')
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    over_budget = []
+    print(f"{'module':<24}{'import':>10}   heaviest imports (self time)")
+    for module in STARTUP_MODULES:
+        import_times(module, env, 1)  # fill the bytecode cache
+        median, self_times = import_times(module, env, args.runs)
+        heaviest = sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:4]
+        print(f"{module:<24}{median:>8.1f}ms   " + ", ".join(f"{name} {ms:.1f}" for name, ms in heaviest))
+        if module.startswith('interpreteur') and median > args.budget_ms:
+            over_budget.append(f"{module} imports in {median:.1f} ms, budget {args.budget_ms:.1f} ms")
+
+    fd, program = tempfile.mkstemp(suffix='.dav')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write("I have a number called x.\nSet x to 2 plus 3.\nShow x line.\n")
+    try:
+        for label, command in (("python -c pass", [sys.executable, '-c', 'pass']),
+                               ("dav.py hello", [sys.executable, os.path.join(here, 'dav.py'), program])):
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{label:<24}{statistics.median(timings):>8.1f}ms   wall time of a whole run")
+    finally:
+        os.remove(program)
+
+    for message in over_budget:
+        print(f"FAIL: {message}")
+    return 1 if over_budget else 0
+
+
+def generate_program(statements):
+    """Generate an English DAV program with roughly the given number of statement lines"""
+    template = [
+        "Set x{n} to x{n} plus {k}.",
+        "Show x{n} line.",
+        "If x{n} is greater than {k}:",
+        "    Show \"big\" line.",
+        "Otherwise:",
+        "    Show \"small\" line.",
+        "For j in range 1 to {k}:",
+        "    Increase x{n} by 1.",
+        "Create a function named f{n} that takes a and b.",
+        "    I will return a plus b times {k}.",
+    ]
+    lines = []
+    i = 0
+    while len(lines) < statements:
+        n, k = i % 100, i % 7
+        lines.extend(line.format(n=n, k=k) for line in template)
+        i += 1
+    return lines[:statements]
+
+
+def bench_parse_memory(args):
+    """Measure the memory held by the parse tree of a large generated program"""
+    import tracemalloc
+
+    lines = generate_program(args.statements)
+    source_mb = sum(len(line) + 1 for line in lines) / (1024 * 1024)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    blocks = dav_en.parse_logical_blocks(lines)
+    elapsed = time.perf_counter() - start
+    tree_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"statements     : {len(lines):,}")
+    print(f"top-level nodes: {len(blocks):,}")
+    print(f"source size    : {source_mb:.1f} MB")
+    print(f"parse time     : {elapsed:.2f} s")
+    print(f"parse tree     : {tree_bytes / (1024 * 1024):.1f} MB ({tree_bytes / len(lines):.0f} bytes/statement)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DAV interpreter benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    file_lines = subparsers.add_parser('file-lines', help="streaming `For each line in file` loop")
+    file_lines.add_argument('--size-mb', type=int, default=64, help="size of the generated input file")
+    file_lines.add_argument('--path', help="use an existing file instead of generating one")
+    file_lines.set_defaults(func=bench_file_lines)
+
+    text_builder = subparsers.add_parser('text-builder', help="linear-time text assembly")
+    text_builder.add_argument('--size-mb', type=float, default=100, help="size of the largest report")
+    text_builder.add_argument('--concat-mb', type=float, default=2, help="size of the concatenation baseline")
+    text_builder.set_defaults(func=bench_text_builder)
+
+    parse_memory = subparsers.add_parser('parse-memory', help="memory footprint of the parse tree")
+    parse_memory.add_argument('--statements', type=int, default=1_000_000, help="number of generated statements")
+    parse_memory.set_defaults(func=bench_parse_memory)
+
+    parallel_for = subparsers.add_parser('parallel-for', help="parallel for-each loop against a serial one")
+    parallel_for.add_argument('--items', type=int, default=64, help="number of list items")
+    parallel_for.add_argument('--work', type=int, default=5000, help="loop iterations per item")
+    parallel_for.add_argument('--workers', type=int, help="override the detected number of cores")
+    parallel_for.set_defaults(func=bench_parallel_for)
+
+    channel_pipeline = subparsers.add_parser('channel-pipeline', help="producer/consumer tasks over a channel")
+    channel_pipeline.add_argument('--items', type=int, default=200, help="number of values sent")
+    channel_pipeline.add_argument('--delay', type=float, default=0.01, help="simulated I/O wait per value, in seconds")
+    channel_pipeline.add_argument('--capacity', type=int, default=8, help="channel capacity")
+    channel_pipeline.add_argument('--consumers', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="consumer counts to try")
+    channel_pipeline.set_defaults(func=bench_channel_pipeline)
+
+    actors = subparsers.add_parser('actors', help="cooperative actors taking turns")
+    actors.add_argument('--actors', type=int, default=100_000, help="number of concurrent actors")
+    actors.add_argument('--rounds', type=int, default=5, help="yields per actor")
+    actors.set_defaults(func=bench_actors)
+
+    statements = subparsers.add_parser('statements', help="statement recognition cost over a statement corpus")
+    statements.add_argument('--statements', type=int, default=100000, help="statements matched per run")
+    statements.add_argument('--repeat', type=int, default=5, help="runs, the fastest one is reported")
+    statements.set_defaults(func=bench_statement_matching)
+
+    native = subparsers.add_parser('native', help="calls to Python functions from DAV expressions")
+    native.add_argument('--calls', type=int, default=200000, help="calls per measurement")
+    native.set_defaults(func=bench_native_calls)
+
+    snapshot = subparsers.add_parser('snapshot', help="boot from a prelude against its saved snapshot")
+    snapshot.add_argument('--functions', type=int, default=50, help="helper functions in the prelude")
+    snapshot.add_argument('--table', type=int, default=5000, help="entries of the prelude's lookup table")
+    snapshot.add_argument('--repeat', type=int, default=3, help="runs, the fastest one is reported")
+    snapshot.set_defaults(func=bench_snapshot)
+
+    tracing = subparsers.add_parser('tracing', help="cost of the tracing hooks, idle and listening")
+    tracing.add_argument('--iterations', type=int, default=20000, help="loop iterations of the traced program")
+    tracing.add_argument('--repeat', type=int, default=5, help="runs, the fastest one is reported")
+    tracing.set_defaults(func=bench_tracing)
+
+    startup = subparsers.add_parser('startup', help="import time of the interpreters, checked against a budget")
+    startup.add_argument('--runs', type=int, default=15, help="fresh interpreters started per measurement")
+    startup.add_argument('--budget-ms', type=float, default=20.0,
+                         help="fail when an interpreter takes longer than this to import")
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Fast entry point for running one DAV program
+Usage: python dav.py [--stats[=json]] [--memory[=threshold]] [--warnings]
+       [--record|--replay session.json] [--prelude prelude.dav [--snapshot file]] program.dav
+
+Only the interpreter for the program's language is imported, and the modules
+a program may never use (math, random, importlib, argparse, ...) are left for
+the program to load. Any other arguments (--test, --batch, no file for the
+interactive mode) go to the French interpreter's command line.
+"""
+
+import sys
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args, options, session, stats_style, memory, warnings = argv, {}, {}, None, None, False
+    while len(args) > 1 and args[0].startswith('--'):
+        if args[0] == '--warnings':
+            warnings = True
+            args = args[1:]
+        elif args[0] in ('--stats', '--stats=table', '--stats=json'):
+            stats_style = args[0].partition('=')[2] or 'table'
+            args = args[1:]
+        elif args[0] == '--memory' or args[0].startswith('--memory='):
+            memory = args[0].partition('=')[2]
+            args = args[1:]
+        elif len(args) > 2 and args[0] in ('--prelude', '--snapshot'):
+            options[args[0][2:]] = args[1]
+            args = args[2:]
+        elif len(args) > 2 and args[0] in ('--record', '--replay'):
+            session[args[0][2:]] = args[1]
+            args = args[2:]
+        else:
+            break
+    if len(args) != 1 or args[0].startswith('-'):
+        import interpreteur_francais
+        sys.argv = [sys.argv[0]] + argv
+        interpreteur_francais.main()
+        return 0
+
+    from dav_batch import detect_language, interpreter_for
+
+    path = args[0]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            language = detect_language(f.read())
+    except (OSError, UnicodeDecodeError):
+        # Let the interpreter report the problem in its own words
+        language = 'fr'
+    interpreter = interpreter_for(language)
+    # The French interpreter keeps its settings on its DAVInterpreter
+    getattr(interpreter, 'dav', interpreter).show_warnings = warnings
+    stats = interpreter.enable_stats() if stats_style else None
+    if memory is not None:
+        import dav_memory
+        inspector = dav_memory.MemoryInspector(interpreter, memory or None).start()
+    if session:
+        import dav_replay
+        session = dav_replay.start_session(interpreter, program=path, **session)
+    try:
+        interpreter.run_dav(path, **options)
+    finally:
+        if session:
+            dav_replay.stop_session(session)
+    if memory is not None:
+        inspector.stop()
+        print(inspector.format(), file=sys.stderr)
+    if stats is not None:
+        interpreter.disable_stats()
+        print(stats.format(stats_style), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Run many .dav files in parallel worker processes
+Usage: python dav_batch.py --batch <dir-or-glob> [--jobs N] [--report report.json]
+The language of each file (English or French) is detected from its statements.
+"""
+
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Statement openings that only one of the two languages uses
+FRENCH_MARKERS = re.compile(
+    r"^\s*(?:j'ai |affiche|montre|créer |crée |mets |définis |assigne |ajoute |enlève |si |sinon|"
+    r"tant que |pour |je (?:vais )?retourne|retourne |augmente |diminue |appelle |demande |importe |lis |écris )",
+    re.IGNORECASE)
+ENGLISH_MARKERS = re.compile(
+    r"^\s*(?:i have |show |display |print |create |set |put |assign |add |remove |if |otherwise|else|"
+    r"while |for |i will return|return |increase |decrease |call |ask |import |read |write )",
+    re.IGNORECASE)
+
+def detect_language(source):
+    """Return 'en' or 'fr' depending on which language most statements are written in"""
+    french = english = 0
+    for line in source.splitlines():
+        if FRENCH_MARKERS.match(line):
+            french += 1
+        elif ENGLISH_MARKERS.match(line):
+            english += 1
+    return 'en' if english > french else 'fr'
+
+
+def interpreter_for(language):
+    """The interpreter module for a language code, imported on first use"""
+    if language == 'en':
+        import interpreteur_anglais
+        return interpreteur_anglais
+    import interpreteur_francais
+    return interpreteur_francais
+
+
+LIMIT_NAMES = ('max_steps', 'max_evals', 'max_depth', 'timeout')
+
+
+def run_source(source, language, stdout, stderr, limits=None, inputs=None):
+    """Run DAV source in this process, writing what it prints to the given streams.
+
+    The interpreter state is reset first, standard input holds only the
+    given input values (one per line) so that programs asking the user
+    cannot hang, and errors that escape the interpreter are written to
+    stderr instead of being raised. limits holds ExecutionBudget arguments
+    (see LIMIT_NAMES). Returns the run time in seconds, the reason the
+    budget was exceeded if it was, and the number of errors the interpreter
+    reported to the program's user.
+    """
+    interpreter = interpreter_for(language)
+    state = getattr(interpreter, 'dav', interpreter)
+    errors = state.error_count
+    budget = interpreter.ExecutionBudget(**limits) if limits else None
+    old_stdin = sys.stdin
+    sys.stdin = io.StringIO("".join(f"{value}\n" for value in inputs or ()))
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                if language == 'en':
+                    interpreter.reset()
+                interpreter.run_dav_code(source, budget)
+            except BaseException as e:
+                print(f"{type(e).__name__}: {e}", file=sys.stderr)
+    finally:
+        sys.stdin = old_stdin
+    return time.perf_counter() - start, budget.exceeded if budget else None, state.error_count - errors
+
+
+def run_source_captured(source, language=None, limits=None):
+    """Run DAV source in this process and return its result record with the captured output"""
+    language = language or detect_language(source)
+    stdout, stderr = io.StringIO(), io.StringIO()
+    duration, exceeded, errors = run_source(source, language, stdout, stderr, limits)
+
+    stdout, stderr = stdout.getvalue(), stderr.getvalue()
+    failed = bool(stderr) or errors > 0
+    return {
+        'language': language,
+        'status': 'budget' if exceeded else 'error' if failed else 'ok',
+        'budget_exceeded': exceeded,
+        'duration': duration,
+        'stdout': stdout,
+        'stderr': stderr,
+    }
+
+
+def run_file_captured(path, limits=None):
+    """Run one .dav file and return its result record"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {'path': path, 'language': None, 'status': 'error', 'budget_exceeded': None, 'duration': 0.0,
+                'stdout': '', 'stderr': f"{type(e).__name__}: {e}"}
+    return {'path': path, **run_source_captured(source, limits=limits)}
+
+
+def expand_targets(targets):
+    """Turn directories, glob patterns and file paths into a sorted list of .dav files"""
+    import glob
+
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            paths.extend(glob.glob(os.path.join(target, '**', '*.dav'), recursive=True))
+        elif glob.has_magic(target):
+            paths.extend(glob.glob(target, recursive=True))
+        else:
+            paths.append(target)
+    return sorted(set(paths))
+
+
+def detach_stdin():
+    """Point file descriptor 0 at the null device, so nothing a program starts can read the terminal"""
+    fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(fd, 0)
+    os.close(fd)
+
+
+@contextlib.contextmanager
+def detached_stdin():
+    """detach_stdin() for the duration of a with block, then give the caller its stdin back"""
+    try:
+        saved = os.dup(0)
+    except OSError:
+        saved = None
+    detach_stdin()
+    try:
+        yield
+    finally:
+        if saved is not None:
+            os.dup2(saved, 0)
+            os.close(saved)
+
+
+def run_batch(paths, jobs=None, limits=None):
+    """Run files in a pool of worker processes and return their results in path order.
+
+    Programs never see the caller's stdin: their questions get no answer,
+    whether they come from the interpreter or from a command the program runs.
+    """
+    import concurrent.futures
+    import functools
+
+    run_file = functools.partial(run_file_captured, limits=limits)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) < 2:
+        with detached_stdin():
+            return [run_file(path) for path in paths]
+    # Small files run in a few milliseconds: hand them out in chunks to keep the pool busy
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=detach_stdin) as pool:
+        return list(pool.map(run_file, paths, chunksize=chunksize))
+
+
+def print_summary(results, wall_time, jobs):
+    """Print one row per file and the totals"""
+    width = max([len(result['path']) for result in results] + [4])
+    print(f"{'file':<{width}}  {'lang':<4}  {'status':<6}  {'time':>9}")
+    for result in results:
+        print(f"{result['path']:<{width}}  {result['language'] or '?':<4}  {result['status']:<6}  "
+              f"{result['duration'] * 1000:>7.1f}ms")
+
+    errors = sum(result['status'] != 'ok' for result in results)
+    busy = sum(result['duration'] for result in results)
+    stopped = sum(result['status'] == 'budget' for result in results)
+    print(f"\n{len(results)} files, {len(results) - errors} ok, {errors - stopped} with errors, "
+          f"{stopped} stopped by the budget")
+    print(f"wall time {wall_time:.2f}s with {jobs} jobs, {busy:.2f}s spent running programs")
+
+
+def add_limit_arguments(parser):
+    """Command-line options for the execution budget of every program"""
+    parser.add_argument('--max-steps', type=int, help="stop a program after this many statements")
+    parser.add_argument('--max-evals', type=int, help="stop a program after this many expression evaluations")
+    parser.add_argument('--max-depth', type=int, help="stop a program past this function call depth")
+    parser.add_argument('--timeout', type=float, help="stop a program after this many seconds")
+
+
+def limits_from_args(args):
+    """ExecutionBudget arguments given on the command line, or None"""
+    limits = {name: getattr(args, name) for name in LIMIT_NAMES if getattr(args, name, None) is not None}
+    return limits or None
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Run .dav files in parallel")
+    parser.add_argument('--batch', nargs='+', required=True, metavar='DIR_OR_GLOB',
+                        help="directories, glob patterns or .dav files to run")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument('--report', default='dav_batch_report.json', help="where to write the JSON report")
+    parser.add_argument('--show-output', action='store_true', help="print the output of every file")
+    add_limit_arguments(parser)
+    args = parser.parse_args(argv)
+
+    paths = expand_targets(args.batch)
+    if not paths:
+        print("No .dav files found.")
+        return 1
+
+    start = time.perf_counter()
+    results = run_batch(paths, args.jobs, limits_from_args(args))
+    wall_time = time.perf_counter() - start
+
+    if args.show_output:
+        for result in results:
+            print(f"=== {result['path']} ===")
+            print(result['stdout'] + result['stderr'], end='')
+        print()
+    print_summary(results, wall_time, args.jobs)
+
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump({'jobs': args.jobs, 'wall_time': wall_time, 'files': results}, f, ensure_ascii=False, indent=2)
+    print(f"report written to {args.report}")
+    return 1 if any(result['status'] != 'ok' for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
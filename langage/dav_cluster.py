@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+Distribute DAV jobs to worker agents on several machines
+Usage:
+    python dav_cluster.py coordinator [--host H] [--port P]            accept workers and jobs
+    python dav_cluster.py worker --connect H:P                         run jobs for a coordinator
+    python dav_cluster.py submit --connect H:P prog.dav [--input 5]    run files on the cluster
+    python dav_cluster.py local --workers 4 prog.dav ...               all of the above on localhost
+
+Jobs are DAV programs, which can import Python modules and run commands, so
+only holders of the cluster's shared token may connect: pass it with --token
+or DAV_CLUSTER_TOKEN. A coordinator started without one makes one up and
+prints it. The coordinator listens on 127.0.0.1 unless --host says otherwise.
+
+Coordinator, workers and clients exchange JSON objects, one per line, over TCP:
+    worker -> coordinator   {"type": "hello", "worker": "host-123", "token": "..."}
+    coordinator -> worker   {"type": "job", "id": 7, "source": "...", "inputs": [...], ...}
+    worker -> coordinator   {"type": "started", "id": 7}  {"type": "output", "id": 7, ...}
+                            {"type": "result", "id": 7, "record": {...}}
+    client -> coordinator   {"type": "submit", "token": "...", "jobs": [{"source": "...", "inputs": [...]}]}
+    coordinator -> client   {"type": "accepted", "ids": [...]}  then the output and result
+                            messages of its jobs as they arrive, then {"type": "done"}
+    coordinator -> either   {"type": "error", "message": "..."}  before hanging up on a wrong token
+                            or a malformed message
+
+Each worker holds a few jobs ahead of the one it runs (--prefetch). When the
+queue is empty and a worker goes idle, the coordinator steals a job that a
+busy worker has not started yet. The jobs of a worker that disconnects are
+queued again, up to --max-attempts runs per job; the client then receives the
+output of the new attempt after whatever the lost one had already printed.
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PORT = 7788
+DEFAULT_PREFETCH = 2
+DEFAULT_MAX_ATTEMPTS = 3
+TOKEN_VARIABLE = 'DAV_CLUSTER_TOKEN'
+
+
+class Link:
+    """A JSON-lines connection that several threads may write to"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.reader = conn.makefile('rb')
+
+    def send(self, message):
+        data = json.dumps(message, ensure_ascii=False).encode('utf-8') + b"\n"
+        with self.lock:
+            self.conn.sendall(data)
+
+    def __iter__(self):
+        for line in self.reader:
+            yield json.loads(line)
+
+    def close(self):
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def new_token():
+    import secrets
+    return secrets.token_urlsafe(24)
+
+
+def check_job_specs(specs):
+    """Raise TypeError unless specs is a list of jobs a worker can run"""
+    from dav_batch import LIMIT_NAMES
+
+    if not isinstance(specs, list):
+        raise TypeError("'jobs' must be a list")
+    for spec in specs:
+        if not isinstance(spec, dict) or not isinstance(spec.get('source'), str):
+            raise TypeError("every job must be an object with a 'source' text")
+        if spec.get('language') not in (None, 'en', 'fr'):
+            raise TypeError("a job's 'language' must be 'en' or 'fr'")
+        if not isinstance(spec.get('inputs') or [], list):
+            raise TypeError("a job's 'inputs' must be a list")
+        limits = spec.get('limits') or {}
+        if not isinstance(limits, dict) or not all(
+                name in LIMIT_NAMES and isinstance(value, (int, float, type(None))) for name, value in limits.items()):
+            raise TypeError(f"a job's 'limits' must map some of {', '.join(LIMIT_NAMES)} to numbers")
+
+
+def check_reply(message):
+    """Raise ConnectionRefusedError when the coordinator turned the connection down"""
+    if message.get('type') == 'error':
+        raise ConnectionRefusedError(message.get('message', "refused by the coordinator"))
+
+
+# ---------------------------
+# Coordinator
+# ---------------------------
+class Job:
+    __slots__ = ('id', 'spec', 'client', 'attempts', 'stealing')
+
+    def __init__(self, job_id, spec, client):
+        self.id = job_id
+        self.spec = spec
+        self.client = client
+        self.attempts = 0
+        self.stealing = False
+
+
+class WorkerState:
+    """What the coordinator knows about one connected worker"""
+    def __init__(self, link, name):
+        self.link = link
+        self.name = name
+        self.queued = []
+        self.running = None
+        self.done = 0
+
+
+class ClientState:
+    def __init__(self, link):
+        self.link = link
+        self.remaining = 0
+
+
+class Coordinator:
+    """Queue jobs from clients, hand them to workers and route the results back.
+
+    All scheduling state is guarded by one lock; each connection has its own
+    reader thread. Workers and clients must open with the shared token.
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, prefetch=DEFAULT_PREFETCH,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, token=None):
+        self.token = token or new_token()
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()[:2]
+        self.prefetch = prefetch
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.pending = collections.deque()
+        self.jobs = {}
+        self.workers = []
+        self.ids = itertools.count(1)
+        self.stolen = self.retried = 0
+        self.stopping = False
+
+    def start(self):
+        """Accept connections on a background thread"""
+        threading.Thread(target=self.serve_forever, name='dav-coordinator', daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        while not self.stopping:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self.handle_connection, args=(Link(conn),), daemon=True).start()
+
+    def stop(self):
+        """Tell the workers to exit and stop accepting connections"""
+        self.stopping = True
+        with self.lock:
+            workers = list(self.workers)
+        for worker in workers:
+            try:
+                worker.link.send({'type': 'stop'})
+            except OSError:
+                pass
+        self.server.close()
+
+    def handle_connection(self, link):
+        messages = iter(link)
+        try:
+            first = next(messages, None)
+            if first is None:
+                return
+            if not self.authorized(first):
+                link.send({'type': 'error', 'message': "missing or wrong cluster token"})
+                return
+            if first['type'] == 'hello':
+                self.serve_worker(link, first.get('worker', '?'), messages)
+            elif first['type'] == 'submit':
+                check_job_specs(first['jobs'])
+                self.serve_client(link, first['jobs'], messages)
+            else:
+                link.send({'type': 'error', 'message': f"unknown message type {first['type']!r}"})
+        except (KeyError, TypeError, AttributeError) as e:
+            # A message without the fields its type needs: say so instead of dropping the connection
+            try:
+                link.send({'type': 'error', 'message': f"malformed message: {type(e).__name__}: {e}"})
+            except OSError:
+                pass
+        except (OSError, ValueError):
+            pass
+        finally:
+            link.close()
+
+    def authorized(self, message):
+        import hmac
+        if not isinstance(message, dict):
+            return False
+        token = message.get('token')
+        return isinstance(token, str) and hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    # Workers
+    def serve_worker(self, link, name, messages):
+        worker = WorkerState(link, name)
+        with self.lock:
+            self.workers.append(worker)
+            self.dispatch()
+        try:
+            for message in messages:
+                with self.lock:
+                    self.on_worker_message(worker, message)
+        finally:
+            with self.lock:
+                self.workers.remove(worker)
+                self.requeue(worker)
+                self.dispatch()
+
+    def on_worker_message(self, worker, message):
+        kind = message['type']
+        job = self.jobs.get(message.get('id'))
+        if job is None:
+            return
+        if kind == 'started':
+            worker.queued.remove(job.id)
+            worker.running = job.id
+        elif kind == 'output':
+            self.notify(job.client, message)
+        elif kind == 'result':
+            worker.running = None
+            worker.done += 1
+            del self.jobs[job.id]
+            record = {**message['record'], 'worker': worker.name, 'attempts': job.attempts}
+            self.finish(job, record)
+            self.dispatch()
+        elif kind == 'stolen':
+            job.stealing = False
+            if message['ok']:
+                # The job did not run there: its next dispatch is not a new attempt
+                job.attempts -= 1
+                worker.queued.remove(job.id)
+                self.pending.appendleft(job)
+                self.stolen += 1
+                self.dispatch()
+
+    def requeue(self, worker):
+        """Queue again the jobs of a worker that went away"""
+        lost = worker.queued + ([worker.running] if worker.running is not None else [])
+        worker.queued, worker.running = [], None
+        for job_id in reversed(lost):
+            job = self.jobs[job_id]
+            job.stealing = False
+            if job.attempts >= self.max_attempts:
+                del self.jobs[job_id]
+                self.finish(job, {'status': 'lost', 'stdout': '', 'stderr': f"worker lost {job.attempts} times",
+                                  'duration': 0.0, 'worker': worker.name, 'attempts': job.attempts})
+            else:
+                self.retried += 1
+                self.pending.appendleft(job)
+
+    def dispatch(self):
+        """Fill the workers' queues from the pending jobs, stealing for idle workers when none are left"""
+        for worker in sorted(self.workers, key=lambda w: len(w.queued) + (w.running is not None)):
+            while self.pending and len(worker.queued) + (worker.running is not None) < self.prefetch:
+                job = self.pending.popleft()
+                job.attempts += 1
+                worker.queued.append(job.id)
+                try:
+                    worker.link.send({**job.spec, 'type': 'job', 'id': job.id})
+                except OSError:
+                    break
+
+        idle = [w for w in self.workers if not w.queued and w.running is None]
+        if self.pending or not idle:
+            return
+        for victim in sorted(self.workers, key=lambda w: len(w.queued), reverse=True)[:len(idle)]:
+            # Take the job the victim would run last, unless it is the only thing it has to do
+            candidates = [job_id for job_id in victim.queued if not self.jobs[job_id].stealing]
+            if not candidates or (victim.running is None and len(victim.queued) < 2):
+                continue
+            job = self.jobs[candidates[-1]]
+            job.stealing = True
+            try:
+                victim.link.send({'type': 'steal', 'id': job.id})
+            except OSError:
+                pass
+
+    # Clients
+    def serve_client(self, link, specs, messages):
+        client = ClientState(link)
+        with self.lock:
+            jobs = [Job(next(self.ids), spec, client) for spec in specs]
+            client.remaining = len(jobs)
+            link.send({'type': 'accepted', 'ids': [job.id for job in jobs]})
+            if not jobs:
+                link.send({'type': 'done'})
+            for job in jobs:
+                self.jobs[job.id] = job
+                self.pending.append(job)
+            self.dispatch()
+        # Keep the connection open until the client hangs up
+        for _ in messages:
+            pass
+
+    def finish(self, job, record):
+        self.notify(job.client, {'type': 'result', 'id': job.id, 'record': record})
+        job.client.remaining -= 1
+        if job.client.remaining == 0:
+            self.notify(job.client, {'type': 'done'})
+
+    def notify(self, client, message):
+        try:
+            client.link.send(message)
+        except OSError:
+            pass
+
+
+# ---------------------------
+# Worker agent
+# ---------------------------
+class StreamWriter:
+    """File-like object that sends what a job prints to the coordinator, line by line"""
+    def __init__(self, link, job_id, stream):
+        self.link = link
+        self.job_id = job_id
+        self.stream = stream
+        self.pending = []
+        self.written = False
+
+    def write(self, text):
+        if text:
+            self.written = True
+            self.pending.append(text)
+            if '\n' in text:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            self.link.send({'type': 'output', 'id': self.job_id, 'stream': self.stream, 'data': "".join(self.pending)})
+            self.pending = []
+
+
+def run_job(link, job):
+    """Run one job in this process, streaming its output, and send its result"""
+    from dav_batch import detect_language, run_source
+
+    source = job['source']
+    language = job.get('language') or detect_language(source)
+    stdout, stderr = StreamWriter(link, job['id'], 'stdout'), StreamWriter(link, job['id'], 'stderr')
+    duration, exceeded, errors = run_source(source, language, stdout, stderr, job.get('limits'), job.get('inputs'))
+    stdout.flush()
+    stderr.flush()
+    failed = stderr.written or errors > 0
+    link.send({'type': 'result', 'id': job['id'], 'record': {
+        'language': language, 'status': 'budget' if exceeded else 'error' if failed else 'ok',
+        'budget_exceeded': exceeded, 'duration': duration}})
+
+
+def run_worker(address, token, name=None):
+    """Connect to a coordinator and run the jobs it sends until it says stop"""
+    import dav_batch
+
+    # Load both interpreters before the first job
+    dav_batch.interpreter_for('en')
+    dav_batch.interpreter_for('fr')
+    # Jobs must not wait on this machine's terminal
+    dav_batch.detach_stdin()
+
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    conn = socket.create_connection(address)
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    link = Link(conn)
+    link.send({'type': 'hello', 'worker': name, 'token': token})
+
+    local = collections.deque()
+    ready = threading.Condition()
+    stopped = False
+
+    def read_messages():
+        nonlocal stopped
+        try:
+            for message in link:
+                with ready:
+                    if message['type'] == 'error':
+                        print(f"worker {name}: {message.get('message')}", file=sys.stderr)
+                        break
+                    if message['type'] == 'job':
+                        local.append(message)
+                    elif message['type'] == 'steal':
+                        # Give the job up only if it has not started: started jobs have left `local`
+                        job = next((job for job in local if job['id'] == message['id']), None)
+                        if job is not None:
+                            local.remove(job)
+                        link.send({'type': 'stolen', 'id': message['id'], 'ok': job is not None})
+                    elif message['type'] == 'stop':
+                        break
+                    ready.notify()
+        except (OSError, ValueError):
+            pass
+        with ready:
+            stopped = True
+            ready.notify()
+
+    threading.Thread(target=read_messages, name='dav-worker-reader', daemon=True).start()
+    try:
+        while True:
+            with ready:
+                while not local and not stopped:
+                    ready.wait()
+                if stopped:
+                    break
+                job = local.popleft()
+                link.send({'type': 'started', 'id': job['id']})
+            run_job(link, job)
+    except OSError:
+        pass
+    finally:
+        link.close()
+
+
+# ---------------------------
+# Client
+# ---------------------------
+def submit(address, specs, token, on_output=None):
+    """Send jobs to a coordinator and return their result records in submission order.
+
+    on_output(index, stream, data) is called as the jobs print. Raises
+    ConnectionRefusedError when the coordinator does not accept the token.
+    """
+    conn = socket.create_connection(address)
+    link = Link(conn)
+    link.send({'type': 'submit', 'token': token, 'jobs': specs})
+    results = {}
+    index_of = {}
+    try:
+        for message in link:
+            check_reply(message)
+            if message['type'] == 'accepted':
+                index_of = {job_id: index for index, job_id in enumerate(message['ids'])}
+            elif message['type'] == 'output' and on_output:
+                on_output(index_of[message['id']], message['stream'], message['data'])
+            elif message['type'] == 'result':
+                results[index_of[message['id']]] = message['record']
+            elif message['type'] == 'done':
+                break
+    finally:
+        link.close()
+    return [results.get(index, {'status': 'lost'}) for index in range(len(specs))]
+
+
+def job_specs(args):
+    """One job per file given on the command line"""
+    from dav_batch import limits_from_args
+
+    specs = []
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            specs.append({'source': f.read(), 'inputs': args.input or [], 'limits': limits_from_args(args)})
+    return specs
+
+
+def print_results(paths, results, wall_time):
+    width = max([len(path) for path in paths] + [4])
+    print(f"{'file':<{width}}  {'status':<6}  {'worker':<20}  {'tries':>5}  {'time':>9}")
+    for path, result in zip(paths, results):
+        print(f"{path:<{width}}  {result['status']:<6}  {result.get('worker', '?'):<20}  "
+              f"{result.get('attempts', 0):>5}  {result.get('duration', 0.0) * 1000:>7.1f}ms")
+    failed = sum(result['status'] != 'ok' for result in results)
+    print(f"\n{len(results)} jobs, {len(results) - failed} ok, {failed} failed, wall time {wall_time:.2f}s")
+
+
+def run_submit(args, address):
+    specs = job_specs(args)
+
+    def show(index, stream, data):
+        for line in data.splitlines():
+            print(f"[{args.files[index]}] {line}", file=sys.stderr if stream == 'stderr' else sys.stdout)
+
+    start = time.perf_counter()
+    try:
+        results = submit(address, specs, args.token, None if args.quiet else show)
+    except ConnectionRefusedError as e:
+        print(f"coordinator refused the jobs: {e}", file=sys.stderr)
+        return 1
+    print_results(args.files, results, time.perf_counter() - start)
+    return 1 if any(result['status'] != 'ok' for result in results) else 0
+
+
+def run_local(args):
+    """Start a coordinator and worker processes on localhost, run the files, and shut everything down"""
+    coordinator = Coordinator('127.0.0.1', 0, args.prefetch, args.max_attempts, args.token).start()
+    host, port = coordinator.address
+    args.token = coordinator.token
+    # The token goes through the environment, where other users cannot read it
+    env = {**os.environ, TOKEN_VARIABLE: coordinator.token}
+    workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), 'worker',
+                                 '--connect', f"{host}:{port}", '--name', f"local-{i}"], env=env)
+               for i in range(args.workers)]
+    if args.kill_after is not None:
+        # Exercise the retry path: kill the first worker while it holds jobs
+        threading.Timer(args.kill_after, workers[0].kill).start()
+    try:
+        status = run_submit(args, (host, port))
+        print(f"{coordinator.stolen} jobs stolen, {coordinator.retried} jobs retried")
+        return status
+    finally:
+        coordinator.stop()
+        for worker in workers:
+            try:
+                worker.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+
+def main(argv=None):
+    from dav_batch import add_limit_arguments
+
+    parser = argparse.ArgumentParser(description="Distribute DAV jobs to worker agents over TCP")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator', help="accept workers and jobs")
+    coordinator_parser.add_argument('--host', default='127.0.0.1',
+                                    help="address to listen on (0.0.0.0 for every interface)")
+    coordinator_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port to listen on")
+
+    worker_parser = subparsers.add_parser('worker', help="run jobs for a coordinator")
+    worker_parser.add_argument('--connect', required=True, metavar='HOST:PORT', help="coordinator address")
+    worker_parser.add_argument('--name', help="worker name shown in the results")
+
+    submit_parser = subparsers.add_parser('submit', help="run .dav files on the cluster")
+    submit_parser.add_argument('--connect', required=True, metavar='HOST:PORT', help="coordinator address")
+
+    local_parser = subparsers.add_parser('local', help="coordinator and workers on this machine")
+    local_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    local_parser.add_argument('--kill-after', type=float, metavar='SECONDS',
+                              help="kill one worker after this delay, to test retries")
+
+    for sub in (coordinator_parser, local_parser):
+        sub.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH, help="jobs queued on each worker")
+        sub.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                         help="runs of a job before it is given up when workers go away")
+    for sub in (submit_parser, local_parser):
+        sub.add_argument('files', nargs='+', help=".dav files to run, one job each")
+        sub.add_argument('--input', action='append', help="value given to the programs' questions (repeatable)")
+        sub.add_argument('--quiet', action='store_true', help="only print the summary")
+        add_limit_arguments(sub)
+    for sub in (coordinator_parser, worker_parser, submit_parser, local_parser):
+        sub.add_argument('--token', default=os.environ.get(TOKEN_VARIABLE),
+                         help=f"shared secret of the cluster (default: ${TOKEN_VARIABLE})")
+    args = parser.parse_args(argv)
+
+    if args.command == 'coordinator':
+        coordinator = Coordinator(args.host, args.port, args.prefetch, args.max_attempts, args.token)
+        print(f"DAV coordinator listening on {coordinator.address[0]}:{coordinator.address[1]}", flush=True)
+        if not args.token:
+            print(f"cluster token: {coordinator.token} (give it to workers and clients with --token or "
+                  f"{TOKEN_VARIABLE})", flush=True)
+        try:
+            coordinator.serve_forever()
+        except KeyboardInterrupt:
+            coordinator.stop()
+        return 0
+    if args.command in ('worker', 'submit') and not args.token:
+        parser.error(f"the cluster token is required: --token or {TOKEN_VARIABLE}")
+    if args.command == 'worker':
+        run_worker(parse_address(args.connect), args.token, args.name)
+        return 0
+    if args.command == 'submit':
+        return run_submit(args, parse_address(args.connect))
+    return run_local(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Warm interpreter pool for low-latency runs of small .dav programs
+Usage:
+    python dav_daemon.py serve [--workers N] [--max-jobs M]   start the pool
+    python dav_daemon.py run program.dav                      run a file through the pool
+    python dav_daemon.py run -c "Affiche 42."                 run source code through the pool
+    python dav_daemon.py stop                                 stop the pool
+
+The server imports both interpreters once, then forks workers that share one
+Unix socket. Requests and replies are JSON objects, one per line:
+    {"path": "/abs/program.dav", "cwd": "/abs"}  or  {"source": "...", "language": "fr"}
+    {"stream": "stdout", "data": "..."}  ...  {"done": true, "status": "ok", "duration": 0.001}
+Only the user who started the pool may connect to its socket, since programs
+can run commands. This client module only imports the standard library, so it
+starts quickly.
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+DEFAULT_SOCKET = os.environ.get('DAV_SOCKET', os.path.join(tempfile.gettempdir(), f"dav-{os.getuid()}.sock"))
+DEFAULT_MAX_JOBS = 1000
+
+WARM_UP_SOURCES = {
+    'en': "I have a number called x.\nSet x to 2 plus 3.\nShow x line.",
+    'fr': "J'ai un nombre appelé x.\nMets x à 2 plus 3.\nAffiche x.",
+}
+
+
+# ---------------------------
+# Server side
+# ---------------------------
+class SocketWriter:
+    """File-like object that streams what a program prints as JSON lines, one message per line of output"""
+    def __init__(self, conn, stream):
+        self.conn = conn
+        self.stream = stream
+        self.pending = []
+        self.written = False
+
+    def write(self, text):
+        if text:
+            self.written = True
+            self.pending.append(text)
+            if '\n' in text:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            send_message(self.conn, {'stream': self.stream, 'data': "".join(self.pending)})
+            self.pending = []
+
+
+def send_message(conn, message):
+    conn.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8') + b"\n")
+
+
+def handle_request(conn, request):
+    """Run one program for a client and stream its output back"""
+    from dav_batch import LIMIT_NAMES, detect_language, run_source
+
+    source = request.get('source')
+    if source is None:
+        with open(request['path'], 'r', encoding='utf-8') as f:
+            source = f.read()
+    language = request.get('language') or detect_language(source)
+
+    stdout, stderr = SocketWriter(conn, 'stdout'), SocketWriter(conn, 'stderr')
+    old_cwd = os.getcwd()
+    try:
+        if request.get('cwd'):
+            os.chdir(request['cwd'])
+        limits = {name: request[name] for name in LIMIT_NAMES if request.get(name) is not None}
+        duration, exceeded, errors = run_source(source, language, stdout, stderr, limits or None)
+    finally:
+        os.chdir(old_cwd)
+    stdout.flush()
+    stderr.flush()
+    status = 'budget' if exceeded else 'error' if stderr.written or errors else 'ok'
+    send_message(conn, {'done': True, 'status': status, 'budget_exceeded': exceeded,
+                        'language': language, 'duration': duration, 'worker': os.getpid()})
+
+
+def worker_loop(server, max_jobs):
+    """Accept and serve connections until max_jobs programs have run, then exit to be replaced"""
+    import random
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Forked workers inherit the parent's random state: give each its own sequence
+    random.seed()
+    for _ in range(max_jobs):
+        conn, _ = server.accept()
+        with conn:
+            try:
+                request = json.loads(conn.makefile('rb').readline() or b"{}")
+                if request.get('command') == 'stop':
+                    os.kill(os.getppid(), signal.SIGTERM)
+                    send_message(conn, {'done': True, 'status': 'stopped'})
+                    return
+                if request.get('command') == 'ping':
+                    send_message(conn, {'done': True, 'status': 'ok', 'worker': os.getpid()})
+                    continue
+                handle_request(conn, request)
+            except (OSError, ValueError, KeyError) as e:
+                try:
+                    send_message(conn, {'done': True, 'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+                except OSError:
+                    pass
+
+
+def remove_stale_socket(socket_path):
+    """Remove the socket a previous pool left behind; refuse anything this user does not own or that is no socket"""
+    import stat
+
+    try:
+        info = os.lstat(socket_path)
+    except FileNotFoundError:
+        return
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{socket_path} belongs to another user; pass another --socket")
+    if not stat.S_ISSOCK(info.st_mode):
+        raise FileExistsError(f"{socket_path} exists and is not a socket")
+    os.remove(socket_path)
+
+
+def serve(socket_path=DEFAULT_SOCKET, workers=None, max_jobs=DEFAULT_MAX_JOBS):
+    """Load the interpreters, fork the workers and keep the pool at full size until stopped"""
+    import dav_batch
+
+    # Import and warm up everything once, so that every forked worker starts hot
+    for language, source in WARM_UP_SOURCES.items():
+        dav_batch.run_source_captured(source, language)
+
+    remove_stale_socket(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Programs can run commands, so only this user may connect. The umask
+    # covers the moment between bind and chmod.
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    os.chmod(socket_path, 0o600)
+    server.listen(128)
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker_loop(server, max_jobs)
+            finally:
+                os._exit(0)
+        return pid
+
+    children = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    workers = workers or os.cpu_count() or 1
+    children.update(spawn() for _ in range(workers))
+    print(f"DAV pool listening on {socket_path} with {workers} workers (pid {os.getpid()})", flush=True)
+    try:
+        while not stopping:
+            try:
+                pid, _ = os.wait()
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+            # A worker exits after max_jobs programs (or if it crashed): replace it
+            children.discard(pid)
+            if not stopping:
+                children.add(spawn())
+    finally:
+        stop(None, None)
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# ---------------------------
+# Client side
+# ---------------------------
+def request(message, socket_path=DEFAULT_SOCKET, out=None, err=None):
+    """Send one request to the pool, copy streamed output to out/err, and return the final message"""
+    out = out or sys.stdout
+    err = err or sys.stderr
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path)
+        send_message(conn, message)
+        for line in conn.makefile('rb'):
+            reply = json.loads(line)
+            if reply.get('done'):
+                return reply
+            (err if reply['stream'] == 'stderr' else out).write(reply['data'])
+    return {'done': True, 'status': 'error', 'error': "connection closed by the pool"}
+
+
+def run_request(args):
+    """Build the request for `run` from the command line"""
+    if args.code is not None:
+        message = {'source': args.code, 'language': args.language}
+    else:
+        message = {'path': os.path.abspath(args.file), 'cwd': os.getcwd(), 'language': args.language}
+    for name in ('max_steps', 'max_evals', 'max_depth', 'timeout'):
+        if getattr(args, name) is not None:
+            message[name] = getattr(args, name)
+    return message
+
+
+def bench(args):
+    """Compare the latency of the pool with starting a new interpreter process per run"""
+    import subprocess
+
+    message = run_request(args)
+    sink = open(os.devnull, 'w')
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        reply = request(message, args.socket, out=sink, err=sink)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"pool     : median {timings[len(timings) // 2] * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms over {args.runs} runs")
+
+    if args.file:
+        here = os.path.dirname(os.path.abspath(__file__))
+        script = 'interpreteur_anglais.py' if reply.get('language') == 'en' else 'interpreteur_francais.py'
+        runs = min(args.runs, 20)
+        start = time.perf_counter()
+        for _ in range(runs):
+            subprocess.run([sys.executable, os.path.join(here, script), args.file],
+                           stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(f"process  : {(time.perf_counter() - start) / runs * 1000:.2f} ms per run over {runs} runs")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm DAV interpreter pool")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Unix socket path (default: $DAV_SOCKET)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="start the pool in the foreground")
+    serve_parser.add_argument('--workers', type=int, help="number of pre-forked workers (default: one per core)")
+    serve_parser.add_argument('--max-jobs', type=int, default=DEFAULT_MAX_JOBS,
+                              help="programs a worker runs before it is replaced")
+
+    for name, help_text in (('run', "run a program through the pool"), ('bench', "measure the latency of the pool")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('file', nargs='?', help=".dav file to run")
+        sub.add_argument('-c', dest='code', help="program source instead of a file")
+        sub.add_argument('--language', choices=['en', 'fr'], help="skip language detection")
+        sub.add_argument('--max-steps', type=int, help="stop the program after this many statements")
+        sub.add_argument('--max-evals', type=int, help="stop the program after this many expression evaluations")
+        sub.add_argument('--max-depth', type=int, help="stop the program past this function call depth")
+        sub.add_argument('--timeout', type=float, help="stop the program after this many seconds")
+        if name == 'bench':
+            sub.add_argument('--runs', type=int, default=200, help="number of runs")
+
+    subparsers.add_parser('stop', help="stop the pool")
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        try:
+            serve(args.socket, args.workers, args.max_jobs)
+        except (PermissionError, FileExistsError) as e:
+            print(f"dav_daemon: {e}", file=sys.stderr)
+            return 1
+        return 0
+    if args.command == 'stop':
+        request({'command': 'stop'}, args.socket)
+        return 0
+    if args.file is None and args.code is None:
+        parser.error("give a .dav file or -c <source>")
+    if args.command == 'bench':
+        bench(args)
+        return 0
+
+    reply = request(run_request(args), args.socket)
+    if reply.get('error'):
+        print(reply['error'], file=sys.stderr)
+    return 0 if reply.get('status') == 'ok' else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
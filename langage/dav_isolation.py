@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Isolated execution of DAV programs for many tenants
+Usage:
+    python dav_isolation.py run --tenant alice a.dav --tenant bob b.dav   run files, one tenant each
+    python dav_isolation.py bench [--programs N] [--tenants T]           compare the backends
+
+Each tenant gets its own CPython subinterpreter, so the interpreter globals
+(variables, functions, modules) of one tenant are never visible to another,
+while all tenants live in one process. The subinterpreter is created and
+warmed up on the tenant's first program and reused for the next ones. On
+runtimes with a per-interpreter GIL (3.12+) tenants run truly in parallel;
+on 3.11 they share the GIL. When the runtime has no usable subinterpreters
+the pool runs programs in worker processes instead. Modules cannot be shared
+between subinterpreters, but they all load the interpreters' bytecode from the
+same __pycache__, compiled once when this module imports them.
+
+Isolation separates the tenants' state, not their access to the machine:
+programs can import Python modules, run commands and write files, so only
+run programs you would run outside the pool.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import dav_batch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MAX_TENANTS = 64
+
+# Run once in a new subinterpreter: import and warm up both interpreters
+WARM_UP_SCRIPT = """
+import importlib, json, sys
+if dav_path not in sys.path:
+    sys.path.insert(0, dav_path)
+import dav_batch
+for _language, _source in (('en', "Show 1 line."), ('fr', "Affiche 1.")):
+    dav_batch.run_source_captured(_source, _language)
+_send = getattr(importlib.import_module(channels_module), send_name)
+"""
+
+# Run for every program: the result record comes back as JSON over a channel
+RUN_SCRIPT = """
+_record = dav_batch.run_source_captured(source, language or None, json.loads(limits) if limits else None)
+_send(channel, json.dumps(_record).encode('utf-8'))
+"""
+
+# Run before a subinterpreter is destroyed: stop the threads programs may have started
+CLEAN_UP_SCRIPT = """
+import interpreteur_anglais, interpreteur_francais
+interpreteur_anglais.reset()
+interpreteur_francais.dav.reset()
+"""
+
+
+# ---------------------------
+# Subinterpreter backend
+# ---------------------------
+def load_subinterpreters():
+    """The low-level interpreter module and its channel functions, or None when the runtime has none.
+
+    Python 3.11 keeps the channels in _xxsubinterpreters, 3.12 moved them to
+    _xxinterpchannels and dropped the channel_ prefix.
+    """
+    import importlib
+
+    try:
+        interpreters = importlib.import_module('_xxsubinterpreters')
+    except ImportError:
+        return None
+    if hasattr(interpreters, 'channel_create'):
+        return interpreters, '_xxsubinterpreters', 'channel_'
+    try:
+        importlib.import_module('_xxinterpchannels')
+    except ImportError:
+        return None
+    return interpreters, '_xxinterpchannels', ''
+
+
+class Tenant:
+    """A subinterpreter that only runs the programs of one tenant.
+
+    Everything that touches the subinterpreter runs on the tenant's own
+    thread: CPython 3.11 cannot destroy an interpreter from another thread
+    than the one that used threading in it.
+    """
+    __slots__ = ('name', 'interpreter_id', 'executor', 'programs')
+
+    def __init__(self, name):
+        self.name = name
+        self.interpreter_id = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='dav-tenant')
+        self.programs = 0
+
+
+class SubinterpreterPool:
+    """Run DAV programs in one subinterpreter per tenant.
+
+    Programs of the same tenant run one after the other, different tenants
+    run in parallel, and at most `workers` programs run at the same time.
+    At most max_tenants subinterpreters are kept; the least recently used
+    one is destroyed to make room, after its queued programs have run.
+    Isolation keeps the tenants' interpreter state apart; it is not a
+    sandbox. Programs can still import Python modules such as os, run
+    commands and write files. On 3.11, isolated subinterpreters cannot start
+    threads, so background tasks report an error there.
+    """
+    backend = 'subinterpreter'
+
+    def __init__(self, workers=None, max_tenants=DEFAULT_MAX_TENANTS):
+        import importlib
+
+        loaded = load_subinterpreters()
+        if loaded is None:
+            raise NotImplementedError("this Python has no subinterpreter support")
+        self.interpreters, self.channels_module, prefix = loaded
+        channels = importlib.import_module(self.channels_module)
+        self.channel_create = getattr(channels, prefix + 'create')
+        self.channel_recv = getattr(channels, prefix + 'recv')
+        self.channel_destroy = getattr(channels, prefix + 'destroy')
+        self.send_name = prefix + 'send'
+
+        self.own_gil = sys.version_info >= (3, 12)
+        self.max_tenants = max_tenants
+        self.tenants = collections.OrderedDict()
+        self.tenants_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(workers or os.cpu_count() or 1)
+
+    def create_interpreter(self):
+        """A new isolated subinterpreter with both DAV interpreters imported and warmed up"""
+        try:
+            interpreter_id = self.interpreters.create(isolated=True)
+        except TypeError:
+            interpreter_id = self.interpreters.create()
+        try:
+            self.interpreters.run_string(interpreter_id, WARM_UP_SCRIPT, {
+                'dav_path': HERE, 'channels_module': self.channels_module, 'send_name': self.send_name})
+        except Exception:
+            self.interpreters.destroy(interpreter_id)
+            raise
+        return interpreter_id
+
+    def run_in_tenant(self, tenant, source, language, limits):
+        """Run one program on the tenant's thread"""
+        start = time.perf_counter()
+        channel = self.channel_create()
+        try:
+            with self.slots:
+                if tenant.interpreter_id is None:
+                    tenant.interpreter_id = self.create_interpreter()
+                self.interpreters.run_string(tenant.interpreter_id, RUN_SCRIPT, {
+                    'source': source, 'language': language or '', 'channel': channel,
+                    'limits': json.dumps(limits) if limits else ''})
+            tenant.programs += 1
+            record = json.loads(self.channel_recv(channel))
+        except Exception as e:
+            return failed_record(tenant.name, f"{type(e).__name__}: {e}", start)
+        finally:
+            self.channel_destroy(channel)
+        return {'tenant': tenant.name, **record}
+
+    def destroy_interpreter(self, tenant):
+        """Stop what the tenant's programs left running and destroy its subinterpreter, on the tenant's thread"""
+        if tenant.interpreter_id is None:
+            return
+        try:
+            self.interpreters.run_string(tenant.interpreter_id, CLEAN_UP_SCRIPT, {})
+        finally:
+            self.interpreters.destroy(tenant.interpreter_id)
+            tenant.interpreter_id = None
+
+    def retire(self, tenant):
+        tenant.executor.submit(self.destroy_interpreter, tenant)
+        tenant.executor.shutdown(wait=False)
+
+    def submit(self, tenant_name, source, language=None, limits=None):
+        """Queue a program for a tenant; the future's result is its record (see dav_batch.run_source_captured)"""
+        with self.tenants_lock:
+            tenant = self.tenants.get(tenant_name)
+            if tenant is None:
+                if len(self.tenants) >= self.max_tenants:
+                    self.retire(self.tenants.popitem(last=False)[1])
+                tenant = self.tenants[tenant_name] = Tenant(tenant_name)
+            else:
+                self.tenants.move_to_end(tenant_name)
+            return tenant.executor.submit(self.run_in_tenant, tenant, source, language, limits)
+
+    def run(self, tenant_name, source, language=None, limits=None):
+        return self.submit(tenant_name, source, language, limits).result()
+
+    def evict(self, tenant_name):
+        """Destroy a tenant's subinterpreter once its queued programs have run"""
+        with self.tenants_lock:
+            tenant = self.tenants.pop(tenant_name, None)
+        if tenant is not None:
+            self.retire(tenant)
+
+    def close(self):
+        with self.tenants_lock:
+            tenants = list(self.tenants.values())
+            self.tenants.clear()
+        for tenant in tenants:
+            self.retire(tenant)
+        for tenant in tenants:
+            tenant.executor.shutdown(wait=True)
+
+
+def failed_record(tenant_name, error, start):
+    """Result record for a program that could not be run at all"""
+    return {'tenant': tenant_name, 'language': None, 'status': 'error', 'budget_exceeded': None,
+            'duration': time.perf_counter() - start, 'stdout': '', 'stderr': error}
+
+
+# ---------------------------
+# Process backend
+# ---------------------------
+def run_in_process(tenant_name, source, language, limits):
+    return {'tenant': tenant_name, **dav_batch.run_source_captured(source, language, limits)}
+
+
+class ProcessPool:
+    """Run DAV programs in worker processes; the interpreter state is reset before every program"""
+    backend = 'process'
+    own_gil = True
+
+    def __init__(self, workers=None, max_tenants=None):
+        self.executor = concurrent.futures.ProcessPoolExecutor(workers or os.cpu_count() or 1)
+
+    def submit(self, tenant_name, source, language=None, limits=None):
+        return self.executor.submit(run_in_process, tenant_name, source, language, limits)
+
+    def run(self, tenant_name, source, language=None, limits=None):
+        return self.submit(tenant_name, source, language, limits).result()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def make_pool(backend='auto', workers=None, max_tenants=DEFAULT_MAX_TENANTS):
+    """An isolation pool; 'auto' prefers subinterpreters and falls back to processes"""
+    if backend == 'process':
+        return ProcessPool(workers)
+    try:
+        pool = SubinterpreterPool(workers, max_tenants)
+        # Try one program up front, so that an unusable runtime is detected here and not on every program
+        record = pool.run('__warm_up__', "Show 1 line.", 'en')
+        pool.evict('__warm_up__')
+        if record['status'] != 'ok':
+            pool.close()
+            raise RuntimeError(record['stderr'])
+        return pool
+    except Exception:
+        if backend == 'subinterpreter':
+            raise
+        return ProcessPool(workers)
+
+
+# ---------------------------
+# Command line
+# ---------------------------
+def process_rss_mb(pid):
+    """Resident set size of a process in MB, from /proc"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def pool_rss_mb(pool, rss_before):
+    """Memory held by a pool: what this process grew by for subinterpreters, the workers for processes"""
+    if isinstance(pool, ProcessPool):
+        return sum(process_rss_mb(pid) for pid in (pool.executor._processes or {}))
+    return process_rss_mb(os.getpid()) - rss_before
+
+
+BENCH_PROGRAM = """
+I have a number called total.
+For j in range 1 to {work}:
+    Set total to total plus j.
+Show total line.
+"""
+
+
+def bench(args):
+    """Run the same tenant workload through each backend and compare throughput and memory"""
+    source = BENCH_PROGRAM.format(work=args.work)
+    backends = ['process', 'subinterpreter'] if args.backend == 'auto' else [args.backend]
+    print(f"{args.programs} programs for {args.tenants} tenants, {args.workers} workers")
+    print(f"{'backend':<16}{'wall':>8}{'programs/s':>12}{'p50':>9}{'p95':>9}{'memory':>10}")
+    for backend in backends:
+        rss_before = process_rss_mb(os.getpid())
+        try:
+            pool = make_pool(backend, args.workers, args.tenants)
+        except Exception as e:
+            print(f"{backend:<16}unavailable: {e}")
+            continue
+        # Start every tenant and worker before timing
+        for future in [pool.submit(f"tenant-{t}", source) for t in range(args.tenants)]:
+            future.result()
+
+        start = time.perf_counter()
+        futures = [pool.submit(f"tenant-{n % args.tenants}", source) for n in range(args.programs)]
+        results = [future.result() for future in futures]
+        wall = time.perf_counter() - start
+        memory = pool_rss_mb(pool, rss_before)
+        pool.close()
+
+        failed = sum(result['status'] != 'ok' for result in results)
+        durations = sorted(result['duration'] for result in results)
+        name = backend + (" (own GIL)" if backend == 'subinterpreter' and pool.own_gil else "")
+        print(f"{name:<16}{wall:>7.2f}s{args.programs / wall:>12,.0f}"
+              f"{durations[len(durations) // 2] * 1000:>7.1f}ms{durations[int(len(durations) * 0.95)] * 1000:>7.1f}ms"
+              f"{memory:>8.1f}MB" + (f"  {failed} failed" if failed else ""))
+
+
+def run_files(args):
+    """Run each file for its tenant and print the outputs in order"""
+    pool = make_pool(args.backend, args.workers)
+    futures = []
+    for tenant_name, path in args.tenant:
+        with open(path, 'r', encoding='utf-8') as f:
+            futures.append((path, pool.submit(tenant_name, f.read(), None, dav_batch.limits_from_args(args))))
+    status = 0
+    for path, future in futures:
+        result = future.result()
+        print(f"=== {result['tenant']}: {path} ({result['status']}) ===")
+        print(result['stdout'] + result['stderr'], end='')
+        status |= result['status'] != 'ok'
+    pool.close()
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run DAV programs for many tenants in isolation")
+    parser.add_argument('--backend', choices=['auto', 'subinterpreter', 'process'], default='auto',
+                        help="execution backend (default: subinterpreters when available)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="programs run at the same time")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="run .dav files, each for a tenant")
+    run_parser.add_argument('--tenant', nargs=2, action='append', required=True, metavar=('NAME', 'FILE'),
+                            help="tenant name and the .dav file to run for it")
+    dav_batch.add_limit_arguments(run_parser)
+    run_parser.set_defaults(func=run_files)
+
+    bench_parser = subparsers.add_parser('bench', help="compare the subinterpreter and process backends")
+    bench_parser.add_argument('--programs', type=int, default=500, help="number of programs to run")
+    bench_parser.add_argument('--tenants', type=int, default=16, help="number of tenants")
+    bench_parser.add_argument('--work', type=int, default=200, help="loop iterations per program")
+    bench_parser.set_defaults(func=bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
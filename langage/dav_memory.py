@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Memory inspector for DAV programs: what each variable holds and what each call costs
+Usage: python dav_memory.py program.dav [--threshold 512MB] [--every 1000] [--top 10] [--json]
+
+The interpreters keep DAV variables in anonymous dicts, so Python tools cannot
+tell which list is growing. This module measures the deep size of every
+global and local DAV variable, and its MemoryInspector, installed through the
+tracing hooks, follows tracemalloc while the program runs:
+  - the peak memory growth of one call of each user function,
+  - the traced memory every N statements,
+  - the largest variables, written to stderr when memory crosses a threshold.
+Programs can also print a report themselves with `Show the memory.` or
+`Affiche la mémoire.`, and both interpreters take --memory[=threshold].
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2, 'g': 1024 ** 3, 'gb': 1024 ** 3}
+
+LABELS = {
+    'en': {
+        'traced': "traced memory", 'peak': "peak", 'not_traced': "memory tracing is off",
+        'variables': "largest variables (deep size)", 'main': "main", 'functions': "peak growth per call",
+        'calls': "calls", 'timeline': "traced memory over time", 'statements': "statements",
+        'threshold': "memory threshold of {threshold} crossed at line {line}: {text}",
+    },
+    'fr': {
+        'traced': "mémoire suivie", 'peak': "maximum", 'not_traced': "le suivi de la mémoire est désactivé",
+        'variables': "variables les plus lourdes (taille profonde)", 'main': "programme",
+        'functions': "croissance maximale par appel", 'calls': "appels",
+        'timeline': "mémoire suivie au fil du temps", 'statements': "instructions",
+        'threshold': "seuil mémoire de {threshold} franchi à la ligne {line}: {text}",
+    },
+}
+
+
+def parse_size(text):
+    """Bytes from a size such as 512MB, 1.5g or 2048"""
+    import re
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?b?)\s*", str(text).lower())
+    if not match:
+        raise ValueError(f"not a memory size: {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
+
+
+def deep_size(value):
+    """Bytes held by a value and everything it refers to, each object counted once.
+
+    Modules, classes and functions are shared with the rest of the program
+    and are not counted.
+    """
+    import types
+    shared = (types.ModuleType, type, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+    atoms = (str, bytes, int, float, complex, bool, type(None))
+    seen = set()
+    total = 0
+    pending = [value]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, shared):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, atoms):
+            continue
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        else:
+            attributes = getattr(obj, '__dict__', None)
+            if attributes is not None:
+                pending.append(attributes)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if hasattr(obj, slot):
+                        pending.append(getattr(obj, slot))
+    return total
+
+
+def language_of(interpreter):
+    return 'fr' if hasattr(interpreter, 'dav') else 'en'
+
+
+def dav_scopes(interpreter):
+    """Local variable tables of the DAV code running now, innermost first, with their function.
+
+    They are found in the Python frames of the interpreter's call_function
+    and execute_statement, so nothing is kept while no one asks. The
+    function is None for the program's top level.
+    """
+    call_code = interpreter.untraced_call_function.__code__
+    statement_code = interpreter.untraced_execute_statement.__code__
+    scopes, seen, pending = [], set(), []
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code is statement_code:
+            local_vars = frame.f_locals.get('local_vars')
+            if local_vars is not None and id(local_vars) not in seen:
+                seen.add(id(local_vars))
+                pending.append(local_vars)
+        elif frame.f_code is call_code:
+            name = frame.f_locals.get('name')
+            scopes.extend((name, local_vars) for local_vars in pending)
+            pending = []
+            local_vars = frame.f_locals.get('func_local_vars')
+            if local_vars is not None and id(local_vars) not in seen:
+                seen.add(id(local_vars))
+                scopes.append((name, local_vars))
+        frame = frame.f_back
+    scopes.extend((None, local_vars) for local_vars in pending)
+    return scopes
+
+
+def variable_sizes(interpreter):
+    """(scope, name, bytes) for every global variable and every local one in reach, largest first"""
+    state = getattr(interpreter, 'dav', interpreter)
+    rows = [('global', name, deep_size(value)) for name, value in list(state.variables.items())]
+    for function, local_vars in dav_scopes(interpreter):
+        scope = function or 'main'
+        rows.extend((scope, name, deep_size(value)) for name, value in list(local_vars.items()))
+    rows.sort(key=lambda row: -row[2])
+    return rows
+
+
+def memory_report(interpreter, inspector=None, top=10):
+    """Memory report as plain data: traced totals, largest variables and, with an inspector, its records"""
+    import tracemalloc
+    report = {'traced': None, 'peak': None}
+    if tracemalloc.is_tracing():
+        report['traced'], report['peak'] = tracemalloc.get_traced_memory()
+    report['variables'] = [{'scope': scope, 'name': name, 'bytes': size}
+                           for scope, name, size in variable_sizes(interpreter)[:top]]
+    if inspector is not None:
+        report['peak'] = max(report['peak'] or 0, inspector.peak)
+        report['functions'] = {name: {'calls': calls, 'peak_growth': growth}
+                               for name, (calls, growth) in sorted(inspector.functions.items(), key=lambda item: -item[1][1])}
+        report['timeline'] = [{'statements': statements, 'seconds': round(seconds, 6), 'traced': traced}
+                              for statements, seconds, traced in inspector.timeline]
+    return report
+
+
+def format_report(report, language='en'):
+    """Memory report as text for people, in the program's language"""
+    labels = LABELS[language]
+    lines = []
+    if report['traced'] is not None:
+        lines.append(f"{labels['traced']}: {format_size(report['traced'])}, {labels['peak']}: {format_size(report['peak'])}")
+    elif report['peak']:
+        lines.append(f"{labels['peak']}: {format_size(report['peak'])}")
+    else:
+        lines.append(labels['not_traced'])
+    lines.append(f"{labels['variables']}:")
+    for row in report['variables']:
+        scope = labels['main'] if row['scope'] == 'main' else row['scope']
+        lines.append(f"  {scope:<12} {row['name']:<20} {format_size(row['bytes']):>10}")
+    if report.get('functions'):
+        lines.append(f"{labels['functions']}:")
+        for name, record in report['functions'].items():
+            lines.append(f"  {name:<20} {record['calls']:>8,} {labels['calls']:<8} {format_size(record['peak_growth']):>10}")
+    if report.get('timeline'):
+        lines.append(f"{labels['timeline']}:")
+        for sample in report['timeline']:
+            lines.append(f"  {sample['statements']:>10,} {labels['statements']:<14} {sample['seconds']:>8.3f} s"
+                         f" {format_size(sample['traced']):>10}")
+    return "\n".join(lines)
+
+
+class MemoryInspector:
+    """Tracing hooks that follow tracemalloc while a program runs.
+
+    Every statement reads the traced memory: it feeds the peak of the calls in
+    progress, a timeline sample every `every` statements, and the threshold
+    check. Crossing the threshold writes the largest variables to `out`
+    once, until memory falls back under it.
+    """
+    def __init__(self, interpreter, threshold=None, every=1000, top=10, out=None):
+        self.interpreter = interpreter
+        self.threshold = parse_size(threshold) if isinstance(threshold, str) else threshold
+        self.every = every
+        self.top = top
+        self.out = out
+        self.functions = {}
+        self.frames = []
+        self.timeline = []
+        self.statements = 0
+        self.peak = 0
+        self.over_threshold = False
+        self.owns_tracing = False
+
+    def start(self):
+        """Start tracemalloc if needed and install the hooks; returns the inspector"""
+        import time
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.owns_tracing = True
+        self.get_traced_memory = tracemalloc.get_traced_memory
+        self.started = time.perf_counter()
+        self.interpreter.install_hooks(self)
+        return self
+
+    def stop(self):
+        """Remove the hooks, take a last sample, and stop tracemalloc if start() started it"""
+        import tracemalloc
+        self.interpreter.remove_hooks(self)
+        self.sample(self.get_traced_memory()[0])
+        if self.owns_tracing:
+            tracemalloc.stop()
+            self.owns_tracing = False
+
+    def sample(self, traced):
+        import time
+        self.timeline.append((self.statements, time.perf_counter() - self.started, traced))
+
+    def on_statement(self, line_no, text):
+        traced, peak = self.get_traced_memory()
+        if peak > self.peak:
+            self.peak = peak
+        if self.frames and traced > self.frames[-1][2]:
+            self.frames[-1][2] = traced
+        self.statements += 1
+        if self.statements % self.every == 0:
+            self.sample(traced)
+        if self.threshold is not None:
+            if traced >= self.threshold:
+                if not self.over_threshold:
+                    self.over_threshold = True
+                    self.dump(line_no, text)
+            else:
+                self.over_threshold = False
+
+    def on_call(self, name, args):
+        traced = self.get_traced_memory()[0]
+        self.frames.append([name, traced, traced])
+
+    def on_return(self, name, value):
+        if not self.frames:
+            return
+        name, start, peak = self.frames.pop()
+        peak = max(peak, self.get_traced_memory()[0])
+        record = self.functions.setdefault(name, [0, 0])
+        record[0] += 1
+        record[1] = max(record[1], peak - start)
+        if self.frames and peak > self.frames[-1][2]:
+            self.frames[-1][2] = peak
+
+    def dump(self, line_no, text):
+        """Write the largest variables, with the line that crossed the threshold"""
+        language = language_of(self.interpreter)
+        out = self.out or sys.stderr
+        header = LABELS[language]['threshold'].format(threshold=format_size(self.threshold), line=line_no, text=text)
+        print(header, file=out)
+        print(format_report(memory_report(self.interpreter, top=self.top), language), file=out, flush=True)
+
+    def report(self):
+        return memory_report(self.interpreter, self, self.top)
+
+    def format(self):
+        return format_report(self.report(), language_of(self.interpreter))
+
+
+def inspect_file(path, language=None, threshold=None, every=1000, top=10):
+    """Run a .dav file under a MemoryInspector and return the stopped inspector"""
+    from dav_batch import detect_language, interpreter_for
+
+    if language is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            language = detect_language(f.read())
+    inspector = MemoryInspector(interpreter_for(language), threshold, every, top).start()
+    try:
+        inspector.interpreter.run_dav(path)
+    finally:
+        inspector.stop()
+    return inspector
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Report the memory used by a DAV program's variables and functions")
+    parser.add_argument('file', help=".dav file to run")
+    parser.add_argument('--language', choices=['en', 'fr'], help="skip language detection")
+    parser.add_argument('--threshold', type=parse_size, help="dump the largest variables when traced memory reaches this (e.g. 512MB)")
+    parser.add_argument('--every', type=int, default=1000, help="statements between two timeline samples")
+    parser.add_argument('--top', type=int, default=10, help="variables listed in reports")
+    parser.add_argument('--json', action='store_true', help="write the final report as JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.file):
+        parser.error(f"{args.file} not found")
+    inspector = inspect_file(args.file, args.language, args.threshold, args.every, args.top)
+    print(json.dumps(inspector.report(), indent=2) if args.json else inspector.format(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
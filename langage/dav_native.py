@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Register Python functions for DAV programs, under an English and a French name
+Usage:
+    import dav_native
+
+    @dav_native.native(en='area', fr='aire')
+    def area(width: float, height: float) -> float:
+        return width * height
+
+English programs can then write `Show area(2, 3).` and French ones
+`Affiche aire(2, 3).`. The parameter types come from the annotations, or from
+params=(float, float); the argument converters are chosen once, when the
+function is registered, and calls go straight from the compiled expression to
+the function.
+"""
+
+import importlib
+
+INTERPRETERS = {'en': 'interpreteur_anglais', 'fr': 'interpreteur_francais'}
+
+
+def register(function, en=None, fr=None, params=None, returns=None):
+    """Register a callable in each interpreter it has a name for, and return the NativeFunction per language.
+
+    Without names, the function's own name is used in both languages.
+    """
+    if en is None and fr is None:
+        en = fr = function.__name__
+    registered = {}
+    for language, name in (('en', en), ('fr', fr)):
+        if name:
+            interpreter = importlib.import_module(INTERPRETERS[language])
+            registered[language] = interpreter.register_function(name, function, params, returns)
+    return registered
+
+
+def unregister(en=None, fr=None):
+    """Remove native functions registered by register()"""
+    for language, name in (('en', en), ('fr', fr)):
+        if name:
+            importlib.import_module(INTERPRETERS[language]).unregister_function(name)
+
+
+def native(en=None, fr=None, params=None, returns=None):
+    """Decorator form of register(); the function itself is returned unchanged"""
+    def decorator(function):
+        register(function, en, fr, params, returns)
+        return function
+    return decorator
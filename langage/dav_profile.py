@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Profile a DAV program by its own call stack and write it for flame-graph tools
+Usage: python dav_profile.py program.dav [-o program.folded] [--weight time|statements] [--no-lines]
+
+Python profilers only show the interpreter (eval_expr, execute_statement...).
+This profiler follows the DAV call stack instead, through the interpreters'
+tracing hooks: every frame is a user function, labelled with the source line
+it is on (`fact:4`), under the program itself (`program.dav:9`). The result is
+in the collapsed-stack format, one `frame;frame;frame weight` line per stack,
+that flamegraph.pl, speedscope or inferno read:
+    python dav_profile.py fib.dav -o fib.folded && flamegraph.pl fib.folded > fib.svg
+Weights are microseconds spent on each stack, or statements run with
+--weight statements, which does not depend on the machine.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+WEIGHTS = ('time', 'statements')
+
+
+class StackNode:
+    """One frame of the call tree, with the weight of the stacks that end on it"""
+    __slots__ = ('label', 'parent', 'children', 'weight')
+
+    def __init__(self, label, parent):
+        self.label = label
+        self.parent = parent
+        self.children = {}
+        self.weight = 0
+
+    def child(self, label):
+        node = self.children.get(label)
+        if node is None:
+            node = self.children[label] = StackNode(label, self)
+        return node
+
+
+class FlameProfiler:
+    """Tracing hooks that build the DAV call tree of a run.
+
+    Install it with the interpreter's install_hooks(); the time between two
+    events goes to the stack that was current. Frames move to a new line on
+    each statement, so a recursive function shows up once per calling line.
+    Time outside any statement (parsing the program, testing an If or loop
+    condition before a body runs) stays on the frame without a line.
+    """
+    def __init__(self, program='program', weight='time', lines=True):
+        if weight not in WEIGHTS:
+            raise ValueError(f"weight must be one of {', '.join(WEIGHTS)}, not {weight!r}")
+        self.root = StackNode(None, None)
+        self.names = [program.replace(';', '_')]
+        self.node = self.root.child(self.names[0])
+        self.lines = lines
+        self.timed = weight == 'time'
+        self.last = time.perf_counter_ns()
+
+    def charge(self):
+        """Give the time since the last event to the current stack"""
+        now = time.perf_counter_ns()
+        self.node.weight += now - self.last
+        self.last = now
+
+    def on_statement(self, line_no, text):
+        if self.timed:
+            self.charge()
+        if self.lines and line_no is not None:
+            self.node = self.node.parent.child(f"{self.names[-1]}:{line_no}")
+        if not self.timed:
+            self.node.weight += 1
+
+    def on_call(self, name, args):
+        if self.timed:
+            self.charge()
+        self.names.append(name)
+        self.node = self.node.child(name)
+
+    def on_return(self, name, value):
+        if self.timed:
+            self.charge()
+        if len(self.names) > 1:
+            self.names.pop()
+            self.node = self.node.parent
+
+    def finish(self):
+        """Close the last measurement; call it once the program is over"""
+        if self.timed:
+            self.charge()
+
+    def stacks(self):
+        """Yield (frames, weight) for every stack with a weight, weights in microseconds or statements"""
+        pending = [(child, (child.label,)) for child in self.root.children.values()]
+        while pending:
+            node, frames = pending.pop()
+            weight = node.weight // 1000 if self.timed else node.weight
+            if weight:
+                yield frames, weight
+            pending.extend((child, frames + (child.label,)) for child in node.children.values())
+
+    def write_collapsed(self, f):
+        """Write the collapsed-stack lines, sorted, and return how many were written"""
+        lines = sorted(f"{';'.join(frames)} {weight}\n" for frames, weight in self.stacks())
+        f.writelines(lines)
+        return len(lines)
+
+
+def profile_file(path, language=None, weight='time', lines=True):
+    """Run a .dav file under a FlameProfiler and return the profiler"""
+    from dav_batch import detect_language, interpreter_for
+
+    if language is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            language = detect_language(f.read())
+    interpreter = interpreter_for(language)
+    profiler = FlameProfiler(os.path.basename(path), weight, lines)
+    interpreter.install_hooks(profiler)
+    try:
+        interpreter.run_dav(path)
+    finally:
+        interpreter.remove_hooks(profiler)
+        profiler.finish()
+    return profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile a DAV program into collapsed stacks for flame graphs")
+    parser.add_argument('file', help=".dav file to profile")
+    parser.add_argument('-o', '--output', help="collapsed-stack file to write (default: <program>.folded)")
+    parser.add_argument('--language', choices=['en', 'fr'], help="skip language detection")
+    parser.add_argument('--weight', choices=WEIGHTS, default='time',
+                        help="microseconds spent, or statements run, on each stack")
+    parser.add_argument('--no-lines', dest='lines', action='store_false',
+                        help="one frame per function instead of one per function and line")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.file):
+        parser.error(f"{args.file} not found")
+    output = args.output or os.path.splitext(os.path.basename(args.file))[0] + '.folded'
+    profiler = profile_file(args.file, args.language, args.weight, args.lines)
+    with open(output, 'w', encoding='utf-8') as f:
+        count = profiler.write_collapsed(f)
+    print(f"{count} stacks written to {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
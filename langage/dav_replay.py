@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Record what a DAV run reads from the user and its random seed, then replay them
+Usage:
+    python dav.py --record session.json program.dav    answer as usual, the answers are saved
+    python dav.py --replay session.json program.dav    same answers and random numbers, no keyboard
+
+A recording holds the seed given to Python's random module, which draws
+`aleatoire()`, `entier_aleatoire(a, b)` and the random module of programs that
+import it, and every answer typed for `Ask the user ...` / `Demande à
+l'utilisateur ...`, in order. Replaying seeds the generator again and answers
+from the file without reading stdin, so interactive programs run unattended
+and take the same random paths. Random numbers drawn by background tasks or
+parallel loop workers are not reproduced.
+File format (JSON): {"version": 1, "program": "jeu.dav", "seed": 1234, "inputs": ["5", "oui"]}
+"""
+
+import json
+import os
+import sys
+
+SESSION_VERSION = 1
+
+
+class Recording:
+    """Answers and random seed of one run, saved to a session file by stop()"""
+    def __init__(self, interpreter, path, program=None, seed=None):
+        self.interpreter = interpreter
+        self.path = path
+        self.program = program
+        self.seed = seed if seed is not None else int.from_bytes(os.urandom(8), 'big')
+        self.inputs = []
+
+    def start(self):
+        import random
+        random.seed(self.seed)
+        self.interpreter.read_input = self.read_input
+        return self
+
+    def read_input(self, prompt=''):
+        answer = input(prompt)
+        self.inputs.append(answer)
+        return answer
+
+    def stop(self):
+        """Stop recording and write the session file"""
+        self.interpreter.read_input = input
+        session = {'version': SESSION_VERSION, 'program': self.program, 'seed': self.seed, 'inputs': self.inputs}
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(session, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+class Replay:
+    """Run driven by a session file: the recorded seed, and the recorded answers instead of stdin"""
+    def __init__(self, interpreter, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+        if session.get('version') != SESSION_VERSION:
+            raise ValueError(f"{path}: session version {session.get('version')!r}, expected {SESSION_VERSION}")
+        self.interpreter = interpreter
+        self.path = path
+        self.program = session.get('program')
+        self.seed = session['seed']
+        self.inputs = list(session['inputs'])
+        self.position = 0
+
+    def start(self):
+        import random
+        random.seed(self.seed)
+        self.interpreter.read_input = self.read_input
+        return self
+
+    def read_input(self, prompt=''):
+        """Answer like input() would with the answers piped in: the prompt is shown, the answer is not"""
+        if self.position >= len(self.inputs):
+            raise EOFError(f"{self.path}: all {len(self.inputs)} recorded answers were used")
+        sys.stdout.write(prompt)
+        answer = self.inputs[self.position]
+        self.position += 1
+        return answer
+
+    def stop(self):
+        """Stop replaying; returns the number of recorded answers the run did not ask for"""
+        self.interpreter.read_input = input
+        return len(self.inputs) - self.position
+
+
+def start_session(interpreter, record=None, replay=None, program=None):
+    """Start recording to `record` or replaying `replay` (a session file path); None when neither is given"""
+    if replay:
+        return Replay(interpreter, replay).start()
+    if record:
+        return Recording(interpreter, record, os.path.basename(program) if program else None).start()
+    return None
+
+
+def stop_session(session):
+    """Stop a session from start_session(), warning on stderr when a replay left answers unused"""
+    if session is None:
+        return
+    unused = session.stop()
+    if unused:
+        print(f"{session.path}: {unused} recorded answers were not asked for, the run took another path",
+              file=sys.stderr)
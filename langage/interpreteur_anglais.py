@@ -1,12 +1,16 @@
+import atexit
+import contextvars
+import os
 import re
-import string
-import math
-import random
-import importlib
+import sys
 
 variables = {}
 functions = {}
 modules = {}
+execution_budget = None
+# Errors reported to the user since the interpreter was loaded; never reset,
+# so callers such as dav_batch compare it before and after a run
+error_count = 0
 
 class ReturnValue(Exception):
     def __init__(self, value):
@@ -18,6 +22,226 @@ class BreakLoop(Exception):
 class ContinueLoop(Exception):
     pass
 
+class BudgetExceeded(Exception):
+    """Raised when a program uses up its execution budget"""
+    pass
+
+class ExecutionBudget:
+    """Limits on how much work a program may do before it is stopped.
+
+    Statements, expression evaluations and call depth are counted as the
+    program runs, and the wall-clock deadline is checked every
+    check_interval counted operations. Statements that block (waits,
+    channels, tasks) go through sleep() and wait(), which stop at the
+    deadline. Once a limit is hit the budget stays exceeded, so every later
+    step fails again, even after code that swallows errors.
+    """
+    def __init__(self, max_steps=None, max_evals=None, max_depth=None, timeout=None, check_interval=1000):
+        self.max_steps = max_steps
+        self.max_evals = max_evals
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.start()
+
+    def start(self):
+        """Reset the counters and start the clock"""
+        import time
+        self.steps = 0
+        self.evals = 0
+        self.depth = 0
+        self.exceeded = None
+        self.deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+
+    def fail(self, reason):
+        self.exceeded = reason
+        raise BudgetExceeded(reason)
+
+    def check_deadline(self):
+        import time
+        if time.monotonic() > self.deadline:
+            self.out_of_time()
+
+    def out_of_time(self):
+        self.fail(f"time limit of {self.timeout}s reached")
+
+    def time_left(self):
+        """Seconds before the deadline, None without a time limit; raises BudgetExceeded once it has passed"""
+        import time
+        if self.exceeded:
+            raise BudgetExceeded(self.exceeded)
+        if self.deadline is None:
+            return None
+        left = self.deadline - time.monotonic()
+        if left <= 0:
+            self.out_of_time()
+        return left
+
+    def sleep(self, seconds):
+        """time.sleep that stops at the deadline"""
+        import time
+        left = self.time_left()
+        if left is not None and seconds >= left:
+            time.sleep(left)
+            self.out_of_time()
+        time.sleep(seconds)
+
+    def wait(self, blocking, *args):
+        """Call blocking(*args, timeout=...) with the time left before the deadline.
+
+        blocking raises TimeoutError when its timeout runs out, which becomes
+        BudgetExceeded here.
+        """
+        import time
+        try:
+            return blocking(*args, timeout=self.time_left())
+        except TimeoutError:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.out_of_time()
+            raise
+
+    def step(self):
+        """Count one executed statement"""
+        if self.exceeded:
+            raise BudgetExceeded(self.exceeded)
+        self.steps += 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.fail(f"step limit of {self.max_steps} statements reached")
+        if self.deadline is not None and (self.steps + self.evals) % self.check_interval == 0:
+            self.check_deadline()
+
+    def evaluation(self):
+        """Count one expression evaluation"""
+        if self.exceeded:
+            raise BudgetExceeded(self.exceeded)
+        self.evals += 1
+        if self.max_evals is not None and self.evals > self.max_evals:
+            self.fail(f"evaluation limit of {self.max_evals} expressions reached")
+        if self.deadline is not None and (self.steps + self.evals) % self.check_interval == 0:
+            self.check_deadline()
+
+    def enter_call(self):
+        self.depth += 1
+        if self.max_depth is not None and self.depth > self.max_depth:
+            self.depth -= 1
+            self.fail(f"call depth limit of {self.max_depth} reached")
+
+    def exit_call(self):
+        self.depth -= 1
+
+    def usage(self):
+        """Counters of the last run, for reports"""
+        return {'steps': self.steps, 'evals': self.evals, 'exceeded': self.exceeded}
+
+def budget_sleep(seconds):
+    """time.sleep, cut short at the execution budget's deadline"""
+    if execution_budget is None:
+        import time
+        time.sleep(seconds)
+    else:
+        execution_budget.sleep(seconds)
+
+def budget_wait(blocking, *args):
+    """Call a blocking channel or task operation that takes a timeout, giving up at the budget's deadline"""
+    if execution_budget is None:
+        return blocking(*args)
+    return execution_budget.wait(blocking, *args)
+
+class TextBuilder:
+    """Text value assembled from appended pieces in linear time"""
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+
+    def append(self, value):
+        text = str(value)
+        self.parts.append(text)
+        self.length += len(text)
+
+    def append_line(self, value):
+        self.append(f"{value}\n")
+
+    def build(self):
+        """Join the pieces once and keep the result as the single remaining piece"""
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+    def __str__(self):
+        return self.build()
+
+    def __len__(self):
+        return self.length
+
+CHANNEL_CAPACITY = 64
+
+class Channel:
+    """Bounded FIFO queue for passing values between tasks.
+
+    Sending blocks while the channel is full, which holds fast producers back
+    to the pace of their consumers. Receiving blocks while it is empty; once
+    the channel is closed and drained, receivers get None.
+    """
+    CLOSED = object()
+
+    def __init__(self, capacity=CHANNEL_CAPACITY):
+        import collections
+        import threading
+        self.capacity = capacity
+        self.items = collections.deque()
+        self.closed = False
+        # One lock guards the items and the closed flag; senders wait on
+        # not_full, receivers on not_empty, and close() wakes both
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.not_empty = threading.Condition(self.lock)
+
+    def full(self):
+        """Whether a send would wait"""
+        return not self.closed and 0 < self.capacity <= len(self.items)
+
+    def empty(self):
+        """Whether a receive would wait"""
+        return not self.items and not self.closed
+
+    def send(self, value, timeout=None):
+        with self.lock:
+            if not self.not_full.wait_for(lambda: not self.full(), timeout):
+                raise TimeoutError("the channel stayed full")
+            if self.closed:
+                raise ValueError("send on a closed channel")
+            self.items.append(value)
+            self.not_empty.notify()
+
+    def next_value(self, timeout=None):
+        """Next value, or Channel.CLOSED once the channel is closed and drained"""
+        with self.lock:
+            if not self.not_empty.wait_for(lambda: not self.empty(), timeout):
+                raise TimeoutError("the channel stayed empty")
+            if not self.items:
+                return Channel.CLOSED
+            value = self.items.popleft()
+            self.not_full.notify()
+            return value
+
+    def receive(self, timeout=None):
+        value = self.next_value(timeout)
+        return None if value is Channel.CLOSED else value
+
+    def close(self):
+        """Close the channel without waiting: blocked receivers drain it, blocked senders fail"""
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def __iter__(self):
+        # For-each loops over a channel stop at the execution budget's deadline too
+        return iter(lambda: budget_wait(self.next_value), Channel.CLOSED)
+
+    def __repr__(self):
+        return f"<channel {len(self.items)}/{self.capacity}{' closed' if self.closed else ''}>"
+
 # ---------------------------
 # Utility functions
 # ---------------------------
@@ -40,28 +264,210 @@ def to_boolean(value):
         return value.lower() in ['true', 'yes', '1']
     return bool(value)
 
+def report_error(message):
+    """Print an error for the user and count it in error_count"""
+    global error_count
+    error_count += 1
+    print(message)
+
 def get_indentation_level(line):
     """Get the indentation level of a line"""
     return len(line) - len(line.lstrip())
 
+# ---------------------------
+# File helpers
+# ---------------------------
+FILE_READ_BUFFER_SIZE = 1 << 16
+
+def eval_file_path(operand, local_vars):
+    """Evaluate a file operand: a quoted path keeps its case, anything else is an expression"""
+    operand = operand.strip()
+    if operand[:1] in ('"', "'") and operand[-1:] == operand[:1]:
+        return operand[1:-1]
+    return eval_expr(operand.lower(), local_vars)
+
+def iter_file_lines(path, encoding='utf-8', strip=False):
+    """Lazily yield the lines of a file with buffered reads, never loading it whole"""
+    flush_file_buffers(path)
+    if encoding in ('bytes', 'binary'):
+        # No decoding: yield raw bytes without the line ending
+        with open(path, 'rb', buffering=FILE_READ_BUFFER_SIZE) as f:
+            for raw_line in f:
+                yield raw_line.strip() if strip else raw_line.rstrip(b'\r\n')
+        return
+
+    with open(path, 'r', encoding=encoding, errors='replace', buffering=FILE_READ_BUFFER_SIZE) as f:
+        for raw_line in f:
+            yield raw_line.strip() if strip else raw_line.rstrip('\r\n')
+
+# Files at least this large are read through mmap instead of read()
+MMAP_THRESHOLD = 1 << 20
+# Pending appended lines are written out once they reach this many characters
+APPEND_FLUSH_THRESHOLD = 1 << 20
+NUMBER_PATTERN = re.compile(rb'[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?')
+
+file_buffers = {}
+file_buffers_size = 0
+
+def read_file_text(path, encoding='utf-8'):
+    """Read a whole file into a string, memory-mapping large files"""
+    flush_file_buffers(path)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return f.read().decode(encoding, errors='replace')
+        import mmap
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Decode straight from the mapping, without an intermediate bytes copy
+            return str(mm, encoding, 'replace')
+
+def read_file_numbers(path):
+    """Read every number found in a file into a list"""
+    flush_file_buffers(path)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            tokens = NUMBER_PATTERN.findall(f.read())
+        else:
+            import mmap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                tokens = NUMBER_PATTERN.findall(mm)
+    return [float(token) if b'.' in token or b'e' in token.lower() else int(token) for token in tokens]
+
+def append_file_line(path, text):
+    """Queue a line for a file; queued lines are written in bulk by flush_file_buffers"""
+    global file_buffers_size
+    line = f"{text}\n"
+    file_buffers.setdefault(path, []).append(line)
+    file_buffers_size += len(line)
+    if file_buffers_size >= APPEND_FLUSH_THRESHOLD:
+        flush_file_buffers()
+
+def write_file(path, value):
+    """Write a value to a file with a single write; lists are written one item per line"""
+    flush_file_buffers(path)
+    if isinstance(value, (list, tuple)):
+        data = "".join(f"{item}\n" for item in value)
+    else:
+        data = "" if value is None else str(value)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(data)
+
+def flush_file_buffers(path=None):
+    """Write pending appended lines (for one path or all of them) with one write per file"""
+    global file_buffers_size
+    paths = [path] if path is not None else list(file_buffers)
+    for pending_path in paths:
+        pending = file_buffers.pop(pending_path, None)
+        if pending:
+            with open(pending_path, 'a', encoding='utf-8') as f:
+                f.write("".join(pending))
+    if not file_buffers:
+        file_buffers_size = 0
+
+# Lines still queued when the program ends are written out then
+atexit.register(flush_file_buffers)
+
 # ---------------------------
 # Evaluate expressions
 # ---------------------------
+# English math words and their Python operators, applied in order
+OPERATOR_REPLACEMENTS = {
+    ' plus ': ' + ',
+    ' minus ': ' - ',
+    ' times ': ' * ',
+    ' multiplied by ': ' * ',
+    ' divided by ': ' / ',
+    ' integer division by ': ' // ',
+    ' modulo ': ' % ',
+    ' mod ': ' % ',
+    ' raised to ': ' ** ',
+    ' to the power of ': ' ** ',
+    ' power ': ' ** ',
+    ' is greater than or equal to ': ' >= ',
+    ' is less than or equal to ': ' <= ',
+    ' is greater than ': ' > ',
+    ' is less than ': ' < ',
+    ' is equal to ': ' == ',
+    ' equals ': ' == ',
+    ' equal ': ' == ',
+    ' is not equal to ': ' != ',
+    ' and ': ' and ',
+    ' or ': ' or ',
+    ' not ': ' not '
+}
+
+EXPRESSION_CACHE_SIZE = 4096
+expression_cache = {}
+
+def translate_expression(expr):
+    """Replace English math words with Python operators"""
+    for english, py in OPERATOR_REPLACEMENTS.items():
+        expr = expr.replace(english, py)
+    return expr
+
+def code_names(code):
+    """Collect the names a code object may look up, including nested code objects"""
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, 'co_names'):
+            names.extend(code_names(const))
+    return names
+
+def compile_expression(expr):
+    """Compile a translated expression once and bind the names it reads.
+
+    Returns (code, names) or None when the expression is not valid Python.
+    """
+    try:
+        return expression_cache[expr]
+    except KeyError:
+        pass
+    
+    try:
+        code = compile(expr, '<dav>', 'eval')
+        entry = (code, tuple(dict.fromkeys(code_names(code))))
+    except (SyntaxError, ValueError):
+        entry = None
+    
+    if len(expression_cache) >= EXPRESSION_CACHE_SIZE:
+        expression_cache.clear()
+    expression_cache[expr] = entry
+    return entry
+
+def resolve_scope(names, local_vars):
+    """Build an evaluation scope holding only the given names.
+
+    Priority matches the full scope: user functions, native functions,
+    built-in functions, modules, local variables, then global variables.
+    """
+    variables, functions, modules = namespace()
+    scope = {}
+    for name in names:
+        if name in functions:
+            scope[name] = FunctionRef(name)
+        elif name in native_functions:
+            scope[name] = native_functions[name]
+        elif name in builtin_functions:
+            scope[name] = builtin_functions[name]
+        elif name in modules:
+            scope[name] = modules[name]
+        elif local_vars and name in local_vars:
+            scope[name] = local_vars[name]
+        elif name in variables:
+            scope[name] = variables[name]
+    return scope
+
+CALL_PATTERN = re.compile(r'(\w+)\((.*)\)')
+# "Show the memory.": the memory report of dav_memory
+MEMORY_STATEMENT_PATTERN = re.compile(r"(?:show|display|print) (?:the )?memory(?: usage)?\.?$")
+
 def eval_expr(expr, local_vars=None):
+    variables, functions, modules = namespace()
     if not expr or not expr.strip():
         return None
-        
-    scope = {}
-    scope.update(variables)  # First add global variables
-    if local_vars:
-        scope.update(local_vars)  # Then add local variables (higher priority)
-    
-    # Add built-in functions and modules
-    scope.update(modules)
-    
-    # Add user-defined functions to scope
-    for func_name in functions:
-        scope[func_name] = lambda *args, fn=func_name: call_function(fn, list(args))
+    if execution_budget is not None:
+        execution_budget.evaluation()
     
     expr = expr.strip()
     
@@ -77,43 +483,12 @@ def eval_expr(expr, local_vars=None):
     if expr.lower() == 'false':
         return False
     
-    # Replace English math words with Python operators
-    replacements = {
-        ' plus ': ' + ',
-        ' minus ': ' - ',
-        ' times ': ' * ',
-        ' multiplied by ': ' * ',
-        ' divided by ': ' / ',
-        ' integer division by ': ' // ',
-        ' modulo ': ' % ',
-        ' mod ': ' % ',
-        ' raised to ': ' ** ',
-        ' to the power of ': ' ** ',
-        ' power ': ' ** ',
-        ' is greater than or equal to ': ' >= ',
-        ' is less than or equal to ': ' <= ',
-        ' is greater than ': ' > ',
-        ' is less than ': ' < ',
-        ' is equal to ': ' == ',
-        ' equals ': ' == ',
-        ' equal ': ' == ',
-        ' is not equal to ': ' != ',
-        ' and ': ' and ',
-        ' or ': ' or ',
-        ' not ': ' not '
-    }
-    
-    # Apply replacements
-    original_expr = expr
-    for english, py in replacements.items():
-        expr = expr.replace(english, py)
-    
-    if expr != original_expr:
-        pass
+    expr = translate_expression(expr)
     
-    # Function call detection - handle explicit function calls first
-    match = re.match(r'(\w+)\((.*)\)', expr)
-    if match:
+    # Function call detection - handle explicit function calls first. Native
+    # functions are called from the compiled expression below instead.
+    match = CALL_PATTERN.match(expr)
+    if match and match.group(1) not in native_functions:
         func_name, args_str = match.groups()
         args = []
         if args_str.strip():
@@ -135,34 +510,47 @@ def eval_expr(expr, local_vars=None):
                 args_list.append(current_arg.strip())
             
             args = [eval_expr(a, local_vars) for a in args_list]
-        pass
+        if func_name in builtin_functions and func_name not in functions:
+            return builtin_functions[func_name](*args)
         return call_function(func_name, args)
     
-    # Handle module function calls like math.sqrt(16)
-    if '.' in expr and '(' in expr:
+    # Try to evaluate as Python expression (this also handles module calls like math.sqrt(16))
+    compiled = compile_expression(expr)
+    if compiled is not None:
+        code, names = compiled
         try:
-            result = eval(expr, {"__builtins__": {}}, scope)
-            pass
-            return result
-        except:
+            return eval(code, {"__builtins__": {}}, resolve_scope(names, local_vars))
+        except NativeCallError:
+            raise
+        except Exception:
             pass
     
-    # Try to evaluate as Python expression
-    try:
-        result = eval(expr, {"__builtins__": {}}, scope)
-        return result
-    except Exception as e:
-        # If it's just a variable name
-        if expr in scope:
-            return scope[expr]
-        # Return as string if nothing else works (this should rarely happen)
-        return expr
+    # If it's just a variable name
+    scope = resolve_scope((expr,), local_vars)
+    if expr in scope:
+        return scope[expr]
+    # Return as string if nothing else works (this should rarely happen)
+    return expr
 
 # ---------------------------
 # Call function
 # ---------------------------
+class FunctionRef:
+    """Picklable reference to a user function, callable from expressions"""
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, *args):
+        return call_function(self.name, list(args))
+
+    def __repr__(self):
+        return f"<function {self.name}>"
+
 def call_function(name, args, caller_local_vars=None):
     """Call a user-defined function with proper scope isolation"""
+    variables, functions, modules = namespace()
     if name not in functions:
         return None
     
@@ -179,13 +567,620 @@ def call_function(name, args, caller_local_vars=None):
             func_local_vars[param] = None
     
     # Execute function body
+    if execution_budget is not None:
+        execution_budget.enter_call()
     try:
         execute_blocks(body, func_local_vars)
     except ReturnValue as rv:
         return rv.value
+    finally:
+        if execution_budget is not None:
+            execution_budget.exit_call()
     
     return None
 
+# ---------------------------
+# Native functions
+# ---------------------------
+class NativeCallError(Exception):
+    """Raised when a native function cannot take its arguments or fails"""
+    pass
+
+def convert_integer(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value!r} is not a whole number")
+    return int(value)
+
+def convert_number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    number = to_number(value.strip() if isinstance(value, str) else value)
+    if not isinstance(number, (int, float)):
+        raise ValueError(f"{value!r} is not a number")
+    return number
+
+def convert_boolean(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1', 'vrai', 'oui')
+    return bool(value)
+
+# Argument converters by declared type; None passes the value through unchanged
+NATIVE_CONVERTERS = {
+    int: convert_integer, float: float, str: str, bool: convert_boolean,
+    list: list, tuple: tuple, dict: dict, object: None,
+}
+# DAV type names, in both languages, that a declaration may use instead of a type
+NATIVE_TYPE_NAMES = {
+    'number': convert_number, 'nombre': convert_number, 'integer': convert_integer, 'entier': convert_integer,
+    'text': str, 'texte': str, 'boolean': convert_boolean, 'booléen': convert_boolean,
+    'list': list, 'liste': list, 'dictionary': dict, 'dictionnaire': dict, 'any': None,
+}
+
+def native_converter(declared):
+    """Converter for one declared type: a type, a DAV type name, a callable or None"""
+    import inspect
+    if declared is None or declared is inspect.Parameter.empty or declared is inspect.Signature.empty:
+        return None
+    if isinstance(declared, str):
+        if declared in NATIVE_TYPE_NAMES:
+            return NATIVE_TYPE_NAMES[declared]
+        raise ValueError(f"unknown type name '{declared}'")
+    if declared in NATIVE_CONVERTERS:
+        return NATIVE_CONVERTERS[declared]
+    if isinstance(declared, type):
+        # Any other class: keep instances, build one from anything else
+        return lambda value: value if isinstance(value, declared) else declared(value)
+    if callable(declared):
+        return declared
+    raise ValueError(f"cannot convert arguments to {declared!r}")
+
+class NativeFunction:
+    """Python callable registered for DAV programs, with its argument conversions worked out once"""
+    __slots__ = ('name', 'function', 'min_args', 'max_args', 'converters', 'convert_result')
+
+    def __init__(self, name, function, params=None, returns=None):
+        import inspect
+        self.name = name
+        self.function = function
+        try:
+            signature = inspect.signature(function)
+            parameters, return_annotation = list(signature.parameters.values()), signature.return_annotation
+        except (TypeError, ValueError):
+            # Some C functions have no signature: trust the declared types, if any
+            parameters, return_annotation = None, None
+        
+        if parameters is None:
+            self.min_args, self.max_args = 0, None
+        else:
+            positional = [p for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+            self.min_args = sum(1 for p in positional if p.default is p.empty)
+            self.max_args = None if any(p.kind == p.VAR_POSITIONAL for p in parameters) else len(positional)
+            if params is None:
+                params = [p.annotation for p in positional]
+        # Only keep the positions that need converting, so untyped arguments go straight through
+        converters = [native_converter(declared) for declared in (params or ())]
+        self.converters = tuple((index, convert) for index, convert in enumerate(converters) if convert is not None)
+        self.convert_result = native_converter(returns if returns is not None else return_annotation)
+
+    def __call__(self, *args):
+        if len(args) < self.min_args or (self.max_args is not None and len(args) > self.max_args):
+            if self.max_args is None:
+                expected = f"at least {self.min_args}"
+            elif self.max_args == self.min_args:
+                expected = self.min_args
+            else:
+                expected = f"{self.min_args} to {self.max_args}"
+            raise NativeCallError(f"{self.name} takes {expected} arguments, got {len(args)}")
+        if self.converters:
+            args = list(args)
+            for index, convert in self.converters:
+                if index < len(args):
+                    try:
+                        args[index] = convert(args[index])
+                    except (TypeError, ValueError) as e:
+                        raise NativeCallError(f"argument {index + 1} of {self.name}: {e}") from None
+        try:
+            result = self.function(*args)
+        except (BreakLoop, ContinueLoop, ReturnValue, BudgetExceeded):
+            raise
+        except Exception as e:
+            raise NativeCallError(f"{self.name}: {e}") from e
+        return result if self.convert_result is None else self.convert_result(result)
+
+    def __repr__(self):
+        return f"<native function {self.name}>"
+
+# Registered by the embedding program; unlike variables and functions, reset() keeps them
+native_functions = {}
+
+def register_function(name, function, params=None, returns=None):
+    """Make a Python callable available to DAV programs under a name.
+
+    params gives the declared type of each parameter: int, float, str, bool,
+    list, dict, a DAV type name such as 'number' or 'text', any other class,
+    a converter callable, or None to pass the value as it is. Without params
+    the function's annotations are used. returns converts the result the same
+    way. Calls go straight from compiled expressions to the function.
+    """
+    if not re.fullmatch(r'[^\W\d]\w*', name):
+        raise ValueError(f"'{name}' is not a valid DAV name")
+    native = native_functions[name.lower()] = NativeFunction(name.lower(), function, params, returns)
+    return native
+
+def unregister_function(name):
+    """Remove a native function; unknown names are ignored"""
+    native_functions.pop(name.lower(), None)
+
+# ---------------------------
+# DAV source modules
+# ---------------------------
+MODULE_CACHE_VERSION = 2
+MODULE_CACHE_DIR = os.environ.get('DAV_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'dav')
+
+# Parsed modules by absolute path, as (mtime_ns, size, sha256, blocks). Unlike
+# loaded_modules this survives reset(), so a long-lived process parses a file once.
+compiled_modules = {}
+loaded_modules = {}
+import_stack = []
+program_path = None
+
+class DAVModule:
+    """Namespace of an imported .dav file: its variables, functions and modules"""
+    def __init__(self, name, path):
+        self._name = name
+        self._path = path
+        self._variables = {}
+        self._functions = {}
+        self._modules = {}
+        self._namespace = (self._variables, self._functions, self._modules)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self._functions:
+            return ModuleFunction(self, attr)
+        if attr in self._variables:
+            return self._variables[attr]
+        if attr in self._modules:
+            return self._modules[attr]
+        raise AttributeError(f"module {self._name} has no name '{attr}'")
+
+    def __repr__(self):
+        return f"<module {self._name} from {self._path}>"
+
+class ModuleFunction:
+    """Function of an imported module, callable from expressions like utils.double(3)"""
+    __slots__ = ('module', 'name')
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+
+    def __call__(self, *args):
+        return run_in_module(self.module, call_function, self.name, list(args))
+
+    def __repr__(self):
+        return f"<function {self.module._name}.{self.name}>"
+
+# The (variables, functions, modules) tables of the code running in this
+# thread or asyncio task: the program's, or a module's during its calls.
+# Setting it only affects the current context, so tasks and other threads
+# keep reading the program's tables while a module function runs.
+running_namespace = contextvars.ContextVar('dav_namespace', default=(variables, functions, modules))
+namespace = running_namespace.get
+
+def run_in_module(module, function, *args):
+    """Call function(*args) with the module's variables, functions and modules as the globals"""
+    token = running_namespace.set(module._namespace)
+    try:
+        return function(*args)
+    finally:
+        running_namespace.reset(token)
+
+def module_cache_path(path):
+    """Disk cache file of a module, per interpreter since pickles name its node classes"""
+    import hashlib
+    key = hashlib.sha256(f"{__name__}:{path}".encode('utf-8')).hexdigest()
+    return os.path.join(MODULE_CACHE_DIR, key[:32] + '.pickle')
+
+def read_module_cache(path):
+    """Cached (mtime_ns, size, sha256, blocks) of a module from disk, or None.
+
+    Like snapshots, cache files go stale when the interpreter or Python
+    changes: the header is checked before the parsed blocks are unpickled.
+    """
+    import pickle
+    try:
+        with open(module_cache_path(path), 'rb') as f:
+            if pickle.load(f) != (MODULE_CACHE_VERSION, interpreter_fingerprint(), path):
+                return None
+            return pickle.load(f)
+    except Exception:
+        return None
+
+def write_module_cache(path, entry):
+    """Save a parsed module for the next runs; a cache that cannot be written only costs a re-parse"""
+    import pickle
+    cache_path = module_cache_path(path)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(MODULE_CACHE_DIR, exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            pickle.dump((MODULE_CACHE_VERSION, interpreter_fingerprint(), path), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except (OSError, pickle.PicklingError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def compile_module(path):
+    """Parsed blocks of a .dav file, from memory, from the disk cache or from the parser.
+
+    A changed modification time alone does not re-parse the file: only a
+    different SHA-256 of its content does.
+    """
+    import hashlib
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    entry = compiled_modules.get(path) or read_module_cache(path)
+    if entry is not None and entry[:2] == key:
+        compiled_modules[path] = entry
+        return entry[3]
+    
+    with open(path, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+    if entry is not None and entry[2] == digest:
+        blocks = entry[3]
+    else:
+        lines = [line.rstrip() for line in source.decode('utf-8').split('\n')]
+        blocks = parse_logical_blocks([line for line in lines if line.strip()])
+        report_undefined_names(blocks, os.path.basename(path))
+    entry = compiled_modules[path] = (*key, digest, blocks)
+    write_module_cache(path, entry)
+    return blocks
+
+def resolve_module_path(filename):
+    """Absolute path of an imported file: next to the importing file first, then from the working directory"""
+    importer = import_stack[-1] if import_stack else program_path
+    if importer and not os.path.isabs(filename):
+        candidate = os.path.join(os.path.dirname(importer), filename)
+        if os.path.exists(candidate):
+            return os.path.abspath(candidate)
+    return os.path.abspath(filename)
+
+def import_dav_file(filename, alias=None):
+    """Run a .dav file once per program and bind its namespace in modules"""
+    variables, functions, modules = namespace()
+    path = resolve_module_path(filename)
+    name = (alias or os.path.splitext(os.path.basename(path))[0]).lower()
+    
+    if path in import_stack or path == program_path:
+        chain = ([program_path] if program_path else []) + import_stack + [path]
+        report_error(f"Error: circular import of {filename} ({' -> '.join(os.path.basename(p) for p in chain)})")
+        return
+    
+    module = loaded_modules.get(path)
+    if module is None:
+        module = DAVModule(name, path)
+        import_stack.append(path)
+        try:
+            blocks = run_in_module(module, compile_module, path)
+            run_in_module(module, execute_blocks, blocks)
+        except OSError as e:
+            report_error(f"Error: Unable to import the file {filename}: {e.strerror or e}")
+            return
+        finally:
+            import_stack.pop()
+        loaded_modules[path] = module
+    modules[name] = module
+
+def module_references(table, dav_modules):
+    """Picklable stand-in for a modules table: Python modules by name, DAV modules by path.
+
+    The state of every DAV module met on the way goes into dav_modules, with
+    its own modules table encoded the same way.
+    """
+    references = {}
+    for name, module in table.items():
+        if isinstance(module, DAVModule):
+            if module._path not in dav_modules:
+                dav_modules[module._path] = None
+                dav_modules[module._path] = (
+                    module._name,
+                    {key: value for key, value in module._variables.items() if is_picklable(value)},
+                    dict(module._functions),
+                    module_references(module._modules, dav_modules),
+                )
+            references[name] = ('dav', module._path)
+        else:
+            references[name] = ('python', module.__name__)
+    return references
+
+def restore_modules(references, dav_modules, restored):
+    """Modules table back from module_references(); restored maps paths to the DAV modules already rebuilt"""
+    import importlib
+    table = {}
+    for name, (kind, target) in references.items():
+        if kind == 'python':
+            table[name] = importlib.import_module(target)
+            continue
+        module = restored.get(target)
+        if module is None:
+            module_name, module_variables, module_functions, module_modules = dav_modules[target]
+            module = restored[target] = DAVModule(module_name, target)
+            module._variables.update(module_variables)
+            module._functions.update(module_functions)
+            module._modules.update(restore_modules(module_modules, dav_modules, restored))
+        table[name] = module
+    return table
+
+# ---------------------------
+# Snapshots
+# ---------------------------
+SNAPSHOT_VERSION = 1
+
+def interpreter_fingerprint():
+    """What a snapshot depends on besides its sources: its format, Python, and this interpreter's code"""
+    stat = os.stat(__file__)
+    return (SNAPSHOT_VERSION, sys.hexversion, __name__, stat.st_mtime_ns, stat.st_size)
+
+def source_fingerprint(path):
+    import hashlib
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return (path, stat.st_mtime_ns, stat.st_size, digest)
+
+def source_changed(path, mtime_ns, size, digest):
+    """Whether a file no longer matches its fingerprint; a new mtime alone is checked against the hash"""
+    import hashlib
+    try:
+        stat = os.stat(path)
+        if (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+            return False
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest() != digest
+    except OSError:
+        return True
+
+def save_snapshot(path, sources=()):
+    """Write the interpreter state to a snapshot file.
+
+    The snapshot holds the global variables, the user functions, the imported
+    modules (Python modules by name, DAV modules with their own state) and the
+    compiled expressions. It goes stale when the interpreter, Python or one
+    of the source files changes. Raises ValueError when a variable cannot be
+    saved, since a snapshot without it would not match a real run.
+    """
+    import marshal
+    import pickle
+    unsaved = [name for name, value in variables.items() if not is_picklable(value)]
+    if unsaved:
+        raise ValueError(f"cannot save {', '.join(unsaved)} in a snapshot")
+    dav_modules = {}
+    body = {
+        'variables': dict(variables),
+        'functions': dict(functions),
+        'modules': module_references(modules, dav_modules),
+        'loaded_modules': module_references(loaded_modules, dav_modules),
+        'dav_modules': dav_modules,
+        'expressions': marshal.dumps(list(expression_cache.items())),
+    }
+    header = {'fingerprint': interpreter_fingerprint(), 'sources': [source_fingerprint(source) for source in sources]}
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(body, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def load_snapshot(path):
+    """Replace the interpreter state with a snapshot's.
+
+    Returns False and leaves the state untouched when the snapshot is missing,
+    unreadable, made by another version, or older than one of its sources.
+    """
+    import marshal
+    import pickle
+    try:
+        with open(path, 'rb') as f:
+            header = pickle.load(f)
+            if header['fingerprint'] != interpreter_fingerprint():
+                return False
+            if any(source_changed(*source) for source in header['sources']):
+                return False
+            body = pickle.load(f)
+        restored = {}
+        snapshot_modules = restore_modules(body['modules'], body['dav_modules'], restored)
+        snapshot_loaded = restore_modules(body['loaded_modules'], body['dav_modules'], restored)
+        expressions = marshal.loads(body['expressions'])
+    except Exception:
+        return False
+    
+    variables.clear()
+    variables.update(body['variables'])
+    functions.clear()
+    functions.update(body['functions'])
+    modules.clear()
+    modules.update(snapshot_modules)
+    loaded_modules.clear()
+    loaded_modules.update(snapshot_loaded)
+    for expr, entry in expressions[:EXPRESSION_CACHE_SIZE - len(expression_cache)]:
+        expression_cache.setdefault(expr, entry)
+    return True
+
+def boot_prelude(prelude, snapshot=None):
+    """Bring the interpreter to the state a prelude leaves it in, from its snapshot when that is up to date.
+
+    The snapshot is kept next to the module cache unless a path is given. A
+    missing or stale snapshot is never an error: the prelude runs and the
+    snapshot is written again. Returns True when the snapshot was used.
+    """
+    prelude = os.path.abspath(prelude)
+    snapshot = snapshot or os.path.splitext(module_cache_path(prelude))[0] + '.snapshot'
+    if load_snapshot(snapshot):
+        return True
+    
+    import_stack.append(prelude)
+    try:
+        execute_program(compile_module(prelude))
+    finally:
+        import_stack.pop()
+    try:
+        os.makedirs(os.path.dirname(snapshot) or '.', exist_ok=True)
+        save_snapshot(snapshot, [prelude] + list(loaded_modules))
+    except (OSError, ValueError) as e:
+        print(f"Warning: the prelude runs every time, its snapshot was not saved: {e}")
+    return False
+
+# ---------------------------
+# Background tasks
+# ---------------------------
+TASK_WORKERS = 64
+
+class Task:
+    """Handle on a function call running in the background"""
+    def __init__(self, name, future):
+        self.name = name
+        self.future = future
+
+    def __repr__(self):
+        return f"<task {self.name} ({'done' if self.future.done() else 'running'})>"
+
+class TaskRunner:
+    """asyncio event loop, on a background thread, that runs DAV tasks.
+
+    Function bodies are synchronous DAV code, so each task runs in the loop's
+    executor and a task that waits only blocks its own worker thread.
+    """
+    def __init__(self, workers=TASK_WORKERS):
+        import asyncio
+        import concurrent.futures
+        import threading
+        
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='dav-task'))
+        self.thread = threading.Thread(target=self.loop.run_forever, name='dav-tasks', daemon=True)
+        self.thread.start()
+        self.pending = []
+
+    async def run(self, name, args):
+        # The executor does not carry the task's context over: pass it along,
+        # so a task started from a module function runs in that module
+        context = contextvars.copy_context()
+        return await self.loop.run_in_executor(None, context.run, call_function, name, args)
+
+    def start(self, name, args):
+        import asyncio
+        
+        task = Task(name, asyncio.run_coroutine_threadsafe(self.run(name, args), self.loop))
+        self.pending.append(task)
+        return task
+
+    def wait(self, task, timeout=None):
+        """Result of a task, waiting at most timeout seconds for it (TimeoutError after that)"""
+        import concurrent.futures
+        
+        if task in self.pending:
+            self.pending.remove(task)
+        if not concurrent.futures.wait([task.future], timeout).done:
+            raise TimeoutError(f"task {task.name} is still running")
+        return task.future.result()
+
+    def close(self):
+        """Stop the event loop and shut its worker threads down"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def take_pending(self, timeout=None):
+        """Forget the started tasks and return them, waiting for all of them to end (TimeoutError after timeout)"""
+        import concurrent.futures
+        
+        tasks, self.pending = self.pending, []
+        not_done = concurrent.futures.wait([task.future for task in tasks], timeout).not_done
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} tasks are still running")
+        return tasks
+
+task_runner = None
+
+def get_task_runner():
+    """The task runner, started on first use"""
+    global task_runner
+    if task_runner is None:
+        task_runner = TaskRunner()
+    return task_runner
+
+def finish_tasks():
+    """Wait for the tasks a program left running before it ends"""
+    if task_runner is None:
+        return
+    for task in budget_wait(task_runner.take_pending):
+        if task.future.exception() is not None:
+            report_error(f"Error in task {task.name}: {task.future.exception()}")
+
+# ---------------------------
+# Parsed program nodes
+# ---------------------------
+def intern_body(body):
+    """Freeze a parsed body into a tuple, interning its statement strings"""
+    return tuple(sys.intern(item) if isinstance(item, str) else item for item in body)
+
+class Node:
+    """Base class of parsed program nodes; subclasses use __slots__ to stay small"""
+    __slots__ = ()
+    type = None
+
+class StatementNode(Node):
+    __slots__ = ('line',)
+    type = 'statement'
+
+    def __init__(self, line):
+        self.line = sys.intern(line)
+
+class FunctionNode(Node):
+    __slots__ = ('name', 'params', 'body')
+    type = 'function'
+
+    def __init__(self, name, params, body):
+        self.name = sys.intern(name)
+        self.params = tuple(sys.intern(param) for param in params)
+        self.body = intern_body(body)
+
+class IfNode(Node):
+    __slots__ = ('condition', 'if_body', 'else_body')
+    type = 'if'
+
+    def __init__(self, condition, if_body, else_body):
+        self.condition = sys.intern(condition)
+        self.if_body = intern_body(if_body)
+        self.else_body = intern_body(else_body)
+
+class LoopNode(Node):
+    __slots__ = ('loop_line', 'body')
+    type = 'loop'
+
+    def __init__(self, loop_line, body):
+        self.loop_line = sys.intern(loop_line)
+        self.body = intern_body(body)
+
+class ForLoopNode(LoopNode):
+    __slots__ = ()
+    type = 'for_loop'
+
+class DoWhileLoopNode(Node):
+    __slots__ = ('condition', 'body')
+    type = 'do_while_loop'
+
+    def __init__(self, condition, body):
+        self.condition = sys.intern(condition) if condition is not None else None
+        self.body = intern_body(body)
+
 # ---------------------------
 # Parse and group lines into logical blocks with proper indentation handling
 # ---------------------------
@@ -243,7 +1238,7 @@ def parse_logical_blocks(lines):
         
         # Single statement
         else:
-            blocks.append({'type': 'statement', 'line': stripped_line})
+            blocks.append(StatementNode(stripped_line))
             pass
             i += 1
     
@@ -258,7 +1253,7 @@ def parse_function_block_with_indentation(lines, start_i):
     # Extract function name and parameters
     match = re.search(r"(?:create|define|i have) a function (?:named|called) (\w+)", line.lower())
     if not match:
-        return {'type': 'statement', 'line': line}, start_i + 1
+        return StatementNode(line), start_i + 1
     
     func_name = match.group(1)
     
@@ -343,12 +1338,7 @@ def parse_function_block_with_indentation(lines, start_i):
     # Parse the body lines as logical blocks
     body_blocks = parse_logical_blocks(body_lines)
     
-    return {
-        'type': 'function',
-        'name': func_name,
-        'params': params,
-        'body': body_blocks
-    }, i
+    return FunctionNode(func_name, params, body_blocks), i
 
 def parse_if_block_with_indentation(lines, start_i):
     """Parse an if-else block with proper indentation handling"""
@@ -393,12 +1383,7 @@ def parse_if_block_with_indentation(lines, start_i):
         
         i += 1
     
-    return {
-        'type': 'if',
-        'condition': condition,
-        'if_body': if_body,
-        'else_body': else_body
-    }, i
+    return IfNode(condition, if_body, else_body), i
 
 def parse_loop_block_with_indentation(lines, start_i):
     """Parse a loop block with proper indentation handling"""
@@ -427,11 +1412,7 @@ def parse_loop_block_with_indentation(lines, start_i):
         body.append(current_stripped)
         i += 1
     
-    return {
-        'type': 'loop',
-        'loop_line': loop_line,
-        'body': body
-    }, i
+    return LoopNode(loop_line, body), i
 
 def parse_for_block_with_indentation(lines, start_i):
     """Parse a for loop block with proper indentation handling"""
@@ -460,11 +1441,7 @@ def parse_for_block_with_indentation(lines, start_i):
         body.append(current_stripped)
         i += 1
     
-    return {
-        'type': 'for_loop',
-        'loop_line': loop_line,
-        'body': body
-    }, i
+    return ForLoopNode(loop_line, body), i
 
 def parse_do_while_block_with_indentation(lines, start_i):
     """Parse a do-while loop block with proper indentation handling"""
@@ -499,11 +1476,7 @@ def parse_do_while_block_with_indentation(lines, start_i):
         body.append(current_stripped)
         i += 1
     
-    return {
-        'type': 'do_while_loop',
-        'condition': while_condition,
-        'body': body
-    }, i
+    return DoWhileLoopNode(while_condition, body), i
 
 def parse_if_block(lines, start_i):
     """Parse an if-else block"""
@@ -544,12 +1517,7 @@ def parse_if_block(lines, start_i):
         
         i += 1
     
-    return {
-        'type': 'if',
-        'condition': condition,
-        'if_body': if_body,
-        'else_body': else_body
-    }, i
+    return IfNode(condition, if_body, else_body), i
 
 def parse_loop_block(lines, start_i):
     """Parse a loop block"""
@@ -577,17 +1545,14 @@ def parse_loop_block(lines, start_i):
         body.append(line)
         i += 1
     
-    return {
-        'type': 'loop',
-        'loop_line': loop_line,
-        'body': body
-    }, i
+    return LoopNode(loop_line, body), i
 
 # ---------------------------
 # Execute parsed blocks
 # ---------------------------
 def execute_blocks(blocks, local_vars=None):
     """Execute a list of parsed blocks"""
+    variables, functions, modules = namespace()
     if local_vars is None:
         local_vars = {}
     
@@ -596,82 +1561,120 @@ def execute_blocks(blocks, local_vars=None):
     for i, block in enumerate(blocks):
         pass
         try:
-            if block['type'] == 'statement':
+            if block.type == 'statement':
                 pass
-                execute_statement(block['line'], local_vars)
-            elif block['type'] == 'function':
+                execute_statement(block.line, local_vars)
+            elif block.type == 'function':
                 pass
-                functions[block['name']] = (block['params'], block['body'])
-            elif block['type'] == 'if':
+                functions[block.name] = (block.params, block.body)
+            elif block.type == 'if':
                 pass
                 execute_if_block(block, local_vars)
-            elif block['type'] == 'loop':
+            elif block.type == 'loop':
                 pass
                 execute_loop_block(block, local_vars)
-            elif block['type'] == 'for_loop':
+            elif block.type == 'for_loop':
                 pass
                 execute_for_loop_block(block, local_vars)
-            elif block['type'] == 'do_while_loop':
+            elif block.type == 'do_while_loop':
                 pass
                 execute_do_while_loop_block(block, local_vars)
-        except (BreakLoop, ContinueLoop, ReturnValue):
+        except (BreakLoop, ContinueLoop, ReturnValue, BudgetExceeded):
             raise
         except Exception as e:
-            print(f"Error in block {i}: {e}")
+            report_error(f"Error in block {i}: {e}")
             import traceback
             traceback.print_exc()
 
 def execute_statement(line, local_vars):
     """Execute a single statement"""
+    if execution_budget is not None:
+        execution_budget.step()
     line = line.strip()
+    lowered = line.lower()
+    statement = STATEMENT_PATTERN.match(lowered)
+    
+    # Declarations, assignments and increments, recognized in one pass
+    if statement is not None:
+        kind = statement.lastgroup
+        if kind == 'declaration':
+            handle_variable_declaration(line, statement)
+        elif kind == 'increment':
+            handle_increment_decrement(line, local_vars, statement)
+        else:
+            handle_assignment(line, local_vars, statement)
+    
+    # File input/output in English
+    elif lowered.startswith(("read ", "write ")) or (lowered.startswith("append ") and (" to file " in lowered or " to the file " in lowered)):
+        handle_file_io(line, local_vars)
+    
+    # Background tasks in English
+    elif lowered.startswith(("start task ", "start the task ", "wait ")):
+        handle_task(line, local_vars)
+    
+    # Actors in English
+    elif lowered.startswith(("start actor ", "start the actor ", "run the actors", "run actors", "run all actors", "yield")):
+        handle_actor(line, local_vars)
+    
+    # Channels in English
+    elif lowered.startswith(("send ", "receive ", "close ")):
+        handle_channel(line, local_vars)
     
     # Variable declarations in English
-    if any(phrase in line.lower() for phrase in ["i have a", "i have an", "create a", "create an"]):
+    elif any(phrase in lowered for phrase in ["i have a", "i have an", "create a", "create an"]):
         handle_variable_declaration(line)
     
-    # Set/Assign variable in English
-    elif any(phrase in line.lower() for phrase in ["set ", "assign ", "put "]):
+    # Text builder finalization in English
+    elif lowered.startswith("build "):
+        handle_text_builder_build(line, local_vars)
+    
+    # Set/Assign variable in English, later in the line ("Then set x to 5")
+    elif search_statement(lowered, ASSIGNMENT_KINDS):
         handle_assignment(line, local_vars)
     
     # Ask user for input in English
-    elif "ask the user" in line.lower():
+    elif "ask the user" in lowered:
         handle_user_input(line, local_vars)
     
     # Import modules in English
-    elif "import " in line.lower():
+    elif "import " in lowered:
         handle_import(line)
     
     # Return statement in English
-    elif any(phrase in line.lower() for phrase in ["i will return", "return"]):
+    elif any(phrase in lowered for phrase in ["i will return", "return"]):
         handle_return(line, local_vars)
     
     # Break and continue in English
-    elif line.lower().strip() == "break":
+    elif lowered == "break":
         raise BreakLoop()
-    elif line.lower().strip() == "continue":
+    elif lowered == "continue":
         raise ContinueLoop()
     
     # List operations in English
-    elif "add " in line.lower() and " to " in line.lower():
+    elif "add " in lowered and " to " in lowered:
         handle_list_add(line, local_vars)
     
-    elif "remove " in line.lower() and " from " in line.lower():
+    elif "remove " in lowered and " from " in lowered:
         handle_list_remove(line, local_vars)
     
+    # Memory report in English
+    elif MEMORY_STATEMENT_PATTERN.match(lowered):
+        handle_memory_report()
+    
     # Display/Print operations in English
-    elif any(word in line.lower() for word in ["show ", "display ", "print "]):
+    elif any(word in lowered for word in ["show ", "display ", "print "]):
         handle_display(line, local_vars)
     
     # Increase/Decrease operations in English
-    elif "increase " in line.lower() or "decrease " in line.lower():
+    elif "increase " in lowered or "decrease " in lowered:
         handle_increment_decrement(line, local_vars)
     
     # Function calls with "Call function with parameter"
-    elif line.lower().startswith("call "):
+    elif lowered.startswith("call "):
         handle_function_call(line, local_vars)
     
     # Line break control
-    elif line.lower().strip() == "line":
+    elif lowered == "line":
         print()  # Force newline
     
     # General assignment (fallback)
@@ -683,16 +1686,17 @@ def execute_statement(line, local_vars):
 
 def execute_if_block(block, local_vars):
     """Execute an if block"""
-    condition = block['condition']
+    condition = block.condition
     
     if eval_expr(condition, local_vars):
-        execute_block(block['if_body'], local_vars)
-    elif block['else_body']:
-        execute_block(block['else_body'], local_vars)
+        execute_block(block.if_body, local_vars)
+    elif block.else_body:
+        execute_block(block.else_body, local_vars)
 
 def execute_loop_block(block, local_vars):
     """Execute a loop block"""
-    loop_line = block['loop_line']
+    variables, functions, modules = namespace()
+    loop_line = block.loop_line
     
     if "repeat " in loop_line.lower() and "times" in loop_line.lower():
         match = re.search(r"repeat (\d+) times", loop_line.lower())
@@ -700,7 +1704,7 @@ def execute_loop_block(block, local_vars):
             times = int(match.group(1))
             for _ in range(times):
                 try:
-                    execute_block(block['body'], local_vars)
+                    execute_loop_body(block.body, local_vars)
                 except BreakLoop:
                     break
                 except ContinueLoop:
@@ -712,7 +1716,7 @@ def execute_loop_block(block, local_vars):
         condition = loop_line[6:].rstrip(':').strip()
         while eval_expr(condition, local_vars):
             try:
-                execute_block(block['body'], local_vars)
+                execute_loop_body(block.body, local_vars)
             except BreakLoop:
                 break
             except ContinueLoop:
@@ -736,7 +1740,7 @@ def execute_loop_block(block, local_vars):
             for item in items:
                 local_vars[var_name] = item
                 try:
-                    execute_block(block['body'], local_vars)
+                    execute_loop_body(block.body, local_vars)
                 except BreakLoop:
                     break
                 except ContinueLoop:
@@ -744,12 +1748,325 @@ def execute_loop_block(block, local_vars):
                 except ReturnValue:
                     raise
 
-def execute_for_loop_block(block, local_vars):
-    """Execute a for loop block"""
-    loop_line = block['loop_line'].lower()
+# ---------------------------
+# Parallel for-each loops
+# ---------------------------
+PARALLEL_CHUNKS_PER_WORKER = 4
+
+def parallel_worker_count():
+    """Number of cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def is_picklable(value):
+    """Whether a value can be copied to a worker process"""
+    import pickle
+    try:
+        pickle.dumps(value)
+    except Exception:
+        return False
+    return True
+
+def snapshot_state():
+    """Copy of the interpreter state that worker processes start from"""
+    variables, functions, modules = namespace()
+    dav_modules = {}
+    return {
+        'variables': {name: value for name, value in variables.items() if is_picklable(value)},
+        'functions': dict(functions),
+        'modules': module_references(modules, dav_modules),
+        'dav_modules': dav_modules,
+    }
+
+def init_parallel_worker(state):
+    """Process pool initializer: install the parent's functions, variables and modules"""
+    variables.clear()
+    variables.update(state['variables'])
+    functions.clear()
+    functions.update(state['functions'])
+    modules.clear()
+    modules.update(restore_modules(state['modules'], state['dav_modules'], {}))
+    # Events from workers would never reach the hooks' owner
+    remove_hooks()
+
+def run_parallel_chunk(task):
+    """Run a loop body over one chunk of items inside a worker.
+
+    Returns the items the chunk added to the output list and everything it
+    printed, so the parent can merge both in chunk order.
+    """
+    import contextlib
+    import io
+    
+    body, var_name, items, local_vars, output_name = task
+    collected = []
+    scope = local_vars if output_name in local_vars else variables
+    previous = scope.get(output_name)
+    if output_name:
+        scope[output_name] = collected
+    
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            for item in items:
+                local_vars[var_name] = item
+                try:
+                    execute_block(body, local_vars)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+        finally:
+            flush_file_buffers()
+            if output_name:
+                scope[output_name] = previous
+    return collected, output.getvalue()
+
+def split_chunks(items, count):
+    """Split a list into at most count contiguous chunks of near-equal size"""
+    size, extra = divmod(len(items), count)
+    chunks, start = [], 0
+    for k in range(count):
+        end = start + size + (1 if k < extra else 0)
+        if end > start:
+            chunks.append(items[start:end])
+        start = end
+    return chunks
+
+def parallel_pool_context():
+    """Start method for worker processes.
+
+    Forking would copy locks held by task threads into the workers, so
+    workers start from a fork server, or a fresh interpreter where there is none.
+    """
+    import multiprocessing
     
-    # Handle different for loop patterns
-    if " in range " in loop_line:
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+def run_parallel_tasks(worker, tasks, state, workers=None):
+    """Run worker(task) for every task in a process pool, returning results in task order.
+
+    Falls back to running the tasks in this process when there is a single
+    core, a single task, or when the pool cannot be used. If the pool breaks
+    part way, only the tasks that did not finish in it run again here.
+    """
+    import concurrent.futures
+    import itertools
+    
+    futures = []
+    workers = min(len(tasks), workers or parallel_worker_count())
+    if workers > 1:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=parallel_pool_context(),
+                                                        initializer=init_parallel_worker,
+                                                        initargs=(state,)) as pool:
+                for task in tasks:
+                    futures.append(pool.submit(worker, task))
+        except (OSError, ImportError, NotImplementedError, concurrent.futures.BrokenExecutor):
+            pass
+    
+    # Leaving the pool waited for every submitted task
+    results = []
+    for task, future in itertools.zip_longest(tasks, futures):
+        if future is None or isinstance(future.exception(), concurrent.futures.BrokenExecutor):
+            results.append(worker(task))
+        else:
+            results.append(future.result())
+    return results
+
+PARALLEL_MIN_CHUNK = 16
+
+def plan_chunks(items, workers):
+    """Split a list for a pool: a few chunks per worker, none much smaller than PARALLEL_MIN_CHUNK items"""
+    count = min(workers * PARALLEL_CHUNKS_PER_WORKER, max(1, len(items) // PARALLEL_MIN_CHUNK))
+    return split_chunks(items, count)
+
+def run_function_chunk(task):
+    """Apply ('map') or fold ('reduce') a user function over one chunk of items inside a worker"""
+    import contextlib
+    import io
+    
+    mode, name, items = task
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            if mode == 'map':
+                result = [call_function(name, [item]) for item in items]
+            else:
+                result = items[0]
+                for item in items[1:]:
+                    result = call_function(name, [result, item])
+        finally:
+            flush_file_buffers()
+    return result, output.getvalue()
+
+def run_function_chunks(mode, function, items, workers):
+    """Run a user function over chunks of items in a pool, replaying printed output in chunk order"""
+    tasks = [(mode, function.name, chunk) for chunk in plan_chunks(items, workers)]
+    results = []
+    for result, printed in run_parallel_tasks(run_function_chunk, tasks, snapshot_state(), workers):
+        if printed:
+            sys.stdout.write(printed)
+        results.append(result)
+    return results
+
+def map_parallel(items, function):
+    """Apply a function to every item of a list in worker processes, keeping the list order.
+
+    Small lists, single-core machines and functions that are not user
+    functions run serially in this process.
+    """
+    items = list(items)
+    workers = parallel_worker_count()
+    if not isinstance(function, FunctionRef) or workers < 2 or len(items) < 2 * PARALLEL_MIN_CHUNK:
+        return [function(item) for item in items]
+    return [result for chunk in run_function_chunks('map', function, items, workers) for result in chunk]
+
+def reduce_parallel(items, function, initial):
+    """Fold a list with a two-argument function, folding chunks in worker processes.
+
+    The function must be associative: every chunk is folded on its own, then
+    the initial value is folded with the chunk results in list order.
+    """
+    items = list(items)
+    workers = parallel_worker_count()
+    if not isinstance(function, FunctionRef) or workers < 2 or len(items) < 2 * PARALLEL_MIN_CHUNK:
+        partials = items
+    else:
+        partials = run_function_chunks('reduce', function, items, workers)
+    result = initial
+    for partial in partials:
+        result = function(result, partial)
+    return result
+
+# Built-in functions available in expressions
+builtin_functions = {
+    'map_parallel': map_parallel,
+    'reduce_parallel': reduce_parallel,
+}
+
+def parallel_body_targets(line):
+    """Names a statement changes: the ones it assigns, and the ones it adds to, removes from or increases"""
+    written, _, _ = statement_bindings(line)
+    match = re.match(r"(?:add|remove) (?:the line )?.+ (?:to|from) (\w+)\.?$", line.lower().strip()) or \
+        re.match(r"(?:increase|decrease) (\w+) by ", line.lower().strip())
+    return written + [match.group(1)] if match else written
+
+def check_parallel_body(body, var_name, output_name, local_vars):
+    """Refuse a parallel for-each body whose result would differ from the plain loop's.
+
+    Workers run the body on copies of the variables: a Break would only end
+    its own chunk, and changes to variables that exist before the loop would
+    be lost. The body may add to the output list and use the names it creates.
+    """
+    variables, functions, modules = namespace()
+    for line in iter_block_statements(body):
+        if line.strip().lower() == "break":
+            raise ValueError("Break cannot be used in a parallel loop: it would only end one worker's chunk")
+        for name in parallel_body_targets(line):
+            if name not in (var_name, output_name) and (name in local_vars or name in variables):
+                raise ValueError(f"'{name}' cannot be changed in a parallel loop: the workers change copies of it. "
+                                 f"Collect the values into the output list instead")
+
+def execute_parallel_for(block, var_name, list_name, output_name, local_vars):
+    """Run a for-each body over chunks of a list in worker processes.
+
+    Each worker starts from a copy of the functions and global variables.
+    Printed output and items added to the output list are merged back in
+    list order, so the result does not depend on scheduling. Only those come
+    back: check_parallel_body refuses bodies that Break or change other
+    variables, and the names the body creates are dropped after the loop,
+    even when it runs in this process. Functions the body calls run in the
+    workers too, so their changes to global variables are lost.
+    """
+    variables, functions, modules = namespace()
+    check_parallel_body(block.body, var_name, output_name, local_vars)
+    if list_name in local_vars:
+        items = local_vars[list_name]
+    else:
+        items = variables.get(list_name, [])
+    items = list(items)
+    if not items:
+        return
+    
+    if output_name:
+        scope = local_vars if output_name in local_vars else variables
+        if not isinstance(scope.get(output_name), list):
+            scope[output_name] = []
+        output = scope[output_name]
+    
+    workers = parallel_worker_count()
+    if workers < 2 or len(items) < 2:
+        # Nothing to gain from a pool: run the loop in this process, keeping
+        # what the body creates to itself as the workers would
+        global_names, local_names = set(variables), set(local_vars)
+        try:
+            for item in items:
+                local_vars[var_name] = item
+                try:
+                    execute_loop_body(block.body, local_vars)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+        finally:
+            for name in set(variables) - global_names:
+                del variables[name]
+            for name in set(local_vars) - local_names:
+                del local_vars[name]
+        return
+    
+    flush_file_buffers()
+    shared_locals = {name: value for name, value in local_vars.items() if is_picklable(value)}
+    chunk_count = workers * PARALLEL_CHUNKS_PER_WORKER
+    tasks = [(block.body, var_name, chunk, dict(shared_locals), output_name)
+             for chunk in split_chunks(items, chunk_count)]
+    
+    for collected, printed in run_parallel_tasks(run_parallel_chunk, tasks, snapshot_state(), workers):
+        if printed:
+            sys.stdout.write(printed)
+        if output_name:
+            output.extend(collected)
+
+def execute_for_loop_block(block, local_vars):
+    """Execute a for loop block"""
+    variables, functions, modules = namespace()
+    loop_line = block.loop_line.lower()
+
+    # Handle different for loop patterns
+    if " in file " in loop_line or " in the file " in loop_line:
+        # "For each line in file "data.txt" with encoding "latin-1" trimmed:"
+        match = re.search(r"""for (?:each )?(\w+) in (?:the )?file ("[^"]*"|'[^']*'|\w+)"""
+                          r"""(?: with encoding ("[^"]*"|'[^']*'|[\w-]+))?( trimmed)?""",
+                          block.loop_line, re.IGNORECASE)
+        if match:
+            var_name, path_operand, encoding, trimmed = match.groups()
+            var_name = var_name.lower()
+            path = eval_file_path(path_operand, local_vars)
+            encoding = encoding.strip('"\'') if encoding else 'utf-8'
+
+            for item in iter_file_lines(path, encoding, strip=bool(trimmed)):
+                local_vars[var_name] = item
+                try:
+                    execute_loop_body(block.body, local_vars)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+                except ReturnValue:
+                    raise
+
+    elif " in parallel" in loop_line:
+        # "For each item in numbers in parallel collecting into results:"
+        match = re.search(r"for (?:each )?(\w+) in (\w+) in parallel(?: collecting into (\w+))?", loop_line)
+        if match:
+            var_name, list_name, output_name = match.groups()
+            execute_parallel_for(block, var_name, list_name, output_name, local_vars)
+    
+    elif " in range " in loop_line:
         # "For j in range 1 to 3:"
         match = re.search(r"for (\w+) in range (\d+) to (\d+)", loop_line)
         if match:
@@ -760,7 +2077,7 @@ def execute_for_loop_block(block, local_vars):
             for i in range(start_val, end_val + 1):
                 local_vars[var_name] = i
                 try:
-                    execute_block(block['body'], local_vars)
+                    execute_loop_body(block.body, local_vars)
                 except BreakLoop:
                     break
                 except ContinueLoop:
@@ -775,7 +2092,7 @@ def execute_for_loop_block(block, local_vars):
             times = int(match.group(1))
             for i in range(times):
                 try:
-                    execute_block(block['body'], local_vars)
+                    execute_loop_body(block.body, local_vars)
                 except BreakLoop:
                     break
                 except ContinueLoop:
@@ -800,7 +2117,7 @@ def execute_for_loop_block(block, local_vars):
             for item in items:
                 local_vars[var_name] = item
                 try:
-                    execute_block(block['body'], local_vars)
+                    execute_loop_body(block.body, local_vars)
                 except BreakLoop:
                     break
                 except ContinueLoop:
@@ -810,12 +2127,12 @@ def execute_for_loop_block(block, local_vars):
 
 def execute_do_while_loop_block(block, local_vars):
     """Execute a do-while loop block"""
-    condition = block['condition']
+    condition = block.condition
     
     # Execute the body at least once
     while True:
         try:
-            execute_block(block['body'], local_vars)
+            execute_loop_body(block.body, local_vars)
         except BreakLoop:
             break
         except ContinueLoop:
@@ -835,7 +2152,7 @@ def execute_block(lines, local_vars=None):
         local_vars = {}
     
     # If lines is a list of strings, we need to handle if/otherwise specially
-    if isinstance(lines, list) and lines and isinstance(lines[0], str):
+    if isinstance(lines, (list, tuple)) and lines and isinstance(lines[0], str):
         i = 0
         while i < len(lines):
             line = lines[i].strip()
@@ -855,8 +2172,15 @@ def execute_block(lines, local_vars=None):
         # If it's already parsed blocks
         execute_blocks(lines, local_vars)
 
-def handle_if_condition_direct(lines, start_index, local_vars):
-    """Handle if conditions directly from line array with proper nesting"""
+# Loops run their bodies through this name, so that statistics can count iterations
+execute_loop_body = execute_block
+
+def split_if_lines(lines, start_index):
+    """Split an if/otherwise statement out of a flat body.
+
+    Returns the condition, the if body, the otherwise body and the index of
+    the first line after the statement.
+    """
     line = lines[start_index].strip()
     condition = line[3:].rstrip(':').strip()  # Remove "if " and potential ":"
     
@@ -899,8 +2223,11 @@ def handle_if_condition_direct(lines, start_index, local_vars):
         
         i += 1
     
-    pass
-    pass
+    return condition, if_body, else_body, i
+
+def handle_if_condition_direct(lines, start_index, local_vars):
+    """Handle if conditions directly from line array with proper nesting"""
+    condition, if_body, else_body, i = split_if_lines(lines, start_index)
     
     # Evaluate condition and execute appropriate body
     condition_result = eval_expr(condition, local_vars)
@@ -916,73 +2243,321 @@ def handle_if_condition_direct(lines, start_index, local_vars):
     return i
 
 # ---------------------------
-# Handler functions in English
+# Actors: cooperative green threads
 # ---------------------------
-def handle_variable_declaration(line):
-    """Handle variable declarations in English like 'I have a number called x'"""
-    patterns = [
-        r"i have a (\w+) called (\w+)",
-        r"i have an (\w+) called (\w+)",
-        r"create a (\w+) called (\w+)",
-        r"create an (\w+) called (\w+)",
-        r"i have a (\w+) named (\w+)",
-        r"i have an (\w+) named (\w+)"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, line.lower())
-        if match:
-            var_type, var_name = match.groups()
-            # Initialize with appropriate default value
-            if var_type in ['number', 'integer', 'num']:
-                variables[var_name] = 0
-            elif var_type in ['string', 'text', 'word']:
-                variables[var_name] = ""
-            elif var_type in ['boolean', 'bool']:
-                variables[var_name] = False
-            elif var_type in ['list', 'array']:
-                variables[var_name] = []
-            elif var_type in ['dictionary', 'dict']:
-                variables[var_name] = {}
-            else:
-                variables[var_name] = None
-            break
+# Yielded by an actor that waits on a channel, so the scheduler tries the others first
+ACTOR_BLOCKED = object()
 
-def handle_assignment(line, local_vars):
-    """Handle assignments in English like 'Set x to 5' or 'Put 5 in x'"""
-    patterns = [
-        r"set (\w+) to (.+)",
-        r"put (.+) in (\w+)",
-        r"assign (.+) to (\w+)"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, line.lower())
-        if match:
-            if "put" in pattern:
-                value_expr, var_name = match.groups()
-            else:
-                var_name, value_expr = match.groups()
-            
-            # Clean up value expression (remove trailing period)
-            value_expr = value_expr.strip()
-            if value_expr.endswith('.'):
-                value_expr = value_expr[:-1].strip()
+class Actor:
+    """A user function call run as a generator that the scheduler resumes"""
+    __slots__ = ('name', 'generator', 'done', 'result')
+
+    def __init__(self, name, generator):
+        self.name = name
+        self.generator = generator
+        self.done = False
+        self.result = None
+
+    def __repr__(self):
+        return f"<actor {self.name} ({f'done: {self.result}' if self.done else 'running'})>"
+
+class ActorScheduler:
+    """Round-robin scheduler that interleaves actors in one thread.
+
+    Ready actors run in turn until their next suspension point: a Yield, a
+    Wait, or a channel that is empty (receive) or full (send). Sleeping
+    actors wait in a heap ordered by wake-up time.
+    """
+    def __init__(self):
+        import collections
+        self.ready = collections.deque()
+        self.sleeping = []
+        self.sequence = 0
+        self.switches = 0
+
+    def spawn(self, name, args):
+        actor = Actor(name, actor_body(name, args))
+        self.ready.append(actor)
+        return actor
+
+    def run(self):
+        """Run until every actor has finished"""
+        import heapq
+        import time
+        
+        ready, sleeping = self.ready, self.sleeping
+        blocked = 0
+        while ready or sleeping:
+            if sleeping:
+                now = time.monotonic()
+                while sleeping and sleeping[0][0] <= now:
+                    ready.append(heapq.heappop(sleeping)[2])
+                    blocked = 0
+                if not ready or blocked > len(ready):
+                    budget_sleep(max(0.0, sleeping[0][0] - now))
+                    continue
+            elif blocked > len(ready):
+                ready.clear()
+                raise RuntimeError("every actor is waiting on a channel")
             
-            value = eval_expr(value_expr, local_vars)
+            actor = ready.popleft()
+            try:
+                signal = next(actor.generator)
+            except StopIteration as stop:
+                actor.done, actor.result = True, stop.value
+                blocked = 0
+                continue
+            except BudgetExceeded:
+                raise
+            except Exception as e:
+                report_error(f"Error in actor {actor.name}: {e}")
+                actor.done = True
+                continue
             
-            if var_name in local_vars:
-                local_vars[var_name] = value
+            self.switches += 1
+            if signal is ACTOR_BLOCKED:
+                blocked += 1
+                ready.append(actor)
+            elif signal:
+                blocked = 0
+                self.sequence += 1
+                heapq.heappush(sleeping, (time.monotonic() + signal, self.sequence, actor))
             else:
-                variables[var_name] = value
+                blocked = 0
+                ready.append(actor)
+
+actor_scheduler = None
+
+def get_actor_scheduler():
+    """The actor scheduler, created on first use"""
+    global actor_scheduler
+    if actor_scheduler is None:
+        actor_scheduler = ActorScheduler()
+    return actor_scheduler
+
+def actor_body(name, args):
+    """Generator that runs a user function call, suspending at statement boundaries"""
+    variables, functions, modules = namespace()
+    if name not in functions:
+        return None
+    params, body = functions[name]
+    local_vars = {param: args[i] if i < len(args) else None for i, param in enumerate(params)}
+    try:
+        yield from actor_blocks(body, local_vars)
+    except ReturnValue as rv:
+        return rv.value
+    return None
+
+def actor_blocks(blocks, local_vars):
+    """Generator counterpart of execute_blocks and execute_block for actor bodies"""
+    variables, functions, modules = namespace()
+    i = 0
+    while i < len(blocks):
+        block = blocks[i]
+        i += 1
+        if isinstance(block, str):
+            line = block.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.lower().startswith("if "):
+                condition, if_body, else_body, i = split_if_lines(blocks, i - 1)
+                yield from actor_blocks(if_body if eval_expr(condition, local_vars) else else_body, local_vars)
+            elif is_suspension_point(line):
+                yield from actor_statement(line, local_vars)
+            else:
+                execute_statement(line, local_vars)
+        elif block.type == 'statement':
+            if is_suspension_point(block.line):
+                yield from actor_statement(block.line, local_vars)
+            else:
+                execute_statement(block.line, local_vars)
+        elif block.type == 'if':
+            if eval_expr(block.condition, local_vars):
+                yield from actor_blocks(block.if_body, local_vars)
+            else:
+                yield from actor_blocks(block.else_body, local_vars)
+        elif block.type in ('loop', 'for_loop'):
+            yield from actor_loop(block, local_vars)
+        elif block.type == 'do_while_loop':
+            while True:
+                try:
+                    yield from actor_blocks(block.body, local_vars)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    pass
+                if block.condition and not eval_expr(block.condition, local_vars):
+                    break
+        elif block.type == 'function':
+            functions[block.name] = (block.params, block.body)
+
+def is_suspension_point(line):
+    """Whether a statement may suspend an actor"""
+    return line.lower().startswith(("yield", "wait ", "send ", "receive "))
+
+def actor_statement(line, local_vars):
+    """Run one statement of an actor, yielding where it has to wait"""
+    lower = line.lower().strip().rstrip('.')
+    if lower == "yield":
+        yield None
+        return
+    match = re.search(r"wait (.+?) seconds?$", lower)
+    if match:
+        yield to_number(eval_expr(match.group(1), local_vars)) or None
+        return
+    match = (re.search(r"send .+ to (?:the channel )?(\w+)$", lower) or
+             re.search(r"receive (?:a value )?from (?:the channel )?(\w+) into", lower))
+    if match:
+        channel = eval_expr(match.group(1), local_vars)
+        if isinstance(channel, Channel):
+            wait_while = channel.full if lower.startswith("send ") else channel.empty
+            while wait_while():
+                yield ACTOR_BLOCKED
+    execute_statement(line, local_vars)
+
+def actor_loop(block, local_vars):
+    """Generator counterpart of the loop executors; forms without a yielding version run to completion"""
+    variables, functions, modules = namespace()
+    loop_line = block.loop_line.lower()
+    var_name, channel, iterations = None, None, None
+    
+    match = re.search(r"(?:repeat|for) (\d+) times", loop_line)
+    if match:
+        iterations = range(int(match.group(1)))
+    elif loop_line.startswith("while "):
+        condition = block.loop_line[6:].rstrip(':').strip()
+        iterations = iter(lambda: bool(eval_expr(condition, local_vars)), False)
+    elif " in file " in loop_line or " in the file " in loop_line or " in parallel" in loop_line:
+        pass
+    elif " in range " in loop_line:
+        match = re.search(r"for (\w+) in range (\d+) to (\d+)", loop_line)
+        if match:
+            var_name = match.group(1)
+            iterations = range(int(match.group(2)), int(match.group(3)) + 1)
+    else:
+        match = re.search(r"for (?:each )?(\w+) in (\w+)", loop_line)
+        if match:
+            var_name, list_name = match.groups()
+            items = local_vars[list_name] if list_name in local_vars else variables.get(list_name, [])
+            if isinstance(items, Channel):
+                channel = items
+            else:
+                iterations = items
+    
+    if iterations is None and channel is None:
+        if block.type == 'for_loop':
+            execute_for_loop_block(block, local_vars)
+        else:
+            execute_loop_block(block, local_vars)
+        return
+    
+    iterator = iter(iterations) if channel is None else None
+    while True:
+        if channel is not None:
+            while channel.empty():
+                yield ACTOR_BLOCKED
+            value = channel.next_value()
+            if value is Channel.CLOSED:
+                break
+        else:
+            value = next(iterator, ACTOR_BLOCKED)
+            if value is ACTOR_BLOCKED:
+                break
+        if var_name:
+            local_vars[var_name] = value
+        try:
+            yield from actor_blocks(block.body, local_vars)
+        except BreakLoop:
             break
+        except ContinueLoop:
+            continue
+
+# ---------------------------
+# Statement grammar
+# ---------------------------
+# One alternative per statement kind, with named groups for its operands
+# (prefixed with the kind, since group names must be unique). The combined
+# pattern recognizes a statement and extracts its operands in a single pass.
+STATEMENT_GRAMMAR = {
+    'declaration': r"(?:i have|create) an? (?P<declaration_type>text builder|\w+) (?:called|named) (?P<declaration_name>\w+)"
+                   r"(?: with (?:a )?capacity (?:of )?(?P<declaration_capacity>.+?)\.?$)?",
+    'set': r"set (?P<set_name>\w+) to (?P<set_value>.+)",
+    'put': r"put (?P<put_value>.+) in (?P<put_name>\w+)",
+    'assign': r"assign (?P<assign_name>.+) to (?P<assign_value>\w+)",
+    'increment': r"(?P<increment_verb>increase|decrease) (?P<increment_name>\w+) by (?P<increment_amount>.+)",
+}
+STATEMENT_PATTERN = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in STATEMENT_GRAMMAR.items()))
+STATEMENT_KIND_PATTERNS = {kind: re.compile(f"(?P<{kind}>{pattern})") for kind, pattern in STATEMENT_GRAMMAR.items()}
+ASSIGNMENT_KINDS = ('set', 'put', 'assign')
+
+def search_statement(lowered, kinds):
+    """Match for the first of these statement kinds found anywhere in the line, or None"""
+    for kind in kinds:
+        match = STATEMENT_KIND_PATTERNS[kind].search(lowered)
+        if match:
+            return match
+    return None
+
+# ---------------------------
+# Handler functions in English
+# ---------------------------
+def handle_variable_declaration(line, match=None):
+    """Handle variable declarations in English like 'I have a number called x'"""
+    variables, functions, modules = namespace()
+    match = match or search_statement(line.lower(), ('declaration',))
+    if not match:
+        return
+    var_type, var_name, capacity_expr = match.group('declaration_type', 'declaration_name', 'declaration_capacity')
+    # Initialize with appropriate default value
+    if var_type == 'text builder':
+        variables[var_name] = TextBuilder()
+    elif var_type == 'channel':
+        capacity = int(to_number(eval_expr(capacity_expr))) if capacity_expr else CHANNEL_CAPACITY
+        variables[var_name] = Channel(capacity)
+    elif var_type in ['number', 'integer', 'num']:
+        variables[var_name] = 0
+    elif var_type in ['string', 'text', 'word']:
+        variables[var_name] = ""
+    elif var_type in ['boolean', 'bool']:
+        variables[var_name] = False
+    elif var_type in ['list', 'array']:
+        variables[var_name] = []
+    elif var_type in ['dictionary', 'dict']:
+        variables[var_name] = {}
+    else:
+        variables[var_name] = None
+
+def handle_assignment(line, local_vars, match=None):
+    """Handle assignments in English like 'Set x to 5' or 'Put 5 in x'"""
+    variables, functions, modules = namespace()
+    match = match or search_statement(line.lower(), ASSIGNMENT_KINDS)
+    if not match:
+        return
+    kind = match.lastgroup
+    var_name, value_expr = match.group(kind + '_name', kind + '_value')
+    
+    # Clean up value expression (remove trailing period)
+    value_expr = value_expr.strip()
+    if value_expr.endswith('.'):
+        value_expr = value_expr[:-1].strip()
+    
+    value = eval_expr(value_expr, local_vars)
+    
+    if var_name in local_vars:
+        local_vars[var_name] = value
+    else:
+        variables[var_name] = value
+
+# Where the user's answers come from; dav_replay swaps in a recording or a replay
+read_input = input
 
 def handle_user_input(line, local_vars):
     """Handle user input in English like 'Ask the user for a value for n'"""
+    variables, functions, modules = namespace()
     match = re.search(r"ask the user.*?(?:for a value for|for) (\w+)", line.lower())
     if match:
         var_name = match.group(1)
-        user_input = input(f"Enter a value for {var_name}: ")
+        user_input = read_input(f"Enter a value for {var_name}: ")
         
         # Try to convert to appropriate type
         value = user_input
@@ -998,20 +2573,142 @@ def handle_user_input(line, local_vars):
             variables[var_name] = value
 
 def handle_import(line):
-    """Handle imports in English like 'Import the math module'"""
+    """Handle imports in English like 'Import the math module' or 'Import the file utils.dav'"""
+    variables, functions, modules = namespace()
+    match = re.search(r"""import (?:the )?file ("[^"]*"|'[^']*'|[\w./\\-]+?)(?: as (\w+))?\.?$""", line, re.IGNORECASE)
+    if match:
+        filename, alias = match.groups()
+        import_dav_file(filename.strip('"\''), alias.lower() if alias else None)
+        return
+    
     match = re.search(r"import (?:the )?(?:module )?(\w+)", line.lower())
     if match:
         module_name = match.group(1)
         try:
-            if module_name == 'math':
-                modules['math'] = math
-            elif module_name == 'random':
-                modules['random'] = random
-            else:
-                modules[module_name] = importlib.import_module(module_name)
+            import importlib
+            modules[module_name] = importlib.import_module(module_name)
         except ImportError:
             print(f"Warning: Unable to import module {module_name}")
 
+def handle_file_io(line, local_vars):
+    """Handle file statements in English like 'Read the file "data.txt" into text'"""
+    variables, functions, modules = namespace()
+    path_pattern = r"""("[^"]*"|'[^']*'|\w+)"""
+
+    match = re.search(r"read (?:the )?numbers from (?:the )?file " + path_pattern + r" into (\w+)", line, re.IGNORECASE)
+    if match:
+        path_operand, var_name = match.groups()
+        value = read_file_numbers(eval_file_path(path_operand, local_vars))
+    else:
+        match = re.search(r"read (?:the )?file " + path_pattern +
+                          r"""(?: with encoding ("[^"]*"|[\w-]+))? into (\w+)""", line, re.IGNORECASE)
+        if match:
+            path_operand, encoding, var_name = match.groups()
+            encoding = encoding.strip('"') if encoding else 'utf-8'
+            value = read_file_text(eval_file_path(path_operand, local_vars), encoding)
+
+    if match:
+        var_name = var_name.lower()
+        if var_name in local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+        return
+
+    match = re.search(r"append (?:the line )?(.+) to (?:the )?file " + path_pattern, line, re.IGNORECASE)
+    if match:
+        value_expr, path_operand = match.groups()
+        append_file_line(eval_file_path(path_operand, local_vars), eval_expr(value_expr, local_vars))
+        return
+
+    match = re.search(r"write (?:the list )?(.+) to (?:the )?file " + path_pattern, line, re.IGNORECASE)
+    if match:
+        value_expr, path_operand = match.groups()
+        write_file(eval_file_path(path_operand, local_vars), eval_expr(value_expr, local_vars))
+
+def handle_actor(line, local_vars):
+    """Handle actors in English like 'Start actor worker with 5 as w' or 'Run the actors'"""
+    variables, functions, modules = namespace()
+    lower = line.lower().strip().rstrip('.')
+    
+    match = re.search(r"start (?:the )?actor (\w+)(?: with (.+?))?(?: as (\w+))?$", lower)
+    if match:
+        func_name, args_expr, var_name = match.groups()
+        args = [eval_expr(part.strip(), local_vars) for part in args_expr.split(" and ")] if args_expr else []
+        actor = get_actor_scheduler().spawn(func_name, args)
+        if var_name:
+            if var_name in local_vars:
+                local_vars[var_name] = actor
+            else:
+                variables[var_name] = actor
+    elif lower.startswith("run"):
+        get_actor_scheduler().run()
+    # "Yield" outside an actor has nothing to give way to
+
+def handle_task(line, local_vars):
+    """Handle background tasks in English like 'Start task fetch with url as job' or 'Wait for task job into page'"""
+    variables, functions, modules = namespace()
+    lower = line.lower().strip().rstrip('.')
+    
+    match = re.search(r"start (?:the )?task (\w+)(?: with (.+?))?(?: as (\w+))?$", lower)
+    if match:
+        func_name, args_expr, var_name = match.groups()
+        args = [eval_expr(part.strip(), local_vars) for part in args_expr.split(" and ")] if args_expr else []
+        value = get_task_runner().start(func_name, args)
+    elif re.search(r"wait for all (?:the )?tasks", lower):
+        budget_wait(get_task_runner().take_pending)
+        return
+    else:
+        match = re.search(r"wait for (?:the )?task (\w+)(?: into (\w+))?", lower)
+        if match:
+            task_expr, var_name = match.groups()
+            task = eval_expr(task_expr, local_vars)
+            if not isinstance(task, Task):
+                raise TypeError(f"'{task_expr}' is not a task")
+            value = budget_wait(get_task_runner().wait, task)
+        else:
+            match = re.search(r"wait (.+?) seconds?$", lower)
+            if match:
+                budget_sleep(to_number(eval_expr(match.group(1), local_vars)))
+            return
+    
+    if var_name:
+        if var_name in local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+
+def handle_channel(line, local_vars):
+    """Handle channel statements in English like 'Send x to jobs', 'Receive from jobs into item' or 'Close jobs'"""
+    variables, functions, modules = namespace()
+    lower = line.lower().strip().rstrip('.')
+    
+    def get_channel(name):
+        channel = eval_expr(name, local_vars)
+        if not isinstance(channel, Channel):
+            raise TypeError(f"'{name}' is not a channel")
+        return channel
+    
+    match = re.search(r"send (.+) to (?:the channel )?(\w+)$", lower)
+    if match:
+        value_expr, channel_name = match.groups()
+        budget_wait(get_channel(channel_name).send, eval_expr(value_expr, local_vars))
+        return
+    
+    match = re.search(r"receive (?:a value )?from (?:the channel )?(\w+) into (\w+)", lower)
+    if match:
+        channel_name, var_name = match.groups()
+        value = budget_wait(get_channel(channel_name).receive)
+        if var_name in local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+        return
+    
+    match = re.search(r"close (?:the channel )?(\w+)$", lower)
+    if match:
+        get_channel(match.group(1)).close()
+
 def handle_return(line, local_vars):
     """Handle return statements in English"""
     if line.lower().startswith("i will return"):
@@ -1030,9 +2727,15 @@ def handle_return(line, local_vars):
 
 def handle_list_add(line, local_vars):
     """Handle adding to lists in English like 'Add 4 to numbers'"""
+    variables, functions, modules = namespace()
     match = re.search(r"add (.+) to (\w+)", line.lower())
     if match:
         value_expr, list_name = match.groups()
+        target = local_vars[list_name] if list_name in local_vars else variables.get(list_name)
+        if isinstance(target, TextBuilder):
+            handle_text_builder_add(line, target, local_vars)
+            return
+        
         value = eval_expr(value_expr, local_vars)
         
         if list_name in local_vars:
@@ -1042,8 +2745,36 @@ def handle_list_add(line, local_vars):
             if isinstance(variables[list_name], list):
                 variables[list_name].append(value)
 
+def handle_text_builder_add(line, builder, local_vars):
+    """Handle appending to a text builder like 'Add the line "Total" to report'"""
+    # Match on the original line so that string literals keep their case
+    match = re.search(r"add (the line )?(.+) to \w+", line, re.IGNORECASE)
+    if match:
+        as_line, value_expr = match.groups()
+        value_expr = value_expr.strip()
+        value = eval_expr(value_expr, local_vars)
+        if as_line:
+            builder.append_line(value)
+        else:
+            builder.append(value)
+
+def handle_text_builder_build(line, local_vars):
+    """Handle text builder finalization like 'Build report into text'"""
+    variables, functions, modules = namespace()
+    match = re.search(r"build (\w+) into (\w+)", line.lower())
+    if match:
+        builder_name, var_name = match.groups()
+        builder = local_vars[builder_name] if builder_name in local_vars else variables.get(builder_name)
+        value = builder.build() if isinstance(builder, TextBuilder) else str(builder)
+        
+        if var_name in local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+
 def handle_list_remove(line, local_vars):
     """Handle removing from lists in English like 'Remove 2 from numbers'"""
+    variables, functions, modules = namespace()
     match = re.search(r"remove (.+) from (\w+)", line.lower())
     if match:
         value_expr, list_name = match.groups()
@@ -1058,8 +2789,8 @@ def handle_list_remove(line, local_vars):
         if target_list and value in target_list:
             target_list.remove(value)
 
-def handle_display(line, local_vars):
-    """Handle display/print statements in English with user-controlled line breaks"""
+def parse_display(line):
+    """Extract the expression of a display statement and whether it ends the line"""
     line_lower = line.lower()
     
     # Extract what to display
@@ -1074,7 +2805,7 @@ def handle_display(line, local_vars):
         start = line_lower.find("display") + len("display")
         expr = line[start:].strip()
     else:
-        return
+        return None, False
     
     # Clean up expression
     if expr.endswith('.'):
@@ -1096,6 +2827,12 @@ def handle_display(line, local_vars):
         # Default behavior: no newline (user controls it)
         add_newline = False
     
+    return expr, add_newline
+
+def handle_display(line, local_vars):
+    """Handle display/print statements in English with user-controlled line breaks"""
+    expr, add_newline = parse_display(line)
+    
     if expr:
         result = eval_expr(expr, local_vars)
         if add_newline:
@@ -1103,30 +2840,26 @@ def handle_display(line, local_vars):
         else:
             print(result, end='')  # Without newline
 
-def handle_increment_decrement(line, local_vars):
+def handle_increment_decrement(line, local_vars, match=None):
     """Handle increment/decrement in English like 'Increase x by 1'"""
-    patterns = [
-        (r"increase (\w+) by (.+)", 1),
-        (r"decrease (\w+) by (.+)", -1)
-    ]
-    
-    for pattern, sign in patterns:
-        match = re.search(pattern, line.lower())
-        if match:
-            var_name, amount_expr = match.groups()
-            amount = eval_expr(amount_expr, local_vars) * sign
-            
-            current_value = 0
-            if var_name in local_vars:
-                current_value = local_vars[var_name] or 0
-                local_vars[var_name] = current_value + amount
-            elif var_name in variables:
-                current_value = variables[var_name] or 0
-                variables[var_name] = current_value + amount
-            break
+    variables, functions, modules = namespace()
+    match = match or search_statement(line.lower(), ('increment',))
+    if not match:
+        return
+    verb, var_name, amount_expr = match.group('increment_verb', 'increment_name', 'increment_amount')
+    amount = eval_expr(amount_expr, local_vars) * (-1 if verb == 'decrease' else 1)
+    
+    current_value = 0
+    if var_name in local_vars:
+        current_value = local_vars[var_name] or 0
+        local_vars[var_name] = current_value + amount
+    elif var_name in variables:
+        current_value = variables[var_name] or 0
+        variables[var_name] = current_value + amount
 
 def handle_function_call(line, local_vars):
     """Handle function calls like 'Call function with parameter'"""
+    variables, functions, modules = namespace()
     # Parse "Call function_name with parameter"
     match = re.search(r"call (\w+) with (.+)", line.lower())
     if match:
@@ -1152,6 +2885,8 @@ def handle_function_call(line, local_vars):
         if func_name in functions:
             result = call_function(func_name, args_list, local_vars)
             return result
+        if func_name in native_functions:
+            return native_functions[func_name](*args_list)
     
     # Parse "Call function_name" (no parameters)
     match = re.search(r"call (\w+)", line.lower())
@@ -1160,15 +2895,574 @@ def handle_function_call(line, local_vars):
         if func_name in functions:
             result = call_function(func_name, [], local_vars)
             return result
+        if func_name in native_functions:
+            return native_functions[func_name]()
+
+def handle_memory_report():
+    """Print the memory used by the variables in reach, with the records of a running MemoryInspector"""
+    import dav_memory
+    interpreter = sys.modules[__name__]
+    inspector = next((hooks for hooks in installed_hooks if isinstance(hooks, dav_memory.MemoryInspector)), None)
+    print(dav_memory.format_report(dav_memory.memory_report(interpreter, inspector), 'en'))
+
+# ---------------------------
+# Tracing hooks
+# ---------------------------
+class Hooks:
+    """Base class for tracing hooks: override the events to watch, the others cost nothing.
+
+    on_statement(line_no, text)     before a statement runs
+    on_call(name, args)             when a user function is entered
+    on_return(name, value)          when a user function returns, or ends with an error (value None)
+    on_error(line_no, text, error)  when a statement raises, before the error goes on
+    line_no is the statement's line in the program source, or None when the
+    program was not loaded by run_dav/run_dav_code while hooks were installed.
+    Hooks run in the process that installed them, not in parallel loop workers.
+    """
+    def on_statement(self, line_no, text):
+        pass
+
+    def on_call(self, name, args):
+        pass
+
+    def on_return(self, name, value):
+        pass
+
+    def on_error(self, line_no, text, error):
+        pass
+
+HOOK_EVENTS = ('on_statement', 'on_call', 'on_return', 'on_error')
+# Control flow travels as exceptions; these are not errors
+CONTROL_FLOW_EXCEPTIONS = (BreakLoop, ContinueLoop, ReturnValue, BudgetExceeded)
+
+installed_hooks = []
+statement_hooks = call_hooks = return_hooks = error_hooks = ()
+# Source line numbers of each statement text, for the program being traced
+traced_lines = {}
+last_line_no = None
+
+untraced_execute_statement = execute_statement
+untraced_call_function = call_function
+
+def hook_methods(event):
+    """Bound methods of the installed hooks that handle an event, skipping the Hooks no-ops"""
+    methods = []
+    for hooks in installed_hooks:
+        method = getattr(hooks, event, None)
+        if method is not None and getattr(method, '__func__', None) is not getattr(Hooks, event):
+            methods.append(method)
+    return tuple(methods)
+
+def refresh_hooks():
+    """Swap the traced dispatch in while some hook listens, and the plain one back otherwise"""
+    global statement_hooks, call_hooks, return_hooks, error_hooks, execute_statement, call_function
+    statement_hooks, call_hooks, return_hooks, error_hooks = (hook_methods(event) for event in HOOK_EVENTS)
+    execute_statement = traced_execute_statement if statement_hooks or error_hooks else untraced_execute_statement
+    call_function = traced_call_function if call_hooks or return_hooks else untraced_call_function
+
+def install_hooks(hooks):
+    """Start sending execution events to hooks, a Hooks instance or any object with some of its methods"""
+    if not any(hasattr(hooks, event) for event in HOOK_EVENTS):
+        raise TypeError(f"{hooks!r} has none of {', '.join(HOOK_EVENTS)}")
+    installed_hooks.append(hooks)
+    refresh_hooks()
+
+def remove_hooks(hooks=None):
+    """Stop sending events to hooks, or to every installed hook when none is given"""
+    if hooks is None:
+        installed_hooks.clear()
+    elif hooks in installed_hooks:
+        installed_hooks.remove(hooks)
+    refresh_hooks()
+
+def index_source_lines(lines):
+    """Remember where each statement text sits in the program source, when hooks need line numbers"""
+    global last_line_no
+    traced_lines.clear()
+    last_line_no = None
+    if not installed_hooks:
+        return
+    for line_no, line in enumerate(lines, 1):
+        text = line.strip()
+        if text:
+            traced_lines.setdefault(text, []).append(line_no)
+
+def source_line_number(text):
+    """Line of a statement in the source.
+
+    A text found on several lines is taken at its first line after the last
+    statement traced, wrapping around to the top as loops and calls do.
+    """
+    global last_line_no
+    line_nos = traced_lines.get(text)
+    if line_nos is None:
+        return None
+    if len(line_nos) == 1 or last_line_no is None:
+        last_line_no = line_nos[0]
+    else:
+        import bisect
+        position = bisect.bisect_right(line_nos, last_line_no)
+        last_line_no = line_nos[position if position < len(line_nos) else 0]
+    return last_line_no
+
+def traced_execute_statement(line, local_vars):
+    """execute_statement with the statement and error events sent out"""
+    text = line.strip()
+    line_no = source_line_number(text)
+    for hook in statement_hooks:
+        hook(line_no, text)
+    try:
+        untraced_execute_statement(line, local_vars)
+    except CONTROL_FLOW_EXCEPTIONS:
+        raise
+    except Exception as e:
+        for hook in error_hooks:
+            hook(line_no, text, e)
+        raise
+
+def traced_call_function(name, args, caller_local_vars=None):
+    """call_function with the call and return events sent out"""
+    variables, functions, modules = namespace()
+    if name not in functions:
+        return None
+    for hook in call_hooks:
+        hook(name, args)
+    value = None
+    try:
+        value = untraced_call_function(name, args, caller_local_vars)
+        return value
+    finally:
+        # Also sent when the call raises, so hooks that track the call stack stay in step
+        for hook in return_hooks:
+            hook(name, value)
+
+# ---------------------------
+# Execution statistics
+# ---------------------------
+class ExecutionStats(Hooks):
+    """Counters of what the interpreter did, collected while enabled by enable_stats().
+
+    Counters add up over every program run until clear() is called. The
+    statement kinds are the statement grammar's kinds (declaration, set,
+    increment, ...) and otherwise the statement's first word. Loop
+    iterations do not include parallel loops run by worker processes.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.statements = {}
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.function_calls = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.loop_iterations = 0
+        self.output_bytes = 0
+        self.parse_seconds = 0.0
+        self.execution_seconds = 0.0
+
+    def on_statement(self, line_no, text):
+        kind = statement_kind(text)
+        self.statements[kind] = self.statements.get(kind, 0) + 1
+
+    def on_call(self, name, args):
+        self.function_calls += 1
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+    def on_return(self, name, value):
+        self.depth -= 1
+
+    def as_dict(self):
+        """The counters as plain data, ready for json.dumps"""
+        return {
+            'statements': sum(self.statements.values()),
+            'statements_by_kind': dict(sorted(self.statements.items(), key=lambda item: (-item[1], item[0]))),
+            'evaluations': self.evaluations,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'function_calls': self.function_calls,
+            'max_call_depth': self.max_depth,
+            'loop_iterations': self.loop_iterations,
+            'output_bytes': self.output_bytes,
+            'parse_seconds': round(self.parse_seconds, 6),
+            'execution_seconds': round(self.execution_seconds, 6),
+        }
+
+    def format(self, style='table'):
+        """The counters as a table for people, or as JSON with style='json'"""
+        report = self.as_dict()
+        if style == 'json':
+            import json
+            return json.dumps(report, indent=2)
+        lookups = report['cache_hits'] + report['cache_misses']
+        rows = [("statements", f"{report['statements']:,}")]
+        rows += [(f"  {kind}", f"{count:,}") for kind, count in report['statements_by_kind'].items()]
+        rows += [
+            ("expression evaluations", f"{report['evaluations']:,}"),
+            ("expression cache hits", f"{report['cache_hits']:,} of {lookups:,}"),
+            ("user function calls", f"{report['function_calls']:,}"),
+            ("max call depth", f"{report['max_call_depth']:,}"),
+            ("loop iterations", f"{report['loop_iterations']:,}"),
+            ("output bytes", f"{report['output_bytes']:,}"),
+            ("parse time", f"{report['parse_seconds'] * 1000:.2f} ms"),
+            ("execution time", f"{report['execution_seconds'] * 1000:.2f} ms"),
+        ]
+        width = max(len(label) for label, _ in rows)
+        return "\n".join(f"{label:<{width}}  {value:>12}" for label, value in rows)
+
+class CountingWriter:
+    """Stand-in for sys.stdout that counts the bytes written through it"""
+    def __init__(self, stream, stats):
+        self.stream = stream
+        self.stats = stats
+
+    def write(self, text):
+        self.stats.output_bytes += len(text.encode('utf-8'))
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class StatsPhase:
+    """Times one phase of a run ('parse' or 'execution') and counts its output, while stats are enabled"""
+    __slots__ = ('phase', 'stats', 'started', 'stdout')
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.stats = execution_stats
+
+    def __enter__(self):
+        if self.stats is not None:
+            import time
+            self.stdout = sys.stdout
+            sys.stdout = CountingWriter(sys.stdout, self.stats)
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.stats is not None:
+            import time
+            elapsed = time.perf_counter() - self.started
+            sys.stdout = self.stdout
+            if self.phase == 'parse':
+                self.stats.parse_seconds += elapsed
+            else:
+                self.stats.execution_seconds += elapsed
+
+# Filler words skipped when a statement's kind is taken from its first word
+STATEMENT_KIND_FILLERS = {'i', 'will', 'now', 'then', 'please'}
+
+def statement_kind(text):
+    lowered = text.lower()
+    statement = STATEMENT_PATTERN.match(lowered)
+    if statement is not None:
+        return statement.lastgroup
+    for word in lowered.split():
+        if word not in STATEMENT_KIND_FILLERS:
+            return word.strip('.:,;!')
+    return 'empty'
+
+execution_stats = None
+uncounted_eval_expr = eval_expr
+uncounted_compile_expression = compile_expression
+uncounted_execute_loop_body = execute_loop_body
+
+def counted_eval_expr(expr, local_vars=None):
+    execution_stats.evaluations += 1
+    return uncounted_eval_expr(expr, local_vars)
+
+def counted_compile_expression(expr):
+    if expr in expression_cache:
+        execution_stats.cache_hits += 1
+    else:
+        execution_stats.cache_misses += 1
+    return uncounted_compile_expression(expr)
+
+def counted_execute_loop_body(lines, local_vars=None):
+    execution_stats.loop_iterations += 1
+    return uncounted_execute_loop_body(lines, local_vars)
+
+def enable_stats(stats=None):
+    """Start counting what the interpreter does, into stats or a new ExecutionStats, and return it.
+
+    Like the tracing hooks, counting swaps in instrumented functions, so
+    runs without statistics pay nothing for them.
+    """
+    global execution_stats, eval_expr, compile_expression, execute_loop_body
+    if execution_stats is not None:
+        disable_stats()
+    execution_stats = stats or ExecutionStats()
+    install_hooks(execution_stats)
+    eval_expr = counted_eval_expr
+    compile_expression = counted_compile_expression
+    execute_loop_body = counted_execute_loop_body
+    return execution_stats
+
+def disable_stats():
+    """Stop counting and return the statistics collected, or None when they were not enabled"""
+    global execution_stats, eval_expr, compile_expression, execute_loop_body
+    stats, execution_stats = execution_stats, None
+    if stats is not None:
+        remove_hooks(stats)
+    eval_expr = uncounted_eval_expr
+    compile_expression = uncounted_compile_expression
+    execute_loop_body = uncounted_execute_loop_body
+    return stats
+
+# ---------------------------
+# Resolve names before execution
+# ---------------------------
+def statement_bindings(line):
+    """Return (names written, names read, expressions read) for one statement.
+
+    The operands are extracted the way the matching handler extracts them, so
+    the expressions are exactly the ones eval_expr will see at run time.
+    """
+    lower = line.lower().strip()
+    written, read, expressions = [], [], []
+    
+    if lower.startswith("if "):
+        expressions.append(line.strip()[3:].rstrip(':').strip())
+    elif lower.startswith("while "):
+        expressions.append(line.strip()[6:].rstrip(':').strip())
+    elif lower.startswith("for "):
+        match = re.search(r"for (?:each )?(\w+) in (?:(?:the )?file|range)?\s*(\w+)?", lower)
+        if match:
+            written.append(match.group(1))
+            if match.group(2) and " file " not in lower and " range " not in lower:
+                read.append(match.group(2))
+    elif lower.startswith(("start actor ", "start the actor ")):
+        match = re.search(r"start (?:the )?actor (\w+)(?: with (.+?))?(?: as (\w+))?$", lower.rstrip('.'))
+        if match:
+            read.append(match.group(1))
+            if match.group(2):
+                expressions.extend(part.strip() for part in match.group(2).split(" and "))
+            if match.group(3):
+                written.append(match.group(3))
+    elif lower.startswith(("start task ", "start the task ", "wait ")):
+        lower = lower.rstrip('.')
+        match = re.search(r"start (?:the )?task (\w+)(?: with (.+?))?(?: as (\w+))?$", lower)
+        if match:
+            read.append(match.group(1))
+            if match.group(2):
+                expressions.extend(part.strip() for part in match.group(2).split(" and "))
+            if match.group(3):
+                written.append(match.group(3))
+        elif not re.search(r"wait for all (?:the )?tasks", lower):
+            match = re.search(r"wait for (?:the )?task (\w+)(?: into (\w+))?", lower)
+            if match:
+                read.append(match.group(1))
+                if match.group(2):
+                    written.append(match.group(2))
+            else:
+                match = re.search(r"wait (.+?) seconds?$", lower)
+                if match:
+                    expressions.append(match.group(1))
+    elif lower.startswith(("send ", "receive ", "close ")):
+        lower = lower.rstrip('.')
+        match = re.search(r"send (.+) to (?:the channel )?(\w+)$", lower)
+        if match:
+            expressions.append(match.group(1))
+            read.append(match.group(2))
+        match = re.search(r"receive (?:a value )?from (?:the channel )?(\w+) into (\w+)", lower)
+        if match:
+            read.append(match.group(1))
+            written.append(match.group(2))
+        match = re.search(r"close (?:the channel )?(\w+)$", lower)
+        if match:
+            read.append(match.group(1))
+    elif lower.startswith(("read ", "build ")):
+        match = re.search(r"into (\w+)", lower)
+        if match:
+            written.append(match.group(1))
+    elif any(phrase in lower for phrase in ["i have a", "i have an", "create a", "create an"]):
+        match = re.search(r"(?:called|named) (\w+)", lower)
+        if match:
+            written.append(match.group(1))
+    elif search_statement(lower, ASSIGNMENT_KINDS):
+        for pattern, target_first in ((r"set (\w+) to (.+)", True), (r"put (.+) in (\w+)", False), (r"assign (.+) to (\w+)", True)):
+            match = re.search(pattern, lower)
+            if match:
+                target, value_expr = match.groups() if target_first else reversed(match.groups())
+                written.append(target)
+                expressions.append(value_expr.strip().rstrip('.'))
+                break
+    elif "ask the user" in lower:
+        match = re.search(r"ask the user.*?(?:for a value for|for) (\w+)", lower)
+        if match:
+            written.append(match.group(1))
+    elif "import " in lower:
+        match = re.search(r"""import (?:the )?file ("[^"]*"|'[^']*'|[\w./\\-]+?)(?: as (\w+))?\.?$""", lower)
+        if match:
+            written.append(match.group(2) or os.path.splitext(os.path.basename(match.group(1).strip('"\'')))[0])
+        else:
+            match = re.search(r"import (?:the )?(?:module )?(\w+)", lower)
+            if match:
+                written.append(match.group(1))
+    elif "i will return" in lower or "return" in lower:
+        expr = line.strip()[13:] if lower.startswith("i will return") else line.strip()[6:]
+        expressions.append(expr.strip().rstrip('.'))
+    elif ("add " in lower and " to " in lower) or ("remove " in lower and " from " in lower):
+        match = re.search(r"(?:add|remove) (?:the line )?(.+) (?:to|from) (\w+)", lower)
+        if match:
+            expressions.append(match.group(1))
+            read.append(match.group(2))
+    elif any(word in lower for word in ["show ", "display ", "print "]):
+        expr, _ = parse_display(line)
+        if expr:
+            expressions.append(expr)
+    elif "increase " in lower or "decrease " in lower:
+        match = re.search(r"(?:increase|decrease) (\w+) by (.+)", lower)
+        if match:
+            read.append(match.group(1))
+            expressions.append(match.group(2))
+    elif lower.startswith("call "):
+        match = re.search(r"call (\w+)(?: with (.+))?", lower)
+        if match:
+            read.append(match.group(1))
+            if match.group(2):
+                expressions.extend(part.strip() for part in match.group(2).rstrip('.').split(" and "))
+    
+    return written, read, expressions
+
+def expression_names(expr):
+    """Names an expression reads, as eval_expr will see it (empty if it is not Python)"""
+    import ast
+    
+    expr = expr.strip()
+    if not expr or expr[0] in '"\'' or expr.lower() in ('true', 'false'):
+        return []
+    try:
+        tree = ast.parse(translate_expression(expr), mode='eval')
+    except (SyntaxError, ValueError):
+        return []
+    return [node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)]
+
+def iter_block_statements(blocks):
+    """Yield every statement line of a list of blocks, descending into bodies"""
+    for block in blocks:
+        if isinstance(block, str):
+            yield block
+        elif block.type == 'statement':
+            yield block.line
+        elif block.type == 'if':
+            yield "if " + block.condition
+            yield from iter_block_statements(block.if_body)
+            yield from iter_block_statements(block.else_body)
+        elif block.type in ('loop', 'for_loop'):
+            yield block.loop_line
+            yield from iter_block_statements(block.body)
+        elif block.type == 'do_while_loop':
+            yield from iter_block_statements(block.body)
+            if block.condition:
+                yield "while " + block.condition
+
+def find_undefined_names(blocks):
+    """Warn about names a parsed program reads but never binds.
+
+    A lint pass run before execution; it does not change how names are
+    looked up. Inside a function, its parameters and loop variables are
+    local and every other write is global, as handle_assignment does at run
+    time. Returns one warning per unbound name and statement.
+    """
+    variables, functions, modules = namespace()
+    global_names = set(variables) | set(functions) | set(native_functions) | set(builtin_functions) | set(modules) | {'None'}
+    function_blocks = [block for block in blocks if block.type == 'function']
+    global_names.update(block.name for block in function_blocks)
+    
+    for line in iter_block_statements([block for block in blocks if block.type != 'function']):
+        written, _, _ = statement_bindings(line)
+        global_names.update(written)
+    
+    local_names = []
+    for block in function_blocks:
+        names = set(block.params)
+        for line in iter_block_statements(block.body):
+            written, _, _ = statement_bindings(line)
+            if line.lower().startswith("for "):
+                names.update(written)
+            else:
+                global_names.update(written)
+        local_names.append(names)
+    
+    warnings = []
+    
+    def check(lines, bound):
+        for line in lines:
+            _, read, expressions = statement_bindings(line)
+            for expr in expressions:
+                read = read + expression_names(expr)
+            for name in dict.fromkeys(read):
+                if name not in bound and name not in global_names:
+                    warnings.append(f"Warning: '{name}' is not defined (in: {line.strip()})")
+    
+    check(iter_block_statements([block for block in blocks if block.type != 'function']), set())
+    for block, names in zip(function_blocks, local_names):
+        check(iter_block_statements(block.body), names)
+    
+    return warnings
+
+# Set by --warnings. Off by default: the warnings would land in the output of
+# programs run by dav_batch, dav_daemon and dav_cluster, which treat stderr as failure
+show_warnings = False
+
+def report_undefined_names(blocks, source=None):
+    """Print the warnings of find_undefined_names on stderr when show_warnings is set"""
+    if not show_warnings:
+        return
+    for warning in find_undefined_names(blocks):
+        print(f"{source}: {warning}" if source else warning, file=sys.stderr)
 
 # ---------------------------
 # Run a .dav program with proper indentation handling
 # ---------------------------
-def run_dav(filename):
-    """Run a .dav program from a file"""
+def reset():
+    """Reset the interpreter state so that the next program starts clean"""
+    global task_runner
+    if task_runner is not None:
+        task_runner.close()
+        task_runner = None
+    global actor_scheduler, program_path
+    actor_scheduler = None
+    program_path = None
+    loaded_modules.clear()
+    flush_file_buffers()
+    variables.clear()
+    functions.clear()
+    modules.clear()
+
+def execute_program(blocks, budget=None):
+    """Run parsed top-level blocks, under an execution budget if one is given"""
+    global execution_budget
+    if budget is not None:
+        budget.start()
+    previous, execution_budget = execution_budget, budget
     try:
+        execute_blocks(blocks)
+        finish_tasks()
+    except BudgetExceeded as e:
+        print(f"Budget exceeded: {e}")
+    finally:
+        execution_budget = previous
+
+def run_dav(filename, budget=None, prelude=None, snapshot=None):
+    """Run a .dav program from a file, optionally limited by an ExecutionBudget.
+
+    With a prelude, the program starts from the state the prelude leaves,
+    restored from its snapshot when possible (see boot_prelude).
+    """
+    global program_path
+    program_path = os.path.abspath(filename)
+    try:
+        if prelude:
+            boot_prelude(prelude, snapshot)
         with open(filename, 'r', encoding='utf-8') as f:
             lines = f.readlines()
+        index_source_lines(lines)
         # Keep original lines with indentation for proper parsing
         lines = [line.rstrip() for line in lines]
         # Remove completely empty lines
@@ -1178,27 +3472,351 @@ def run_dav(filename):
         for i, line in enumerate(lines):
             pass
         
-        # Parse into logical blocks first
-        blocks = parse_logical_blocks(lines)
-        execute_blocks(blocks)
+        # Parse into logical blocks first, then report unbound names (--warnings) before running
+        with StatsPhase('parse'):
+            blocks = parse_logical_blocks(lines)
+            report_undefined_names(blocks)
+        with StatsPhase('execution'):
+            execute_program(blocks, budget)
         
-    except FileNotFoundError:
-        print(f"Error: File '{filename}' not found.")
+    except FileNotFoundError as e:
+        report_error(f"Error: File '{e.filename or filename}' not found.")
     except ReturnValue as rv:
         # This should never happen at the top level
         pass
     except Exception as e:
         import traceback
-        print(f"Error executing program: {e}")
+        report_error(f"Error executing program: {e}")
         print("Traceback:")
         traceback.print_exc()
+    finally:
+        flush_file_buffers()
 
-def run_dav_code(code):
-    """Run .dav code from a string"""
+def run_dav_code(code, budget=None):
+    """Run .dav code from a string, optionally limited by an ExecutionBudget"""
     lines = [line.rstrip() for line in code.split('\n')]
+    index_source_lines(lines)
     lines = [line for line in lines if line.strip()]
-    blocks = parse_logical_blocks(lines)
-    execute_blocks(blocks)
+    with StatsPhase('parse'):
+        blocks = parse_logical_blocks(lines)
+        report_undefined_names(blocks)
+    try:
+        with StatsPhase('execution'):
+            execute_program(blocks, budget)
+    finally:
+        flush_file_buffers()
+
+# ---------------------------
+# Tests
+# ---------------------------
+def test_undefined_names():
+    """Test that a valid program reads only names it binds, whatever statement binds them"""
+    code = '''
+I have a number called total.
+I have a list called numbers.
+Put 2 in step.
+Assign start to 5.
+Set total to start.
+Add 1 to numbers.
+Add 2 to numbers.
+Create a function named add_all that takes n.
+    For each item in numbers:
+        Set n to n plus item.
+    I will return n.
+Set total to add_all(total).
+Set total to total plus step.
+Show total.
+'''
+    lines = [line.rstrip() for line in code.split('\n') if line.strip()]
+    print("Test Undefined Names (should show [] then 10):")
+    print(find_undefined_names(parse_logical_blocks(lines)))
+    reset()
+    run_dav_code(code)
+    print()
+
+def test_parallel_rules():
+    """Test that a parallel loop refuses bodies whose result would depend on the worker processes"""
+    code = '''
+I have a list called numbers.
+I have a list called squares.
+Add 1 to numbers.
+Add 2 to numbers.
+Add 3 to numbers.
+For each item in numbers in parallel collecting into squares:
+    Set square to item times item.
+    Add square to squares.
+Show squares line.
+Show square line.
+'''
+    print("Test Parallel Loop Rules (should show [1, 4, 9], 'square' as a bare word, then two refusals):")
+    reset()
+    run_dav_code(code)
+    for body in (["Increase total by item."], ["If item is greater than 1:", "Break"]):
+        try:
+            check_parallel_body(body, 'item', 'squares', {'total': 0})
+        except ValueError as e:
+            print(e)
+    print()
+
+def test_hooks():
+    """Test that every traced call gets its return event, even when it raises, and that removing the hooks restores the plain dispatch"""
+    class Journal(Hooks):
+        def __init__(self):
+            self.events = []
+
+        def on_call(self, name, args):
+            self.events.append(f"call {name}{list(args)}")
+
+        def on_return(self, name, value):
+            self.events.append(f"return {name} {value}")
+
+    code = '''
+Create a function named double that takes n.
+    I will return n times 2.
+Create a function named descend that takes n.
+    I will return descend(n plus 1).
+Show double(4) line.
+Show descend(0) line.
+'''
+    journal = Journal()
+    print("Test Tracing Hooks (should show 8, the exceeded budget, 4 calls of descend then 4 returns, then True True):")
+    reset()
+    install_hooks(journal)
+    try:
+        # The depth budget makes the innermost call raise, and every call above it with it
+        run_dav_code(code, ExecutionBudget(max_depth=3))
+    finally:
+        remove_hooks(journal)
+    print(journal.events)
+    print(execute_statement is untraced_execute_statement, call_function is untraced_call_function)
+    print()
+
+def test_stats():
+    """Test the execution statistics of a small program: statements by kind, calls, loop iterations and output"""
+    code = '''
+I have a number called total with value 0.
+Create a function named double that takes n.
+    I will return n times 2.
+I have a list called numbers.
+Add 1 to numbers.
+Add 2 to numbers.
+Add 3 to numbers.
+For each item in numbers:
+    Set doubled to double(item).
+    Set total to total plus doubled.
+Show total line.
+'''
+    print("Test Execution Statistics (should show 12, then 15 statements, 3 calls at depth 1, 3 iterations and 3 bytes):")
+    reset()
+    stats = enable_stats()
+    try:
+        run_dav_code(code)
+    finally:
+        disable_stats()
+    report = stats.as_dict()
+    print({key: report[key] for key in ('statements', 'statements_by_kind', 'function_calls', 'max_call_depth', 'loop_iterations', 'output_bytes')})
+    print()
+
+def test_memory():
+    """Test that the memory inspector names the largest variable, counts calls, samples the timeline and finds the locals of a running function"""
+    import sys
+    import dav_memory
+
+    class LocalNames(Hooks):
+        def __init__(self):
+            self.seen = set()
+
+        def on_statement(self, line_no, text):
+            self.seen.update((scope, name) for scope, name, size in dav_memory.variable_sizes(interpreter) if scope != 'global')
+
+    code = '''
+I have a list called numbers.
+I have a number called i with value 0.
+While i is less than 200:
+    Add i to numbers.
+    Increase i by 1.
+Create a function named double that takes n.
+    I will return n times 2.
+Set a to double(1).
+Set b to double(2).
+'''
+    print("Test Memory Inspector (should show numbers first, 2 calls of double, samples every 100 statements, the local n of double, then True):")
+    reset()
+    interpreter = sys.modules[__name__]
+    local_names = LocalNames()
+    inspector = dav_memory.MemoryInspector(interpreter, every=100).start()
+    install_hooks(local_names)
+    try:
+        run_dav_code(code)
+    finally:
+        remove_hooks(local_names)
+        inspector.stop()
+    report = inspector.report()
+    print([(row['scope'], row['name']) for row in report['variables']])
+    print({name: record['calls'] for name, record in report['functions'].items()}, [sample['statements'] for sample in report['timeline']])
+    print(sorted(local_names.seen))
+    print(report['variables'][0]['bytes'] == dav_memory.deep_size(variables['numbers']))
+    print()
+
+def test_replay():
+    """Test that replaying a recorded session gives the same answers and random numbers without reading the keyboard"""
+    import contextlib
+    import io
+    import json
+    import os
+    import sys
+    import tempfile
+    import dav_replay
+
+    code = '''
+Import the random module.
+Ask the user for a value for guess.
+Set roll to random.randint(1, 1000000).
+Show roll line.
+Show guess times 2 line.
+'''
+    interpreter = sys.modules[__name__]
+    print("Test Record and Replay (should show True, the recorded answer and 0 unused answers):")
+    keyboard = sys.stdin
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'session.json')
+        outputs = []
+        try:
+            for options, answers in (({'record': path}, "21\n"), ({'replay': path}, "")):
+                reset()
+                sys.stdin = io.StringIO(answers)
+                session = dav_replay.start_session(interpreter, program='guess.dav', **options)
+                out = io.StringIO()
+                try:
+                    with contextlib.redirect_stdout(out):
+                        run_dav_code(code)
+                finally:
+                    unused = session.stop()
+                outputs.append(out.getvalue())
+        finally:
+            sys.stdin = keyboard
+        with open(path, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+    print(outputs[0] == outputs[1], recorded['inputs'], unused)
+    print()
+
+def test_statement_grammar():
+    """Test that the statement grammar dispatches on the statement's first words, not on a substring found anywhere"""
+    lines = ["Increase offset by 1.", "Create a number named n.", "Put 42 in answer.", "Show offset line."]
+    code = '''
+I have a number called offset.
+Set offset to 5.
+Increase offset by 1.
+Show offset line.
+'''
+    print("Test Statement Grammar (should show increment, declaration, put and None, then True, then 6.0):")
+    print([statement.lastgroup if statement else None for statement in map(STATEMENT_PATTERN.match, map(str.lower, lines))])
+    # The elif chain this grammar replaced tested for "set " anywhere in the line, and took the increment and the output below for assignments
+    print("set " in lines[0].lower())
+    reset()
+    run_dav_code(code)
+    print()
+
+def test_parsed_nodes():
+    """Test that parsed blocks are slotted nodes with frozen bodies and shared statement strings, and that they survive pickling"""
+    import pickle
+
+    def describe(value):
+        if isinstance(value, Node):
+            return (type(value).__name__,) + tuple(describe(getattr(value, slot)) for cls in type(value).__mro__ for slot in getattr(cls, '__slots__', ()))
+        if isinstance(value, tuple):
+            return tuple(describe(item) for item in value)
+        return value
+
+    code = '''
+Set n to 3.
+Create a function named double that takes n.
+    I will return n times 2.
+If n is greater than 2:
+    Show "big" line.
+Otherwise:
+    Show "small" line.
+While n is greater than 0:
+    Decrease n by 1.
+Set n to 3.
+'''
+    print("Test Parsed Program Nodes (should show the block classes, False, tuple everywhere, then True True):")
+    blocks = parse_logical_blocks(code.split('\n'))
+    print([type(block).__name__ for block in blocks])
+    print(any(hasattr(block, '__dict__') for block in blocks))
+    print([type(block.body).__name__ for block in blocks if hasattr(block, 'body')], type(blocks[2].if_body).__name__, type(blocks[2].else_body).__name__)
+    # The first and last statements are the same line, stored once
+    print(blocks[0].line is blocks[-1].line, describe(tuple(pickle.loads(pickle.dumps(blocks)))) == describe(tuple(blocks)))
+    print()
+
+def test_batch():
+    """Test a batch run over a directory: language detection, reported errors, the step budget, and output captured per file"""
+    import os
+    import tempfile
+    import dav_batch
+
+    programs = {
+        'hello.dav': "I have a number called n.\nSet n to 6.\nShow n times 7 line.\n",
+        'broken.dav': "Show \"before\" line.\nImport the file missing.dav.\n",
+        'endless.dav': "I have a number called n.\nWhile true:\n    Increase n by 1.\n",
+        'bonjour.dav': "J'ai un nombre appelé n.\nMets n à 6.\nAffiche n fois 7.\n",
+    }
+    print("Test Batch Runner (should show bonjour fr ok, broken en error, endless en budget, hello en ok, with their output):")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in programs.items():
+            with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+                f.write(source)
+        results = dav_batch.run_batch(dav_batch.expand_targets([directory]), jobs=2, limits={'max_steps': 1000})
+    for result in results:
+        print(os.path.basename(result['path']), result['language'], result['status'], repr(result['stdout']))
+    print()
+
+def test_lazy_imports():
+    """Test in a fresh process that optional modules load on first use, not when the interpreter or the batch runner is imported"""
+    import os
+    import subprocess
+    import sys
+
+    script = '''
+import sys
+import dav_batch
+import interpreteur_anglais
+optional = ('math', 'random', 'json', 'argparse', 'glob', 'tempfile', 'concurrent.futures', 'interpreteur_francais')
+print([name for name in optional if name in sys.modules])
+interpreteur_anglais.run_dav_code("Import the math module.\\nShow math.sqrt(16) line.")
+print('math' in sys.modules)
+'''
+    print("Test Lazy Imports (should show [], then 4.0 and True once a program imports math):")
+    result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True)
+    print(result.stdout + result.stderr, end='')
+    print()
+
+def test_flame_profile():
+    """Test the collapsed stacks of a recursive program, weighted by statements so they do not depend on the machine"""
+    import io
+    import dav_profile
+
+    code = '''
+Create a function named fact that takes n.
+    If n is less than 2:
+        I will return 1.
+    I will return n times fact(n minus 1).
+Set x to fact(3).
+Show x line.
+'''
+    print("Test Collapsed Stack Profile (should show 6, then one stack per line, fact:5 twice under fact.dav:6 with fact:4 at the end, then fact.dav:7):")
+    reset()
+    profiler = dav_profile.FlameProfiler('fact.dav', 'statements')
+    install_hooks(profiler)
+    try:
+        run_dav_code(code)
+    finally:
+        remove_hooks(profiler)
+        profiler.finish()
+    out = io.StringIO()
+    profiler.write_collapsed(out)
+    print(out.getvalue())
 
 # ---------------------------
 # Main entry
@@ -1207,8 +3825,63 @@ def main():
     import sys
     
     if len(sys.argv) > 1:
-        filename = sys.argv[1]
-        run_dav(filename)
+        if sys.argv[1] == "--test":
+            print("=== DAV English Interpreter Tests ===\n")
+            test_undefined_names()
+            test_parallel_rules()
+            test_hooks()
+            test_stats()
+            test_memory()
+            test_replay()
+            test_statement_grammar()
+            test_parsed_nodes()
+            test_batch()
+            test_lazy_imports()
+            test_flame_profile()
+            return
+        if sys.argv[1] == "--batch":
+            from dav_batch import main as batch_main
+            sys.exit(batch_main(sys.argv[1:]))
+        # [--stats[=json]] [--memory[=threshold]] [--warnings] [--record|--replay session.json] [--prelude prelude.dav [--snapshot prelude.snapshot]] program.dav
+        global show_warnings
+        args, options, session, stats_style, memory = sys.argv[1:], {}, {}, None, None
+        while len(args) > 1 and args[0].startswith("--"):
+            if args[0] == "--warnings":
+                show_warnings = True
+                args = args[1:]
+            elif args[0] in ("--stats", "--stats=table", "--stats=json"):
+                stats_style = args[0].partition("=")[2] or 'table'
+                args = args[1:]
+            elif args[0] == "--memory" or args[0].startswith("--memory="):
+                memory = args[0].partition("=")[2]
+                args = args[1:]
+            elif len(args) > 2 and args[0] in ("--prelude", "--snapshot"):
+                options[args[0][2:]] = args[1]
+                args = args[2:]
+            elif len(args) > 2 and args[0] in ("--record", "--replay"):
+                session[args[0][2:]] = args[1]
+                args = args[2:]
+            else:
+                break
+        filename = args[0]
+        stats = enable_stats() if stats_style else None
+        if memory is not None:
+            import dav_memory
+            inspector = dav_memory.MemoryInspector(sys.modules[__name__], memory or None).start()
+        if session:
+            import dav_replay
+            session = dav_replay.start_session(sys.modules[__name__], program=filename, **session)
+        try:
+            run_dav(filename, **options)
+        finally:
+            if session:
+                dav_replay.stop_session(session)
+        if memory is not None:
+            inspector.stop()
+            print(inspector.format(), file=sys.stderr)
+        if stats is not None:
+            disable_stats()
+            print(stats.format(stats_style), file=sys.stderr)
     else:
         # Interactive mode
         print("DAV English Language Interpreter")
@@ -1236,7 +3909,7 @@ Examples:
             except KeyboardInterrupt:
                 break
             except Exception as e:
-                print(f"Error: {e}")
+                report_error(f"Error: {e}")
         
         print("Goodbye!")
 
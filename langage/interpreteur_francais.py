@@ -1,9 +1,22 @@
+import atexit
+import contextvars
+import os
 import re
-import string
-import math
-import random
-import importlib
-from typing import Any, Dict, List, Union, Optional
+import sys
+
+class LazyModule:
+    """Stand-in for a module that is only imported when a program first uses it"""
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attribute):
+        import importlib
+        module = importlib.import_module(self.name)
+        globals()[self.name] = module
+        return getattr(module, attribute)
+
+math = LazyModule('math')
+random = LazyModule('random')
 
 class DAVInterpreter:
     def __init__(self):
@@ -12,14 +25,44 @@ class DAVInterpreter:
         self.modules = {}
         self.output_buffer = []
         self.should_flush_output = True
+        self.file_buffers = {}
+        self.file_buffers_size = 0
+        self.task_runner = None
+        self.actor_scheduler = None
+        self.budget = None
+        self.loaded_modules = {}
+        self.import_stack = []
+        self.program_path = None
+        # Tracing hooks and where each statement text sits in the program source
+        self.hooks = []
+        self.traced_lines = {}
+        self.last_line_no = None
+        # Execution statistics, while enabled by enable_stats()
+        self.stats = None
+        # Errors reported to the user since the interpreter was loaded; reset()
+        # keeps it, so callers such as dav_batch compare it before and after a run
+        self.error_count = 0
+        # Set by --warnings: report names read but never bound on stderr
+        self.show_warnings = False
         
     def reset(self):
         """Reset the interpreter state"""
-        self.variables = {}
-        self.functions = {}
-        self.modules = {}
+        if self.task_runner is not None:
+            self.task_runner.close()
+        # Cleared rather than replaced: running_namespace holds these tables
+        self.variables.clear()
+        self.functions.clear()
+        self.modules.clear()
         self.output_buffer = []
         self.should_flush_output = True
+        self.file_buffers = {}
+        self.file_buffers_size = 0
+        self.task_runner = None
+        self.actor_scheduler = None
+        self.budget = None
+        self.loaded_modules = {}
+        self.import_stack = []
+        self.program_path = None
 
 class ReturnValue(Exception):
     def __init__(self, value):
@@ -31,9 +74,236 @@ class BreakLoop(Exception):
 class ContinueLoop(Exception):
     pass
 
+class BudgetExceeded(Exception):
+    """Raised when a program uses up its execution budget"""
+    pass
+
+class ExecutionBudget:
+    """Limits on how much work a program may do before it is stopped.
+
+    Statements, expression evaluations and call depth are counted as the
+    program runs, and the wall-clock deadline is checked every
+    check_interval counted operations. Statements that block (waits,
+    channels, tasks) go through sleep() and wait(), which stop at the
+    deadline. Once a limit is hit the budget stays exceeded, so every later
+    step fails again, even after code that swallows errors.
+    """
+    def __init__(self, max_steps=None, max_evals=None, max_depth=None, timeout=None, check_interval=1000):
+        self.max_steps = max_steps
+        self.max_evals = max_evals
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.start()
+
+    def start(self):
+        """Reset the counters and start the clock"""
+        import time
+        self.steps = 0
+        self.evals = 0
+        self.depth = 0
+        self.exceeded = None
+        self.deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+
+    def fail(self, reason):
+        self.exceeded = reason
+        raise BudgetExceeded(reason)
+
+    def check_deadline(self):
+        import time
+        if time.monotonic() > self.deadline:
+            self.out_of_time()
+
+    def out_of_time(self):
+        self.fail(f"limite de temps de {self.timeout}s atteinte")
+
+    def time_left(self):
+        """Seconds before the deadline, None without a time limit; raises BudgetExceeded once it has passed"""
+        import time
+        if self.exceeded:
+            raise BudgetExceeded(self.exceeded)
+        if self.deadline is None:
+            return None
+        left = self.deadline - time.monotonic()
+        if left <= 0:
+            self.out_of_time()
+        return left
+
+    def sleep(self, seconds):
+        """time.sleep that stops at the deadline"""
+        import time
+        left = self.time_left()
+        if left is not None and seconds >= left:
+            time.sleep(left)
+            self.out_of_time()
+        time.sleep(seconds)
+
+    def wait(self, blocking, *args):
+        """Call blocking(*args, timeout=...) with the time left before the deadline.
+
+        blocking raises TimeoutError when its timeout runs out, which becomes
+        BudgetExceeded here.
+        """
+        import time
+        try:
+            return blocking(*args, timeout=self.time_left())
+        except TimeoutError:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.out_of_time()
+            raise
+
+    def step(self):
+        """Count one executed statement"""
+        if self.exceeded:
+            raise BudgetExceeded(self.exceeded)
+        self.steps += 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.fail(f"limite de {self.max_steps} instructions atteinte")
+        if self.deadline is not None and (self.steps + self.evals) % self.check_interval == 0:
+            self.check_deadline()
+
+    def evaluation(self):
+        """Count one expression evaluation"""
+        if self.exceeded:
+            raise BudgetExceeded(self.exceeded)
+        self.evals += 1
+        if self.max_evals is not None and self.evals > self.max_evals:
+            self.fail(f"limite de {self.max_evals} évaluations atteinte")
+        if self.deadline is not None and (self.steps + self.evals) % self.check_interval == 0:
+            self.check_deadline()
+
+    def enter_call(self):
+        self.depth += 1
+        if self.max_depth is not None and self.depth > self.max_depth:
+            self.depth -= 1
+            self.fail(f"limite de {self.max_depth} appels imbriqués atteinte")
+
+    def exit_call(self):
+        self.depth -= 1
+
+    def usage(self):
+        """Counters of the last run, for reports"""
+        return {'steps': self.steps, 'evals': self.evals, 'exceeded': self.exceeded}
+
+def budget_sleep(seconds):
+    """time.sleep, cut short at the execution budget's deadline"""
+    if dav.budget is None:
+        import time
+        time.sleep(seconds)
+    else:
+        dav.budget.sleep(seconds)
+
+def budget_wait(blocking, *args):
+    """Call a blocking channel or task operation that takes a timeout, giving up at the budget's deadline"""
+    if dav.budget is None:
+        return blocking(*args)
+    return dav.budget.wait(blocking, *args)
+
+class TextBuilder:
+    """Text value assembled from appended pieces in linear time"""
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+
+    def append(self, value):
+        text = str(value)
+        self.parts.append(text)
+        self.length += len(text)
+
+    def append_line(self, value):
+        self.append(f"{value}\n")
+
+    def build(self):
+        """Join the pieces once and keep the result as the single remaining piece"""
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+    def __str__(self):
+        return self.build()
+
+    def __len__(self):
+        return self.length
+
+CHANNEL_CAPACITY = 64
+
+class Channel:
+    """Bounded FIFO queue for passing values between tasks.
+
+    Sending blocks while the channel is full, which holds fast producers back
+    to the pace of their consumers. Receiving blocks while it is empty; once
+    the channel is closed and drained, receivers get None.
+    """
+    CLOSED = object()
+
+    def __init__(self, capacity=CHANNEL_CAPACITY):
+        import collections
+        import threading
+        self.capacity = capacity
+        self.items = collections.deque()
+        self.closed = False
+        # One lock guards the items and the closed flag; senders wait on
+        # not_full, receivers on not_empty, and close() wakes both
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.not_empty = threading.Condition(self.lock)
+
+    def full(self):
+        """Whether a send would wait"""
+        return not self.closed and 0 < self.capacity <= len(self.items)
+
+    def empty(self):
+        """Whether a receive would wait"""
+        return not self.items and not self.closed
+
+    def send(self, value, timeout=None):
+        with self.lock:
+            if not self.not_full.wait_for(lambda: not self.full(), timeout):
+                raise TimeoutError("le canal est resté plein")
+            if self.closed:
+                raise ValueError("envoi sur un canal fermé")
+            self.items.append(value)
+            self.not_empty.notify()
+
+    def next_value(self, timeout=None):
+        """Next value, or Channel.CLOSED once the channel is closed and drained"""
+        with self.lock:
+            if not self.not_empty.wait_for(lambda: not self.empty(), timeout):
+                raise TimeoutError("le canal est resté vide")
+            if not self.items:
+                return Channel.CLOSED
+            value = self.items.popleft()
+            self.not_full.notify()
+            return value
+
+    def receive(self, timeout=None):
+        value = self.next_value(timeout)
+        return None if value is Channel.CLOSED else value
+
+    def close(self):
+        """Close the channel without waiting: blocked receivers drain it, blocked senders fail"""
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def __iter__(self):
+        # For-each loops over a channel stop at the execution budget's deadline too
+        return iter(lambda: budget_wait(self.next_value), Channel.CLOSED)
+
+    def __repr__(self):
+        return f"<canal {len(self.items)}/{self.capacity}{' fermé' if self.closed else ''}>"
+
 # Global interpreter instance
 dav = DAVInterpreter()
 
+# The (variables, functions, modules) tables of the code running in this
+# thread or asyncio task: the program's, or a module's during its calls.
+# Setting it only affects the current context, so tasks and other threads
+# keep reading the program's tables while a module function runs.
+running_namespace = contextvars.ContextVar('dav_namespace', default=(dav.variables, dav.functions, dav.modules))
+namespace = running_namespace.get
+
 def to_number(value):
     """Convert string to number (int or float)"""
     try:
@@ -55,10 +325,142 @@ def to_boolean(value):
         return value.lower() in ['vrai', 'oui', '1', 'true', 'yes']
     return bool(value)
 
+# Built-in functions
+builtin_functions = {
+    'longueur': lambda x: len(x) if hasattr(x, '__len__') else 0,
+    'maximum': lambda lst: max(lst) if lst and hasattr(lst, '__iter__') and not isinstance(lst, str) else None,
+    'minimum': lambda lst: min(lst) if lst and hasattr(lst, '__iter__') and not isinstance(lst, str) else None,
+    'taille': lambda x: len(x) if hasattr(x, '__len__') else 0,
+    'somme': lambda lst: sum(lst) if lst and hasattr(lst, '__iter__') and not isinstance(lst, str) else 0,
+    'moyenne': lambda lst: sum(lst) / len(lst) if lst and hasattr(lst, '__iter__') and not isinstance(lst, str) and len(lst) > 0 else 0,
+    'aleatoire': lambda: random.random(),
+    'entier_aleatoire': lambda a, b: random.randint(a, b),
+    'racine_carree': lambda x: math.sqrt(x),
+    'puissance': lambda x, y: x ** y,
+    'valeur_absolue': lambda x: abs(x),
+    'arrondir': lambda x: round(x),
+    'majuscule': lambda s: s.upper() if isinstance(s, str) else s,
+    'minuscule': lambda s: s.lower() if isinstance(s, str) else s,
+    'contient': lambda s, sub: sub in s if isinstance(s, str) else False,
+    'remplace': lambda s, old, new: s.replace(old, new) if isinstance(s, str) else s,
+    'diviser': lambda s, sep: s.split(sep) if isinstance(s, str) else [],
+    'joindre': lambda lst, sep: sep.join(str(x) for x in lst) if isinstance(lst, list) else "",
+    'trier': lambda lst: sorted(lst) if isinstance(lst, list) else lst,
+    'inverser': lambda lst: list(reversed(lst)) if isinstance(lst, list) else lst,
+}
+
+# Math functions available directly in expressions
+math_functions = {
+    'sqrt': lambda x: math.sqrt(x),
+    'pow': pow,
+    'abs': abs,
+    'round': round,
+    'max': max,
+    'min': min,
+    'sum': sum,
+    'len': len
+}
+
+# French operators and their Python equivalents - FIXED ORDER
+french_ops = [
+    (' est supérieur ou égal à ', ' >= '),
+    (' est inférieur ou égal à ', ' <= '),
+    (' est supérieur à ', ' > '),
+    (' est inférieur à ', ' < '),
+    (' n\'est pas égal à ', ' != '),
+    (' est égal à ', ' == '),
+    (' égale ', ' == '),
+    (' égal ', ' == '),
+    (' multiplié par ', ' * '),
+    (' divisé par ', ' / '),
+    (' division entière par ', ' // '),
+    (' élevé à ', ' ** '),
+    (' à la puissance ', ' ** '),
+    (' modulo ', ' % '),
+    (' mod ', ' % '),
+    (' plus ', ' + '),
+    (' moins ', ' - '),
+    (' fois ', ' * '),
+    (' et ', ' and '),
+    (' ou ', ' or '),
+    (' pas ', ' not ')
+]
+
+EXPRESSION_CACHE_SIZE = 4096
+expression_cache = {}
+
+def translate_expression(expr):
+    """Replace French operators with Python operators"""
+    for fr_op, py_op in french_ops:
+        expr = expr.replace(fr_op, py_op)
+    return expr
+
+def code_names(code):
+    """Collect the names a code object may look up, including nested code objects"""
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, 'co_names'):
+            names.extend(code_names(const))
+    return names
+
+def compile_expression(expr):
+    """Compile a translated expression once and bind the names it reads.
+
+    Returns (code, names) or None when the expression is not valid Python.
+    """
+    try:
+        return expression_cache[expr]
+    except KeyError:
+        pass
+    
+    try:
+        code = compile(expr, '<dav>', 'eval')
+        entry = (code, tuple(dict.fromkeys(code_names(code))))
+    except (SyntaxError, ValueError):
+        entry = None
+    
+    if len(expression_cache) >= EXPRESSION_CACHE_SIZE:
+        expression_cache.clear()
+    expression_cache[expr] = entry
+    return entry
+
+def resolve_scope(names, local_vars):
+    """Build an evaluation scope holding only the given names.
+
+    Priority matches the full scope: native functions, math functions,
+    built-in functions, modules, local variables, global variables, then
+    user functions.
+    """
+    variables, functions, modules = namespace()
+    scope = {}
+    for name in names:
+        if name in native_functions:
+            scope[name] = native_functions[name]
+        elif name in math_functions:
+            scope[name] = math_functions[name]
+        elif name in builtin_functions:
+            scope[name] = builtin_functions[name]
+        elif name in modules:
+            scope[name] = modules[name]
+        elif name in local_vars:
+            scope[name] = local_vars[name]
+        elif name in variables:
+            scope[name] = variables[name]
+        elif name in functions:
+            scope[name] = FunctionRef(name)
+    return scope
+
+CALL_PATTERN = re.compile(r'(\w+)\((.*)\)')
+# "Affiche la mémoire.": the memory report of dav_memory
+MEMORY_STATEMENT_PATTERN = re.compile(r"(?:affiche|montre|imprime) (?:la )?mémoire\.?$")
+
 def eval_expr(expr, local_vars=None):
     """Evaluate expressions with proper scope handling - FIXED"""
+    variables, functions, modules = namespace()
     if not expr or not expr.strip():
         return None
+    if dav.budget is not None:
+        dav.budget.evaluation()
         
     if local_vars is None:
         local_vars = {}
@@ -98,8 +500,8 @@ def eval_expr(expr, local_vars=None):
         var_value = None
         if var_name in local_vars:
             var_value = local_vars[var_name]
-        elif var_name in dav.variables:
-            var_value = dav.variables[var_name]
+        elif var_name in variables:
+            var_value = variables[var_name]
         
         if var_value is not None:
             try:
@@ -107,33 +509,10 @@ def eval_expr(expr, local_vars=None):
             except (IndexError, TypeError):
                 return None
     
-    # Built-in functions
-    builtin_functions = {
-        'longueur': lambda x: len(x) if hasattr(x, '__len__') else 0,
-        'maximum': lambda lst: max(lst) if lst and hasattr(lst, '__iter__') and not isinstance(lst, str) else None,
-        'minimum': lambda lst: min(lst) if lst and hasattr(lst, '__iter__') and not isinstance(lst, str) else None,
-        'taille': lambda x: len(x) if hasattr(x, '__len__') else 0,
-        'somme': lambda lst: sum(lst) if lst and hasattr(lst, '__iter__') and not isinstance(lst, str) else 0,
-        'moyenne': lambda lst: sum(lst) / len(lst) if lst and hasattr(lst, '__iter__') and not isinstance(lst, str) and len(lst) > 0 else 0,
-        'aleatoire': lambda: random.random(),
-        'entier_aleatoire': lambda a, b: random.randint(a, b),
-        'racine_carree': lambda x: math.sqrt(x),
-        'puissance': lambda x, y: x ** y,
-        'valeur_absolue': lambda x: abs(x),
-        'arrondir': lambda x: round(x),
-        'majuscule': lambda s: s.upper() if isinstance(s, str) else s,
-        'minuscule': lambda s: s.lower() if isinstance(s, str) else s,
-        'contient': lambda s, sub: sub in s if isinstance(s, str) else False,
-        'remplace': lambda s, old, new: s.replace(old, new) if isinstance(s, str) else s,
-        'diviser': lambda s, sep: s.split(sep) if isinstance(s, str) else [],
-        'joindre': lambda lst, sep: sep.join(str(x) for x in lst) if isinstance(lst, list) else "",
-        'trier': lambda lst: sorted(lst) if isinstance(lst, list) else lst,
-        'inverser': lambda lst: list(reversed(lst)) if isinstance(lst, list) else lst,
-    }
-    
-    # Function call detection - IMPROVED
-    func_match = re.match(r'(\w+)\((.*)\)', expr)
-    if func_match:
+    # Function call detection - IMPROVED. Native functions are called from
+    # the compiled expression below instead.
+    func_match = CALL_PATTERN.match(expr)
+    if func_match and func_match.group(1) not in native_functions:
         func_name, args_str = func_match.groups()
         args = []
         
@@ -167,109 +546,86 @@ def eval_expr(expr, local_vars=None):
             try:
                 return builtin_functions[func_name](*args)
             except Exception as e:
-                print(f"Erreur dans fonction built-in {func_name}: {e}")
+                report_error(f"Erreur dans fonction built-in {func_name}: {e}")
                 return None
         
         # Check user-defined functions
-        if func_name in dav.functions:
+        if func_name in functions:
             return call_function(func_name, args, local_vars)
         
         # Function not found
         return None
     
-    # Replace French operators - FIXED ORDER
-    french_ops = [
-        (' est supérieur ou égal à ', ' >= '),
-        (' est inférieur ou égal à ', ' <= '),
-        (' est supérieur à ', ' > '),
-        (' est inférieur à ', ' < '),
-        (' n\'est pas égal à ', ' != '),
-        (' est égal à ', ' == '),
-        (' égale ', ' == '),
-        (' égal ', ' == '),
-        (' multiplié par ', ' * '),
-        (' divisé par ', ' / '),
-        (' division entière par ', ' // '),
-        (' élevé à ', ' ** '),
-        (' à la puissance ', ' ** '),
-        (' modulo ', ' % '),
-        (' mod ', ' % '),
-        (' plus ', ' + '),
-        (' moins ', ' - '),
-        (' fois ', ' * '),
-        (' et ', ' and '),
-        (' ou ', ' or '),
-        (' pas ', ' not ')
-    ]
-    
-    # Apply French operator replacements
+    # Replace French operators
     original_expr = expr
-    for fr_op, py_op in french_ops:
-        expr = expr.replace(fr_op, py_op)
+    expr = translate_expression(expr)
     
-    # Create evaluation scope
-    eval_scope = {}
-    eval_scope.update(dav.variables)  # Global variables
-    eval_scope.update(local_vars)     # Local variables (higher priority)
-    eval_scope.update(dav.modules)    # Modules
-    eval_scope.update(builtin_functions)  # Built-in functions
-    
-    # Add math functions directly to scope
-    eval_scope.update({
-        'sqrt': math.sqrt,
-        'pow': pow,
-        'abs': abs,
-        'round': round,
-        'max': max,
-        'min': min,
-        'sum': sum,
-        'len': len
-    })
-    
-    # Try to evaluate as Python expression
-    try:
-        result = eval(expr, {"__builtins__": {}}, eval_scope)
-        return result
-    except:
-        # If it's just a variable name, look it up
-        if expr in eval_scope:
-            return eval_scope[expr]
-        
-        # Try the original expression as a variable lookup
-        if original_expr in eval_scope:
-            return eval_scope[original_expr]
-        
-        # Last resort: try to parse manually for French expressions
+    # Try to evaluate as Python expression, with only the names it reads in scope
+    compiled = compile_expression(expr)
+    if compiled is not None:
+        code, names = compiled
         try:
-            # Handle "nombre moins 1" pattern
-            if " moins " in original_expr:
-                parts = original_expr.split(" moins ")
-                if len(parts) == 2:
-                    left = eval_expr(parts[0].strip(), local_vars)
-                    right = eval_expr(parts[1].strip(), local_vars) 
-                    if left is not None and right is not None:
-                        return left - right
-                        
-            # Handle "nombre fois " pattern  
-            if " fois " in original_expr:
-                parts = original_expr.split(" fois ")
-                if len(parts) == 2:
-                    left = eval_expr(parts[0].strip(), local_vars)
-                    right = eval_expr(parts[1].strip(), local_vars)
-                    if left is not None and right is not None:
-                        return left * right
-        except:
+            return eval(code, {"__builtins__": {}}, resolve_scope(names, local_vars))
+        except NativeCallError:
+            raise
+        except Exception:
             pass
-        
-        # If all else fails, return None instead of string
-        return None
+    
+    eval_scope = resolve_scope((expr, original_expr), local_vars)
+    
+    # If it's just a variable name, look it up
+    if expr in eval_scope:
+        return eval_scope[expr]
+    
+    # Try the original expression as a variable lookup
+    if original_expr in eval_scope:
+        return eval_scope[original_expr]
+    
+    # Last resort: try to parse manually for French expressions
+    try:
+        # Handle "nombre moins 1" pattern
+        if " moins " in original_expr:
+            parts = original_expr.split(" moins ")
+            if len(parts) == 2:
+                left = eval_expr(parts[0].strip(), local_vars)
+                right = eval_expr(parts[1].strip(), local_vars) 
+                if left is not None and right is not None:
+                    return left - right
+                    
+        # Handle "nombre fois " pattern  
+        if " fois " in original_expr:
+            parts = original_expr.split(" fois ")
+            if len(parts) == 2:
+                left = eval_expr(parts[0].strip(), local_vars)
+                right = eval_expr(parts[1].strip(), local_vars)
+                if left is not None and right is not None:
+                    return left * right
+    except:
+        pass
+    
+    # If all else fails, return None instead of string
+    return None
+
+class FunctionRef:
+    """Picklable reference to a user function, callable from expressions"""
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, *args):
+        return call_function(self.name, list(args))
+
+    def __repr__(self):
+        return f"<fonction {self.name}>"
 
 def call_function(name, args, caller_local_vars=None):
     """Call a user-defined function with proper scope isolation - FIXED"""
-    if name not in dav.functions:
+    variables, functions, modules = namespace()
+    if name not in functions:
         return None
     
-    params, body = dav.functions[name]
+    params, body = functions[name]
     
     # Create new local scope for this function call
     func_local_vars = {}
@@ -282,17 +638,890 @@ def call_function(name, args, caller_local_vars=None):
             func_local_vars[param] = None
     
     # Execute function body
+    if dav.budget is not None:
+        dav.budget.enter_call()
     try:
         execute_blocks(body, func_local_vars)
     except ReturnValue as rv:
         return rv.value
+    finally:
+        if dav.budget is not None:
+            dav.budget.exit_call()
+    
+    return None
+
+class NativeCallError(Exception):
+    """Raised when a native function cannot take its arguments or fails"""
+    pass
+
+def convert_integer(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value!r} n'est pas un nombre entier")
+    return int(value)
+
+def convert_number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    number = to_number(value.strip() if isinstance(value, str) else value)
+    if not isinstance(number, (int, float)):
+        raise ValueError(f"{value!r} n'est pas un nombre")
+    return number
+
+def convert_boolean(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1', 'vrai', 'oui')
+    return bool(value)
+
+# Argument converters by declared type; None passes the value through unchanged
+NATIVE_CONVERTERS = {
+    int: convert_integer, float: float, str: str, bool: convert_boolean,
+    list: list, tuple: tuple, dict: dict, object: None,
+}
+# DAV type names, in both languages, that a declaration may use instead of a type
+NATIVE_TYPE_NAMES = {
+    'number': convert_number, 'nombre': convert_number, 'integer': convert_integer, 'entier': convert_integer,
+    'text': str, 'texte': str, 'boolean': convert_boolean, 'booléen': convert_boolean,
+    'list': list, 'liste': list, 'dictionary': dict, 'dictionnaire': dict, 'any': None,
+}
+
+def native_converter(declared):
+    """Converter for one declared type: a type, a DAV type name, a callable or None"""
+    import inspect
+    if declared is None or declared is inspect.Parameter.empty or declared is inspect.Signature.empty:
+        return None
+    if isinstance(declared, str):
+        if declared in NATIVE_TYPE_NAMES:
+            return NATIVE_TYPE_NAMES[declared]
+        raise ValueError(f"nom de type inconnu '{declared}'")
+    if declared in NATIVE_CONVERTERS:
+        return NATIVE_CONVERTERS[declared]
+    if isinstance(declared, type):
+        # Any other class: keep instances, build one from anything else
+        return lambda value: value if isinstance(value, declared) else declared(value)
+    if callable(declared):
+        return declared
+    raise ValueError(f"impossible de convertir les arguments en {declared!r}")
+
+class NativeFunction:
+    """Python callable registered for DAV programs, with its argument conversions worked out once"""
+    __slots__ = ('name', 'function', 'min_args', 'max_args', 'converters', 'convert_result')
+
+    def __init__(self, name, function, params=None, returns=None):
+        import inspect
+        self.name = name
+        self.function = function
+        try:
+            signature = inspect.signature(function)
+            parameters, return_annotation = list(signature.parameters.values()), signature.return_annotation
+        except (TypeError, ValueError):
+            # Some C functions have no signature: trust the declared types, if any
+            parameters, return_annotation = None, None
+        
+        if parameters is None:
+            self.min_args, self.max_args = 0, None
+        else:
+            positional = [p for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+            self.min_args = sum(1 for p in positional if p.default is p.empty)
+            self.max_args = None if any(p.kind == p.VAR_POSITIONAL for p in parameters) else len(positional)
+            if params is None:
+                params = [p.annotation for p in positional]
+        # Only keep the positions that need converting, so untyped arguments go straight through
+        converters = [native_converter(declared) for declared in (params or ())]
+        self.converters = tuple((index, convert) for index, convert in enumerate(converters) if convert is not None)
+        self.convert_result = native_converter(returns if returns is not None else return_annotation)
+
+    def __call__(self, *args):
+        if len(args) < self.min_args or (self.max_args is not None and len(args) > self.max_args):
+            if self.max_args is None:
+                expected = f"au moins {self.min_args}"
+            elif self.max_args == self.min_args:
+                expected = self.min_args
+            else:
+                expected = f"de {self.min_args} à {self.max_args}"
+            raise NativeCallError(f"{self.name} attend {expected} arguments, reçu {len(args)}")
+        if self.converters:
+            args = list(args)
+            for index, convert in self.converters:
+                if index < len(args):
+                    try:
+                        args[index] = convert(args[index])
+                    except (TypeError, ValueError) as e:
+                        raise NativeCallError(f"argument {index + 1} de {self.name}: {e}") from None
+        try:
+            result = self.function(*args)
+        except (BreakLoop, ContinueLoop, ReturnValue, BudgetExceeded):
+            raise
+        except Exception as e:
+            raise NativeCallError(f"{self.name}: {e}") from e
+        return result if self.convert_result is None else self.convert_result(result)
+
+    def __repr__(self):
+        return f"<fonction native {self.name}>"
+
+# Registered by the embedding program; unlike variables and functions, reset() keeps them
+native_functions = {}
+
+def register_function(name, function, params=None, returns=None):
+    """Make a Python callable available to DAV programs under a name.
+
+    params gives the declared type of each parameter: int, float, str, bool,
+    list, dict, a DAV type name such as 'nombre' or 'texte', any other class,
+    a converter callable, or None to pass the value as it is. Without params
+    the function's annotations are used. returns converts the result the same
+    way. Calls go straight from compiled expressions to the function.
+    """
+    if not re.fullmatch(r'[^\W\d]\w*', name):
+        raise ValueError(f"'{name}' n'est pas un nom DAV valide")
+    native = native_functions[name.lower()] = NativeFunction(name.lower(), function, params, returns)
+    return native
+
+def unregister_function(name):
+    """Remove a native function; unknown names are ignored"""
+    native_functions.pop(name.lower(), None)
+
+MODULE_CACHE_VERSION = 2
+MODULE_CACHE_DIR = os.environ.get('DAV_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'dav')
+
+# Parsed modules by absolute path, as (mtime_ns, size, sha256, blocks). Unlike
+# dav.loaded_modules this survives reset(), so a long-lived process parses a file once.
+compiled_modules = {}
+
+class DAVModule:
+    """Namespace of an imported .dav file: its variables, functions and modules"""
+    def __init__(self, name, path):
+        self._name = name
+        self._path = path
+        self._variables = {}
+        self._functions = {}
+        self._modules = {}
+        self._namespace = (self._variables, self._functions, self._modules)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self._functions:
+            return ModuleFunction(self, attr)
+        if attr in self._variables:
+            return self._variables[attr]
+        if attr in self._modules:
+            return self._modules[attr]
+        raise AttributeError(f"le module {self._name} n'a pas de nom '{attr}'")
+
+    def __repr__(self):
+        return f"<module {self._name} de {self._path}>"
+
+class ModuleFunction:
+    """Function of an imported module, callable from expressions like utils.double(3)"""
+    __slots__ = ('module', 'name')
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+
+    def __call__(self, *args):
+        return run_in_module(self.module, call_function, self.name, list(args))
+
+    def __repr__(self):
+        return f"<fonction {self.module._name}.{self.name}>"
+
+def run_in_module(module, function, *args):
+    """Call function(*args) with the module's variables, functions and modules as the globals"""
+    token = running_namespace.set(module._namespace)
+    try:
+        return function(*args)
+    finally:
+        running_namespace.reset(token)
+
+def module_cache_path(path):
+    """Disk cache file of a module, per interpreter since pickles name its node classes"""
+    import hashlib
+    key = hashlib.sha256(f"{__name__}:{path}".encode('utf-8')).hexdigest()
+    return os.path.join(MODULE_CACHE_DIR, key[:32] + '.pickle')
+
+def read_module_cache(path):
+    """Cached (mtime_ns, size, sha256, blocks) of a module from disk, or None.
+
+    Like snapshots, cache files go stale when the interpreter or Python
+    changes: the header is checked before the parsed blocks are unpickled.
+    """
+    import pickle
+    try:
+        with open(module_cache_path(path), 'rb') as f:
+            if pickle.load(f) != (MODULE_CACHE_VERSION, interpreter_fingerprint(), path):
+                return None
+            return pickle.load(f)
+    except Exception:
+        return None
+
+def write_module_cache(path, entry):
+    """Save a parsed module for the next runs; a cache that cannot be written only costs a re-parse"""
+    import pickle
+    cache_path = module_cache_path(path)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(MODULE_CACHE_DIR, exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            pickle.dump((MODULE_CACHE_VERSION, interpreter_fingerprint(), path), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except (OSError, pickle.PicklingError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def compile_module(path):
+    """Parsed blocks of a .dav file, from memory, from the disk cache or from the parser.
+
+    A changed modification time alone does not re-parse the file: only a
+    different SHA-256 of its content does.
+    """
+    import hashlib
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    entry = compiled_modules.get(path) or read_module_cache(path)
+    if entry is not None and entry[:2] == key:
+        compiled_modules[path] = entry
+        return entry[3]
+    
+    with open(path, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+    if entry is not None and entry[2] == digest:
+        blocks = entry[3]
+    else:
+        lines = [line.rstrip() for line in source.decode('utf-8').split('\n')]
+        blocks = parse_logical_blocks([line for line in lines if line.strip()])
+        report_undefined_names(blocks, os.path.basename(path))
+    entry = compiled_modules[path] = (*key, digest, blocks)
+    write_module_cache(path, entry)
+    return blocks
+
+def resolve_module_path(filename):
+    """Absolute path of an imported file: next to the importing file first, then from the working directory"""
+    importer = dav.import_stack[-1] if dav.import_stack else dav.program_path
+    if importer and not os.path.isabs(filename):
+        candidate = os.path.join(os.path.dirname(importer), filename)
+        if os.path.exists(candidate):
+            return os.path.abspath(candidate)
+    return os.path.abspath(filename)
+
+def import_dav_file(filename, alias=None):
+    """Run a .dav file once per program and bind its namespace in modules"""
+    variables, functions, modules = namespace()
+    path = resolve_module_path(filename)
+    name = (alias or os.path.splitext(os.path.basename(path))[0]).lower()
+    
+    if path in dav.import_stack or path == dav.program_path:
+        chain = ([dav.program_path] if dav.program_path else []) + dav.import_stack + [path]
+        report_error(f"Erreur: import circulaire de {filename} ({' -> '.join(os.path.basename(p) for p in chain)})")
+        return
+    
+    module = dav.loaded_modules.get(path)
+    if module is None:
+        module = DAVModule(name, path)
+        dav.import_stack.append(path)
+        try:
+            blocks = run_in_module(module, compile_module, path)
+            run_in_module(module, execute_blocks, blocks)
+        except OSError as e:
+            report_error(f"Erreur: Impossible d'importer le fichier {filename}: {e.strerror or e}")
+            return
+        finally:
+            dav.import_stack.pop()
+        dav.loaded_modules[path] = module
+    modules[name] = module
+
+def module_references(table, dav_modules):
+    """Picklable stand-in for a modules table: Python modules by name, DAV modules by path.
+
+    The state of every DAV module met on the way goes into dav_modules, with
+    its own modules table encoded the same way.
+    """
+    references = {}
+    for name, module in table.items():
+        if isinstance(module, DAVModule):
+            if module._path not in dav_modules:
+                dav_modules[module._path] = None
+                dav_modules[module._path] = (
+                    module._name,
+                    {key: value for key, value in module._variables.items() if is_picklable(value)},
+                    dict(module._functions),
+                    module_references(module._modules, dav_modules),
+                )
+            references[name] = ('dav', module._path)
+        else:
+            references[name] = ('python', module.__name__)
+    return references
+
+def restore_modules(references, dav_modules, restored):
+    """Modules table back from module_references(); restored maps paths to the DAV modules already rebuilt"""
+    import importlib
+    table = {}
+    for name, (kind, target) in references.items():
+        if kind == 'python':
+            table[name] = importlib.import_module(target)
+            continue
+        module = restored.get(target)
+        if module is None:
+            module_name, module_variables, module_functions, module_modules = dav_modules[target]
+            module = restored[target] = DAVModule(module_name, target)
+            module._variables.update(module_variables)
+            module._functions.update(module_functions)
+            module._modules.update(restore_modules(module_modules, dav_modules, restored))
+        table[name] = module
+    return table
+
+SNAPSHOT_VERSION = 1
+
+def interpreter_fingerprint():
+    """What a snapshot depends on besides its sources: its format, Python, and this interpreter's code"""
+    stat = os.stat(__file__)
+    return (SNAPSHOT_VERSION, sys.hexversion, __name__, stat.st_mtime_ns, stat.st_size)
+
+def source_fingerprint(path):
+    import hashlib
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return (path, stat.st_mtime_ns, stat.st_size, digest)
+
+def source_changed(path, mtime_ns, size, digest):
+    """Whether a file no longer matches its fingerprint; a new mtime alone is checked against the hash"""
+    import hashlib
+    try:
+        stat = os.stat(path)
+        if (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+            return False
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest() != digest
+    except OSError:
+        return True
+
+def save_snapshot(path, sources=()):
+    """Write the interpreter state to a snapshot file.
+
+    The snapshot holds the global variables, the user functions, the imported
+    modules (Python modules by name, DAV modules with their own state) and the
+    compiled expressions. It goes stale when the interpreter, Python or one
+    of the source files changes. Raises ValueError when a variable cannot be
+    saved, since a snapshot without it would not match a real run.
+    """
+    import marshal
+    import pickle
+    unsaved = [name for name, value in dav.variables.items() if not is_picklable(value)]
+    if unsaved:
+        raise ValueError(f"impossible d'enregistrer {', '.join(unsaved)} dans un instantané")
+    dav_modules = {}
+    body = {
+        'variables': dict(dav.variables),
+        'functions': dict(dav.functions),
+        'modules': module_references(dav.modules, dav_modules),
+        'loaded_modules': module_references(dav.loaded_modules, dav_modules),
+        'dav_modules': dav_modules,
+        'expressions': marshal.dumps(list(expression_cache.items())),
+    }
+    header = {'fingerprint': interpreter_fingerprint(), 'sources': [source_fingerprint(source) for source in sources]}
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(body, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def load_snapshot(path):
+    """Replace the interpreter state with a snapshot's.
+
+    Returns False and leaves the state untouched when the snapshot is missing,
+    unreadable, made by another version, or older than one of its sources.
+    """
+    import marshal
+    import pickle
+    try:
+        with open(path, 'rb') as f:
+            header = pickle.load(f)
+            if header['fingerprint'] != interpreter_fingerprint():
+                return False
+            if any(source_changed(*source) for source in header['sources']):
+                return False
+            body = pickle.load(f)
+        restored = {}
+        snapshot_modules = restore_modules(body['modules'], body['dav_modules'], restored)
+        snapshot_loaded = restore_modules(body['loaded_modules'], body['dav_modules'], restored)
+        expressions = marshal.loads(body['expressions'])
+    except Exception:
+        return False
+    
+    dav.variables.clear()
+    dav.variables.update(body['variables'])
+    dav.functions.clear()
+    dav.functions.update(body['functions'])
+    dav.modules.clear()
+    dav.modules.update(snapshot_modules)
+    dav.loaded_modules = snapshot_loaded
+    for expr, entry in expressions[:EXPRESSION_CACHE_SIZE - len(expression_cache)]:
+        expression_cache.setdefault(expr, entry)
+    return True
+
+def boot_prelude(prelude, snapshot=None):
+    """Bring the interpreter to the state a prelude leaves it in, from its snapshot when that is up to date.
+
+    The snapshot is kept next to the module cache unless a path is given. A
+    missing or stale snapshot is never an error: the prelude runs and the
+    snapshot is written again. Returns True when the snapshot was used.
+    """
+    prelude = os.path.abspath(prelude)
+    snapshot = snapshot or os.path.splitext(module_cache_path(prelude))[0] + '.snapshot'
+    if load_snapshot(snapshot):
+        return True
     
+    dav.import_stack.append(prelude)
+    try:
+        execute_program(compile_module(prelude))
+    finally:
+        dav.import_stack.pop()
+    try:
+        os.makedirs(os.path.dirname(snapshot) or '.', exist_ok=True)
+        save_snapshot(snapshot, [prelude] + list(dav.loaded_modules))
+    except (OSError, ValueError) as e:
+        print(f"Attention: le prélude s'exécute à chaque fois, son instantané n'a pas été enregistré: {e}")
+    return False
+
+
+TASK_WORKERS = 64
+
+class Task:
+    """Handle on a function call running in the background"""
+    def __init__(self, name, future):
+        self.name = name
+        self.future = future
+
+    def __repr__(self):
+        return f"<tâche {self.name} ({'terminée' if self.future.done() else 'en cours'})>"
+
+class TaskRunner:
+    """asyncio event loop, on a background thread, that runs DAV tasks.
+
+    Function bodies are synchronous DAV code, so each task runs in the loop's
+    executor and a task that waits only blocks its own worker thread.
+    """
+    def __init__(self, workers=TASK_WORKERS):
+        import asyncio
+        import concurrent.futures
+        import threading
+        
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='dav-task'))
+        self.thread = threading.Thread(target=self.loop.run_forever, name='dav-tasks', daemon=True)
+        self.thread.start()
+        self.pending = []
+
+    async def run(self, name, args):
+        # The executor does not carry the task's context over: pass it along,
+        # so a task started from a module function runs in that module
+        context = contextvars.copy_context()
+        return await self.loop.run_in_executor(None, context.run, call_function, name, args)
+
+    def start(self, name, args):
+        import asyncio
+        
+        task = Task(name, asyncio.run_coroutine_threadsafe(self.run(name, args), self.loop))
+        self.pending.append(task)
+        return task
+
+    def wait(self, task, timeout=None):
+        """Result of a task, waiting at most timeout seconds for it (TimeoutError after that)"""
+        import concurrent.futures
+        
+        if task in self.pending:
+            self.pending.remove(task)
+        if not concurrent.futures.wait([task.future], timeout).done:
+            raise TimeoutError(f"la tâche {task.name} tourne encore")
+        return task.future.result()
+
+    def close(self):
+        """Stop the event loop and shut its worker threads down"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def take_pending(self, timeout=None):
+        """Forget the started tasks and return them, waiting for all of them to end (TimeoutError after timeout)"""
+        import concurrent.futures
+        
+        tasks, self.pending = self.pending, []
+        not_done = concurrent.futures.wait([task.future for task in tasks], timeout).not_done
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} tâches tournent encore")
+        return tasks
+
+def get_task_runner():
+    """The task runner, started on first use"""
+    if dav.task_runner is None:
+        dav.task_runner = TaskRunner()
+    return dav.task_runner
+
+def finish_tasks():
+    """Wait for the tasks a program left running before it ends"""
+    if dav.task_runner is None:
+        return
+    for task in budget_wait(dav.task_runner.take_pending):
+        if task.future.exception() is not None:
+            report_error(f"Erreur dans la tâche {task.name}: {task.future.exception()}")
+
+# Yielded by an actor that waits on a channel, so the scheduler tries the others first
+ACTOR_BLOCKED = object()
+
+class Actor:
+    """A user function call run as a generator that the scheduler resumes"""
+    __slots__ = ('name', 'generator', 'done', 'result')
+
+    def __init__(self, name, generator):
+        self.name = name
+        self.generator = generator
+        self.done = False
+        self.result = None
+
+    def __repr__(self):
+        return f"<acteur {self.name} ({f'terminé: {self.result}' if self.done else 'en cours'})>"
+
+class ActorScheduler:
+    """Round-robin scheduler that interleaves actors in one thread.
+
+    Ready actors run in turn until their next suspension point: a Cède la
+    main, an Attends, or a channel that is empty (Reçois) or full (Envoie).
+    Sleeping actors wait in a heap ordered by wake-up time.
+    """
+    def __init__(self):
+        import collections
+        self.ready = collections.deque()
+        self.sleeping = []
+        self.sequence = 0
+        self.switches = 0
+
+    def spawn(self, name, args):
+        actor = Actor(name, actor_body(name, args))
+        self.ready.append(actor)
+        return actor
+
+    def run(self):
+        """Run until every actor has finished"""
+        import heapq
+        import time
+        
+        ready, sleeping = self.ready, self.sleeping
+        blocked = 0
+        while ready or sleeping:
+            if sleeping:
+                now = time.monotonic()
+                while sleeping and sleeping[0][0] <= now:
+                    ready.append(heapq.heappop(sleeping)[2])
+                    blocked = 0
+                if not ready or blocked > len(ready):
+                    budget_sleep(max(0.0, sleeping[0][0] - now))
+                    continue
+            elif blocked > len(ready):
+                ready.clear()
+                raise RuntimeError("tous les acteurs attendent un canal")
+            
+            actor = ready.popleft()
+            try:
+                signal = next(actor.generator)
+            except StopIteration as stop:
+                actor.done, actor.result = True, stop.value
+                blocked = 0
+                continue
+            except BudgetExceeded:
+                raise
+            except Exception as e:
+                report_error(f"Erreur dans l'acteur {actor.name}: {e}")
+                actor.done = True
+                continue
+            
+            self.switches += 1
+            if signal is ACTOR_BLOCKED:
+                blocked += 1
+                ready.append(actor)
+            elif signal:
+                blocked = 0
+                self.sequence += 1
+                heapq.heappush(sleeping, (time.monotonic() + signal, self.sequence, actor))
+            else:
+                blocked = 0
+                ready.append(actor)
+
+def get_actor_scheduler():
+    """The actor scheduler, created on first use"""
+    if dav.actor_scheduler is None:
+        dav.actor_scheduler = ActorScheduler()
+    return dav.actor_scheduler
+
+def actor_body(name, args):
+    """Generator that runs a user function call, suspending at statement boundaries"""
+    variables, functions, modules = namespace()
+    if name not in functions:
+        return None
+    params, body = functions[name]
+    local_vars = {param: args[i] if i < len(args) else None for i, param in enumerate(params)}
+    try:
+        yield from actor_blocks(body, local_vars)
+    except ReturnValue as rv:
+        return rv.value
     return None
 
+def actor_blocks(blocks, local_vars):
+    """Generator counterpart of execute_blocks and execute_block for actor bodies"""
+    variables, functions, modules = namespace()
+    for block in blocks:
+        if not isinstance(block, Node) or block.type == 'statement':
+            line = block.line if isinstance(block, Node) else str(block)
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if is_suspension_point(line):
+                yield from actor_statement(line, local_vars)
+            else:
+                execute_statement(line, local_vars)
+        elif block.type == 'if':
+            condition_result = eval_expr(block.condition, local_vars)
+            if isinstance(condition_result, str):
+                condition_result = condition_result.lower() in ['vrai', 'true', 'oui']
+            if condition_result:
+                yield from actor_blocks(block.if_body, local_vars)
+            elif block.else_body:
+                yield from actor_blocks(block.else_body, local_vars)
+        elif block.type in ('while_loop', 'for_loop'):
+            yield from actor_loop(block, local_vars)
+        elif block.type == 'do_while_loop':
+            while True:
+                try:
+                    yield from actor_blocks(block.body, local_vars)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    pass
+                if not block.condition or not eval_expr(block.condition, local_vars):
+                    break
+        elif block.type == 'function':
+            functions[block.name] = (block.params, block.body)
+
+def is_suspension_point(line):
+    """Whether a statement may suspend an actor"""
+    return line.lower().startswith(("cède", "attends ", "envoie ", "reçois "))
+
+def actor_statement(line, local_vars):
+    """Run one statement of an actor, yielding where it has to wait"""
+    lower = line.lower().strip().rstrip('.')
+    if lower.startswith("cède"):
+        yield None
+        return
+    match = re.search(r"attends (.+?) secondes?$", lower)
+    if match and " tâche" not in lower:
+        yield to_number(eval_expr(match.group(1), local_vars)) or None
+        return
+    match = (re.search(r"envoie .+ (?:à|au canal) (\w+)$", lower) or
+             re.search(r"reçois (?:une valeur )?(?:de|du canal) (\w+) dans", lower))
+    if match:
+        channel = eval_expr(match.group(1), local_vars)
+        if isinstance(channel, Channel):
+            wait_while = channel.full if lower.startswith("envoie ") else channel.empty
+            while wait_while():
+                yield ACTOR_BLOCKED
+    execute_statement(line, local_vars)
+
+def actor_loop(block, local_vars):
+    """Generator counterpart of the loop executors; forms without a yielding version run to completion"""
+    variables, functions, modules = namespace()
+    var_name, channel, iterations = None, None, None
+    
+    if block.type == 'while_loop':
+        iterations = iter(lambda: bool(eval_expr(block.condition, local_vars)), False)
+    else:
+        loop_line = block.loop_line.lower()
+        match = re.search(r"pour (?:chaque )?(\w+) dans (?:la plage |)(\w+)", loop_line)
+        if match and " fichier " not in loop_line and " en parallèle" not in loop_line:
+            var_name, iterable_name = match.groups()
+            items = local_vars[iterable_name] if iterable_name in local_vars else variables.get(iterable_name, [])
+            if isinstance(items, Channel):
+                channel = items
+            else:
+                iterations = items if isinstance(items, (list, str)) else []
+    
+    if iterations is None and channel is None:
+        execute_for_loop_block(block, local_vars)
+        return
+    
+    iterator = iter(iterations) if channel is None else None
+    while True:
+        if channel is not None:
+            while channel.empty():
+                yield ACTOR_BLOCKED
+            value = channel.next_value()
+            if value is Channel.CLOSED:
+                break
+        else:
+            value = next(iterator, ACTOR_BLOCKED)
+            if value is ACTOR_BLOCKED:
+                break
+        if var_name:
+            local_vars[var_name] = value
+        try:
+            yield from actor_blocks(block.body, local_vars)
+        except BreakLoop:
+            break
+        except ContinueLoop:
+            continue
+
+def report_error(message):
+    """Print an error for the user and count it in dav.error_count"""
+    dav.error_count += 1
+    print(message)
+
 def get_indentation_level(line):
     """Get the indentation level of a line"""
     return len(line) - len(line.lstrip())
 
+FILE_READ_BUFFER_SIZE = 1 << 16
+
+def eval_file_path(operand, local_vars):
+    """Evaluate a file operand: a quoted path keeps its case, anything else is an expression"""
+    operand = operand.strip()
+    if operand[:1] in ('"', "'") and operand[-1:] == operand[:1]:
+        return operand[1:-1]
+    return eval_expr(operand.lower(), local_vars)
+
+def iter_file_lines(path, encoding='utf-8', strip=False):
+    """Lazily yield the lines of a file with buffered reads, never loading it whole"""
+    flush_file_buffers(path)
+    if encoding in ('octets', 'binaire', 'bytes'):
+        # No decoding: yield raw bytes without the line ending
+        with open(path, 'rb', buffering=FILE_READ_BUFFER_SIZE) as f:
+            for raw_line in f:
+                yield raw_line.strip() if strip else raw_line.rstrip(b'\r\n')
+        return
+
+    with open(path, 'r', encoding=encoding, errors='replace', buffering=FILE_READ_BUFFER_SIZE) as f:
+        for raw_line in f:
+            yield raw_line.strip() if strip else raw_line.rstrip('\r\n')
+
+# Files at least this large are read through mmap instead of read()
+MMAP_THRESHOLD = 1 << 20
+# Pending appended lines are written out once they reach this many characters
+APPEND_FLUSH_THRESHOLD = 1 << 20
+NUMBER_PATTERN = re.compile(rb'[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?')
+
+def read_file_text(path, encoding='utf-8'):
+    """Read a whole file into a string, memory-mapping large files"""
+    flush_file_buffers(path)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return f.read().decode(encoding, errors='replace')
+        import mmap
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Decode straight from the mapping, without an intermediate bytes copy
+            return str(mm, encoding, 'replace')
+
+def read_file_numbers(path):
+    """Read every number found in a file into a list"""
+    flush_file_buffers(path)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            tokens = NUMBER_PATTERN.findall(f.read())
+        else:
+            import mmap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                tokens = NUMBER_PATTERN.findall(mm)
+    return [float(token) if b'.' in token or b'e' in token.lower() else int(token) for token in tokens]
+
+def append_file_line(path, text):
+    """Queue a line for a file; queued lines are written in bulk by flush_file_buffers"""
+    line = f"{text}\n"
+    dav.file_buffers.setdefault(path, []).append(line)
+    dav.file_buffers_size += len(line)
+    if dav.file_buffers_size >= APPEND_FLUSH_THRESHOLD:
+        flush_file_buffers()
+
+def write_file(path, value):
+    """Write a value to a file with a single write; lists are written one item per line"""
+    flush_file_buffers(path)
+    if isinstance(value, (list, tuple)):
+        data = "".join(f"{item}\n" for item in value)
+    else:
+        data = "" if value is None else str(value)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(data)
+
+def flush_file_buffers(path=None):
+    """Write pending appended lines (for one path or all of them) with one write per file"""
+    paths = [path] if path is not None else list(dav.file_buffers)
+    for pending_path in paths:
+        pending = dav.file_buffers.pop(pending_path, None)
+        if pending:
+            with open(pending_path, 'a', encoding='utf-8') as f:
+                f.write("".join(pending))
+    if not dav.file_buffers:
+        dav.file_buffers_size = 0
+
+# Lines still queued when the program ends are written out then
+atexit.register(flush_file_buffers)
+
+def intern_body(body):
+    """Freeze a parsed body into a tuple, interning its statement strings"""
+    return tuple(sys.intern(item) if isinstance(item, str) else item for item in body)
+
+class Node:
+    """Base class of parsed program nodes; subclasses use __slots__ to stay small"""
+    __slots__ = ()
+    type = None
+
+class StatementNode(Node):
+    __slots__ = ('line',)
+    type = 'statement'
+
+    def __init__(self, line):
+        self.line = sys.intern(line)
+
+class FunctionNode(Node):
+    __slots__ = ('name', 'params', 'body')
+    type = 'function'
+
+    def __init__(self, name, params, body):
+        self.name = sys.intern(name)
+        self.params = tuple(sys.intern(param) for param in params)
+        self.body = intern_body(body)
+
+class IfNode(Node):
+    __slots__ = ('condition', 'if_body', 'else_body')
+    type = 'if'
+
+    def __init__(self, condition, if_body, else_body):
+        self.condition = sys.intern(condition)
+        self.if_body = intern_body(if_body)
+        self.else_body = intern_body(else_body)
+
+class WhileLoopNode(Node):
+    __slots__ = ('condition', 'body')
+    type = 'while_loop'
+
+    def __init__(self, condition, body):
+        self.condition = sys.intern(condition) if condition is not None else None
+        self.body = intern_body(body)
+
+class DoWhileLoopNode(WhileLoopNode):
+    __slots__ = ()
+    type = 'do_while_loop'
+
+class ForLoopNode(Node):
+    __slots__ = ('loop_line', 'body')
+    type = 'for_loop'
+
+    def __init__(self, loop_line, body):
+        self.loop_line = sys.intern(loop_line)
+        self.body = intern_body(body)
+
 def parse_logical_blocks(lines):
     """Parse lines into logical blocks"""
     blocks = []
@@ -338,7 +1567,7 @@ def parse_logical_blocks(lines):
         
         # Single statement
         else:
-            blocks.append({'type': 'statement', 'line': stripped_line})
+            blocks.append(StatementNode(stripped_line))
             i += 1
     
     return blocks
@@ -351,7 +1580,7 @@ def parse_function_block_with_indentation(lines, start_i):
     # Extract function name
     func_match = re.search(r"(?:crée|créer|définis) une fonction (?:nommée|appelée) (\w+)", line.lower())
     if not func_match:
-        return {'type': 'statement', 'line': line}, start_i + 1
+        return StatementNode(line), start_i + 1
     
     func_name = func_match.group(1)
     
@@ -430,12 +1659,7 @@ def parse_function_block_with_indentation(lines, start_i):
     # Parse the body lines as logical blocks
     body_blocks = parse_logical_blocks(body_lines)
     
-    return {
-        'type': 'function',
-        'name': func_name,
-        'params': params,
-        'body': body_blocks
-    }, i
+    return FunctionNode(func_name, params, body_blocks), i
 
 def parse_if_block_with_indentation(lines, start_i):
     """Parse an if-else block with proper indentation handling - FIXED for nested conditions"""
@@ -497,12 +1721,7 @@ def parse_if_block_with_indentation(lines, start_i):
         
         i += 1
     
-    return {
-        'type': 'if',
-        'condition': condition,
-        'if_body': if_body,
-        'else_body': else_body
-    }, i
+    return IfNode(condition, if_body, else_body), i
 
 def parse_while_block_with_indentation(lines, start_i):
     """Parse a while loop block with proper indentation handling"""
@@ -527,11 +1746,7 @@ def parse_while_block_with_indentation(lines, start_i):
         body.append(current_stripped)
         i += 1
     
-    return {
-        'type': 'while_loop',
-        'condition': loop_line[9:].rstrip(':').strip(),
-        'body': body
-    }, i
+    return WhileLoopNode(loop_line[9:].rstrip(':').strip(), body), i
 
 def parse_for_block_with_indentation(lines, start_i):
     """Parse a for loop block with proper indentation handling"""
@@ -556,11 +1771,7 @@ def parse_for_block_with_indentation(lines, start_i):
         body.append(current_stripped)
         i += 1
     
-    return {
-        'type': 'for_loop',
-        'loop_line': loop_line,
-        'body': body
-    }, i
+    return ForLoopNode(loop_line, body), i
 
 def parse_do_while_block_with_indentation(lines, start_i):
     """Parse a do-while loop block"""
@@ -590,39 +1801,36 @@ def parse_do_while_block_with_indentation(lines, start_i):
         body.append(current_stripped)
         i += 1
     
-    return {
-        'type': 'do_while_loop',
-        'condition': while_condition,
-        'body': body
-    }, i
+    return DoWhileLoopNode(while_condition, body), i
 
 def execute_blocks(blocks, local_vars=None):
     """Execute a list of parsed blocks"""
+    variables, functions, modules = namespace()
     if local_vars is None:
         local_vars = {}
     
     for block in blocks:
         try:
-            if block['type'] == 'statement':
-                execute_statement(block['line'], local_vars)
-            elif block['type'] == 'function':
-                dav.functions[block['name']] = (block['params'], block['body'])
-            elif block['type'] == 'if':
+            if block.type == 'statement':
+                execute_statement(block.line, local_vars)
+            elif block.type == 'function':
+                functions[block.name] = (block.params, block.body)
+            elif block.type == 'if':
                 execute_if_block(block, local_vars)
-            elif block['type'] == 'while_loop':
+            elif block.type == 'while_loop':
                 execute_while_loop_block(block, local_vars)
-            elif block['type'] == 'for_loop':
+            elif block.type == 'for_loop':
                 execute_for_loop_block(block, local_vars)
-            elif block['type'] == 'do_while_loop':
+            elif block.type == 'do_while_loop':
                 execute_do_while_loop_block(block, local_vars)
-        except (BreakLoop, ContinueLoop, ReturnValue):
+        except (BreakLoop, ContinueLoop, ReturnValue, BudgetExceeded):
             raise
         except Exception as e:
-            print(f"Erreur dans le bloc: {e}")
+            report_error(f"Erreur dans le bloc: {e}")
 
 def execute_if_block(block, local_vars):
     """Execute an if block - FIXED"""
-    condition = block['condition']
+    condition = block.condition
     
     # Evaluate condition once and execute only the appropriate branch
     condition_result = eval_expr(condition, local_vars)
@@ -634,26 +1842,332 @@ def execute_if_block(block, local_vars):
         condition_result = bool(condition_result)
     
     if condition_result:
-        execute_block(block['if_body'], local_vars)
-    elif block['else_body']:
-        execute_block(block['else_body'], local_vars)
+        execute_block(block.if_body, local_vars)
+    elif block.else_body:
+        execute_block(block.else_body, local_vars)
 
 def execute_while_loop_block(block, local_vars):
     """Execute a while loop block"""
-    condition = block['condition']
+    condition = block.condition
     
     while eval_expr(condition, local_vars):
         try:
-            execute_block(block['body'], local_vars)
+            execute_loop_body(block.body, local_vars)
         except BreakLoop:
             break
         except ContinueLoop:
             continue
 
+PARALLEL_CHUNKS_PER_WORKER = 4
+
+def parallel_worker_count():
+    """Number of cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def is_picklable(value):
+    """Whether a value can be copied to a worker process"""
+    import pickle
+    try:
+        pickle.dumps(value)
+    except Exception:
+        return False
+    return True
+
+def snapshot_state():
+    """Copy of the interpreter state that worker processes start from"""
+    variables, functions, modules = namespace()
+    dav_modules = {}
+    return {
+        'variables': {name: value for name, value in variables.items() if is_picklable(value)},
+        'functions': dict(functions),
+        'modules': module_references(modules, dav_modules),
+        'dav_modules': dav_modules,
+    }
+
+def init_parallel_worker(state):
+    """Process pool initializer: install the parent's functions, variables and modules"""
+    dav.reset()
+    dav.variables.update(state['variables'])
+    dav.functions.update(state['functions'])
+    dav.modules.update(restore_modules(state['modules'], state['dav_modules'], {}))
+    # Events from workers would never reach the hooks' owner
+    remove_hooks()
+
+def run_parallel_chunk(task):
+    """Run a loop body over one chunk of items inside a worker.
+
+    Returns the items the chunk added to the output list and everything it
+    printed, so the parent can merge both in chunk order.
+    """
+    import contextlib
+    import io
+    
+    body, var_name, items, local_vars, output_name = task
+    collected = []
+    scope = local_vars if output_name in local_vars else dav.variables
+    previous = scope.get(output_name)
+    if output_name:
+        scope[output_name] = collected
+    
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            for item in items:
+                local_vars[var_name] = item
+                try:
+                    execute_block(body, local_vars)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+        finally:
+            flush_file_buffers()
+            if output_name:
+                scope[output_name] = previous
+    return collected, output.getvalue()
+
+def split_chunks(items, count):
+    """Split a list into at most count contiguous chunks of near-equal size"""
+    size, extra = divmod(len(items), count)
+    chunks, start = [], 0
+    for k in range(count):
+        end = start + size + (1 if k < extra else 0)
+        if end > start:
+            chunks.append(items[start:end])
+        start = end
+    return chunks
+
+def parallel_pool_context():
+    """Start method for worker processes.
+
+    Forking would copy locks held by task threads into the workers, so
+    workers start from a fork server, or a fresh interpreter where there is none.
+    """
+    import multiprocessing
+    
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+def run_parallel_tasks(worker, tasks, state, workers=None):
+    """Run worker(task) for every task in a process pool, returning results in task order.
+
+    Falls back to running the tasks in this process when there is a single
+    core, a single task, or when the pool cannot be used. If the pool breaks
+    part way, only the tasks that did not finish in it run again here.
+    """
+    import concurrent.futures
+    import itertools
+    
+    futures = []
+    workers = min(len(tasks), workers or parallel_worker_count())
+    if workers > 1:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=parallel_pool_context(),
+                                                        initializer=init_parallel_worker,
+                                                        initargs=(state,)) as pool:
+                for task in tasks:
+                    futures.append(pool.submit(worker, task))
+        except (OSError, ImportError, NotImplementedError, concurrent.futures.BrokenExecutor):
+            pass
+    
+    # Leaving the pool waited for every submitted task
+    results = []
+    for task, future in itertools.zip_longest(tasks, futures):
+        if future is None or isinstance(future.exception(), concurrent.futures.BrokenExecutor):
+            results.append(worker(task))
+        else:
+            results.append(future.result())
+    return results
+
+PARALLEL_MIN_CHUNK = 16
+
+def plan_chunks(items, workers):
+    """Split a list for a pool: a few chunks per worker, none much smaller than PARALLEL_MIN_CHUNK items"""
+    count = min(workers * PARALLEL_CHUNKS_PER_WORKER, max(1, len(items) // PARALLEL_MIN_CHUNK))
+    return split_chunks(items, count)
+
+def run_function_chunk(task):
+    """Apply ('map') or fold ('reduce') a user function over one chunk of items inside a worker"""
+    import contextlib
+    import io
+    
+    mode, name, items = task
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            if mode == 'map':
+                result = [call_function(name, [item]) for item in items]
+            else:
+                result = items[0]
+                for item in items[1:]:
+                    result = call_function(name, [result, item])
+        finally:
+            flush_file_buffers()
+    return result, output.getvalue()
+
+def run_function_chunks(mode, function, items, workers):
+    """Run a user function over chunks of items in a pool, replaying printed output in chunk order"""
+    tasks = [(mode, function.name, chunk) for chunk in plan_chunks(items, workers)]
+    results = []
+    for result, printed in run_parallel_tasks(run_function_chunk, tasks, snapshot_state(), workers):
+        if printed:
+            sys.stdout.write(printed)
+        results.append(result)
+    return results
+
+def map_parallel(items, function):
+    """Apply a function to every item of a list in worker processes, keeping the list order.
+
+    Small lists, single-core machines and functions that are not user
+    functions run serially in this process.
+    """
+    items = list(items)
+    workers = parallel_worker_count()
+    if not isinstance(function, FunctionRef) or workers < 2 or len(items) < 2 * PARALLEL_MIN_CHUNK:
+        return [function(item) for item in items]
+    return [result for chunk in run_function_chunks('map', function, items, workers) for result in chunk]
+
+def reduce_parallel(items, function, initial):
+    """Fold a list with a two-argument function, folding chunks in worker processes.
+
+    The function must be associative: every chunk is folded on its own, then
+    the initial value is folded with the chunk results in list order.
+    """
+    items = list(items)
+    workers = parallel_worker_count()
+    if not isinstance(function, FunctionRef) or workers < 2 or len(items) < 2 * PARALLEL_MIN_CHUNK:
+        partials = items
+    else:
+        partials = run_function_chunks('reduce', function, items, workers)
+    result = initial
+    for partial in partials:
+        result = function(result, partial)
+    return result
+
+builtin_functions['appliquer_parallele'] = map_parallel
+builtin_functions['reduire_parallele'] = reduce_parallel
+
+def parallel_body_targets(line):
+    """Names a statement changes: the ones it assigns, and the ones it adds to, removes from or increases"""
+    written, _, _ = statement_bindings(line)
+    match = re.match(r"(?:ajoute|enlève) (?:la ligne )?.+ (?:à|de) (\w+)\.?$", line.lower().strip()) or \
+        re.match(r"(?:augmente|diminue) (\w+) de ", line.lower().strip())
+    return written + [match.group(1)] if match else written
+
+def check_parallel_body(body, var_name, output_name, local_vars):
+    """Refuse a parallel for-each body whose result would differ from the plain loop's.
+
+    Workers run the body on copies of the variables: an Arrête would only end
+    its own chunk, and changes to variables that exist before the loop would
+    be lost. The body may add to the output list and use the names it creates.
+    """
+    variables, functions, modules = namespace()
+    for line in iter_block_statements(body):
+        if line.strip().lower() in ["arrête", "stop"]:
+            raise ValueError("Arrête ne peut pas être utilisé dans une boucle parallèle : "
+                             "il n'arrêterait que le morceau de liste d'un seul processus")
+        for name in parallel_body_targets(line):
+            if name not in (var_name, output_name) and (name in local_vars or name in variables):
+                raise ValueError(f"'{name}' ne peut pas être modifié dans une boucle parallèle : les processus "
+                                 f"en modifient des copies. Collecte plutôt les valeurs dans la liste de sortie")
+
+def execute_parallel_for(block, var_name, iterable_name, output_name, local_vars):
+    """Run a for-each body over chunks of a list in worker processes.
+
+    Each worker starts from a copy of the functions and global variables.
+    Printed output and items added to the output list are merged back in
+    list order, so the result does not depend on scheduling. Only those come
+    back: check_parallel_body refuses bodies that stop the loop or change
+    other variables, and the names the body creates are dropped after the
+    loop, even when it runs in this process. Functions the body calls run in
+    the workers too, so their changes to global variables are lost.
+    """
+    variables, functions, modules = namespace()
+    check_parallel_body(block.body, var_name, output_name, local_vars)
+    if iterable_name in local_vars:
+        items = local_vars[iterable_name]
+    else:
+        items = variables.get(iterable_name, [])
+    if not isinstance(items, (list, str)):
+        return
+    items = list(items)
+    if not items:
+        return
+    
+    if output_name:
+        scope = local_vars if output_name in local_vars else variables
+        if not isinstance(scope.get(output_name), list):
+            scope[output_name] = []
+        output = scope[output_name]
+    
+    workers = parallel_worker_count()
+    if workers < 2 or len(items) < 2:
+        # Nothing to gain from a pool: run the loop in this process, keeping
+        # what the body creates to itself as the workers would
+        global_names, local_names = set(variables), set(local_vars)
+        try:
+            for item in items:
+                local_vars[var_name] = item
+                try:
+                    execute_loop_body(block.body, local_vars)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+        finally:
+            for name in set(variables) - global_names:
+                del variables[name]
+            for name in set(local_vars) - local_names:
+                del local_vars[name]
+        return
+    
+    flush_file_buffers()
+    shared_locals = {name: value for name, value in local_vars.items() if is_picklable(value)}
+    chunk_count = workers * PARALLEL_CHUNKS_PER_WORKER
+    tasks = [(block.body, var_name, chunk, dict(shared_locals), output_name)
+             for chunk in split_chunks(items, chunk_count)]
+    
+    for collected, printed in run_parallel_tasks(run_parallel_chunk, tasks, snapshot_state(), workers):
+        if printed:
+            sys.stdout.write(printed)
+        if output_name:
+            output.extend(collected)
+
 def execute_for_loop_block(block, local_vars):
     """Execute a for loop block"""
-    loop_line = block['loop_line']
-    
+    variables, functions, modules = namespace()
+    loop_line = block.loop_line
+
+    # "Pour chaque ligne dans le fichier "data.txt" avec l'encodage "latin-1" sans espaces:"
+    file_match = re.search(r"""pour (?:chaque )?(\w+) dans (?:le )?fichier ("[^"]*"|'[^']*'|\w+)"""
+                           r"""(?: avec l'encodage ("[^"]*"|[\w-]+))?( sans espaces)?""",
+                           loop_line, re.IGNORECASE)
+    if file_match:
+        var_name, path_operand, encoding, sans_espaces = file_match.groups()
+        path = eval_file_path(path_operand, local_vars)
+        encoding = encoding.strip('"') if encoding else 'utf-8'
+
+        for item in iter_file_lines(path, encoding, strip=bool(sans_espaces)):
+            local_vars[var_name.lower()] = item
+            try:
+                execute_loop_body(block.body, local_vars)
+            except BreakLoop:
+                break
+            except ContinueLoop:
+                continue
+        return
+
+    # "Pour chaque élément dans nombres en parallèle en collectant dans résultats:"
+    parallel_match = re.search(r"pour (?:chaque )?(\w+) dans (\w+) en parallèle(?: en collectant dans (\w+))?",
+                               loop_line.lower())
+    if parallel_match:
+        var_name, iterable_name, output_name = parallel_match.groups()
+        execute_parallel_for(block, var_name, iterable_name, output_name, local_vars)
+        return
+
     # Parse the for loop line
     match = re.search(r"pour (?:chaque )?(\w+) dans (?:la plage |)(\w+)", loop_line.lower())
     if match:
@@ -663,16 +2177,16 @@ def execute_for_loop_block(block, local_vars):
         items = []
         if iterable_name in local_vars:
             items = local_vars[iterable_name]
-        elif iterable_name in dav.variables:
-            items = dav.variables[iterable_name]
+        elif iterable_name in variables:
+            items = variables[iterable_name]
         
-        if not isinstance(items, (list, str)):
+        if not isinstance(items, (list, str, Channel)):
             items = []
         
         for item in items:
             local_vars[var_name] = item
             try:
-                execute_block(block['body'], local_vars)
+                execute_loop_body(block.body, local_vars)
             except BreakLoop:
                 break
             except ContinueLoop:
@@ -680,11 +2194,11 @@ def execute_for_loop_block(block, local_vars):
 
 def execute_do_while_loop_block(block, local_vars):
     """Execute a do-while loop block"""
-    condition = block['condition']
+    condition = block.condition
     
     while True:
         try:
-            execute_block(block['body'], local_vars)
+            execute_loop_body(block.body, local_vars)
         except BreakLoop:
             break
         except ContinueLoop:
@@ -700,15 +2214,15 @@ def execute_block(lines, local_vars=None):
     
     for line in lines:
         # Handle both parsed if blocks and statement strings
-        if isinstance(line, dict):
+        if isinstance(line, Node):
             # This is a parsed block (like if-else)
-            if line['type'] == 'if':
+            if line.type == 'if':
                 execute_if_block(line, local_vars)
-            elif line['type'] == 'while_loop':
+            elif line.type == 'while_loop':
                 execute_while_loop_block(line, local_vars)
-            elif line['type'] == 'for_loop':
+            elif line.type == 'for_loop':
                 execute_for_loop_block(line, local_vars)
-            elif line['type'] == 'do_while_loop':
+            elif line.type == 'do_while_loop':
                 execute_do_while_loop_block(line, local_vars)
         else:
             # This is a statement string
@@ -716,138 +2230,194 @@ def execute_block(lines, local_vars=None):
             if line_str and not line_str.startswith('#'):
                 execute_statement(line_str, local_vars)
 
+# Loops run their bodies through this name, so that statistics can count iterations
+execute_loop_body = execute_block
+
 def execute_statement(line, local_vars=None):
     """Execute a single statement"""
     if local_vars is None:
         local_vars = {}
+    if dav.budget is not None:
+        dav.budget.step()
     
     line = line.strip()
     if not line or line.startswith('#'):
         return
     
+    lowered = line.lower()
     try:
+        statement = STATEMENT_PATTERN.match(lowered)
+        
+        # Declarations, assignments and increments, recognized in one pass
+        if statement is not None:
+            kind = statement.lastgroup
+            if kind == 'declaration':
+                handle_variable_declaration(line, statement)
+            elif kind == 'increment':
+                handle_increment_decrement(line, local_vars, statement)
+            else:
+                handle_assignment(line, local_vars, statement)
+        
+        # File input/output; appends only with "au fichier", so "Ajoute "... du fichier" à titre." stays a text-builder append
+        elif lowered.startswith(("lis ", "écris ")) or (lowered.startswith("ajoute ") and " au fichier " in lowered):
+            handle_file_io(line, local_vars)
+        
+        # Background tasks
+        elif lowered.startswith(("lance la tâche ", "lance tâche ", "attends ")):
+            handle_task(line, local_vars)
+        
+        # Actors
+        elif lowered.startswith(("démarre l'acteur ", "démarre un acteur ", "exécute les acteurs", "cède")):
+            handle_actor(line, local_vars)
+        
+        # Channels
+        elif lowered.startswith(("envoie ", "reçois ", "ferme ")):
+            handle_channel(line, local_vars)
+        
+        # Text builder finalization
+        elif lowered.startswith("construis "):
+            handle_text_builder_build(line, local_vars)
+        
         # Variable declarations
-        if any(phrase in line.lower() for phrase in ["j'ai un", "j'ai une", "créer un", "créer une"]):
+        elif any(phrase in lowered for phrase in ["j'ai un", "j'ai une", "créer un", "créer une"]):
             handle_variable_declaration(line)
         
-        # Assignments
-        elif any(phrase in line.lower() for phrase in ["assigne ", "définis ", "mets "]):
+        # Assignments, later in the line ("Puis mets x à 5")
+        elif search_statement(lowered, ASSIGNMENT_KINDS):
             handle_assignment(line, local_vars)
         
         # User input
-        elif "demande à l'utilisateur" in line.lower():
+        elif "demande à l'utilisateur" in lowered:
             handle_user_input(line, local_vars)
         
         # Import modules
-        elif line.lower().startswith("importe "):
+        elif lowered.startswith("importe "):
             handle_import(line)
         
         # Return statement
-        elif line.lower().startswith("je retourne") or line.lower().startswith("retourne"):
+        elif lowered.startswith("je retourne") or lowered.startswith("retourne"):
             handle_return(line, local_vars)
         
         # Break and continue
-        elif line.lower().strip() in ["arrête", "stop"]:
+        elif lowered in ["arrête", "stop"]:
             raise BreakLoop()
-        elif line.lower().strip() in ["continue", "passe"]:
+        elif lowered in ["continue", "passe"]:
             raise ContinueLoop()
         
         # List operations
-        elif "ajoute " in line.lower() and " à " in line.lower():
+        elif "ajoute " in lowered and " à " in lowered:
             handle_list_add(line, local_vars)
         
-        elif "enlève " in line.lower() and " de " in line.lower():
+        elif "enlève " in lowered and " de " in lowered:
             handle_list_remove(line, local_vars)
         
+        # Memory report
+        elif MEMORY_STATEMENT_PATTERN.match(lowered):
+            handle_memory_report()
+        
         # Display operations
-        elif any(word in line.lower() for word in ["affiche ", "montre ", "imprime "]):
+        elif any(word in lowered for word in ["affiche ", "montre ", "imprime "]):
             handle_display(line, local_vars)
         
         # Increase/Decrease operations
-        elif "augmente " in line.lower() or "diminue " in line.lower():
+        elif "augmente " in lowered or "diminue " in lowered:
             handle_increment_decrement(line, local_vars)
         
         # Function calls with "Appelle fonction avec paramètre"
-        elif line.lower().startswith("appelle "):
+        elif lowered.startswith("appelle "):
             handle_function_call(line, local_vars)
         
         # Line break control
-        elif line.lower().strip() == "ligne":
+        elif lowered == "ligne":
             print()  # Force newline
         
         else:
             # Try to evaluate as expression (but don't print result)
             result = eval_expr(line, local_vars)
     
-    except (BreakLoop, ContinueLoop, ReturnValue):
+    except (BreakLoop, ContinueLoop, ReturnValue, BudgetExceeded):
         raise
     except Exception as e:
-        print(f"Erreur: {e}")
+        report_error(f"Erreur: {e}")
 
-def handle_variable_declaration(line):
-    """Handle variable declarations"""
-    patterns = [
-        r"j'ai un (\w+) appelé (\w+)",
-        r"j'ai une (\w+) appelée (\w+)",
-        r"créer un (\w+) appelé (\w+)",
-        r"créer une (\w+) appelée (\w+)",
-        r"j'ai un (\w+) nommé (\w+)",
-        r"j'ai une (\w+) nommée (\w+)"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, line.lower())
+# One alternative per statement kind, with named groups for its operands
+# (prefixed with the kind, since group names must be unique). The combined
+# pattern recognizes a statement and extracts its operands in a single pass.
+STATEMENT_GRAMMAR = {
+    'declaration': r"(?:j'ai|créer) une? (?P<declaration_type>constructeur de texte|\w+) (?:appelée?|nommée?) (?P<declaration_name>\w+)"
+                   r"(?: (?:de|avec une) capacité (?:de )?(?P<declaration_capacity>.+?)\.?$)?",
+    'set': r"(?:mets|définis) (?P<set_name>\w+) à (?P<set_value>.+)",
+    'assign': r"assigne (?P<assign_value>.+) à (?P<assign_name>\w+)",
+    'increment': r"(?P<increment_verb>augmente|diminue) (?P<increment_name>\w+) de (?P<increment_amount>.+)",
+}
+STATEMENT_PATTERN = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in STATEMENT_GRAMMAR.items()))
+STATEMENT_KIND_PATTERNS = {kind: re.compile(f"(?P<{kind}>{pattern})") for kind, pattern in STATEMENT_GRAMMAR.items()}
+ASSIGNMENT_KINDS = ('set', 'assign')
+
+def search_statement(lowered, kinds):
+    """Match for the first of these statement kinds found anywhere in the line, or None"""
+    for kind in kinds:
+        match = STATEMENT_KIND_PATTERNS[kind].search(lowered)
         if match:
-            var_type, var_name = match.groups()
-            if var_type in ['nombre', 'entier', 'int']:
-                dav.variables[var_name] = 0
-            elif var_type in ['chaîne', 'str', 'texte']:
-                dav.variables[var_name] = ""
-            elif var_type in ['booléen', 'bool']:
-                dav.variables[var_name] = False
-            elif var_type in ['liste', 'array']:
-                dav.variables[var_name] = []
-            elif var_type in ['dictionnaire', 'dict']:
-                dav.variables[var_name] = {}
-            else:
-                dav.variables[var_name] = None
-            break
+            return match
+    return None
+
+def handle_variable_declaration(line, match=None):
+    """Handle variable declarations"""
+    variables, functions, modules = namespace()
+    match = match or search_statement(line.lower(), ('declaration',))
+    if not match:
+        return
+    var_type, var_name, capacity_expr = match.group('declaration_type', 'declaration_name', 'declaration_capacity')
+    if var_type == 'constructeur de texte':
+        variables[var_name] = TextBuilder()
+    elif var_type == 'canal':
+        capacity = int(to_number(eval_expr(capacity_expr))) if capacity_expr else CHANNEL_CAPACITY
+        variables[var_name] = Channel(capacity)
+    elif var_type in ['nombre', 'entier', 'int']:
+        variables[var_name] = 0
+    elif var_type in ['chaîne', 'str', 'texte']:
+        variables[var_name] = ""
+    elif var_type in ['booléen', 'bool']:
+        variables[var_name] = False
+    elif var_type in ['liste', 'array']:
+        variables[var_name] = []
+    elif var_type in ['dictionnaire', 'dict']:
+        variables[var_name] = {}
+    else:
+        variables[var_name] = None
 
-def handle_assignment(line, local_vars):
+def handle_assignment(line, local_vars, match=None):
     """Handle assignments"""
-    patterns = [
-        r"mets (\w+) à (.+)",
-        r"définis (\w+) à (.+)",
-        r"assigne (.+) à (\w+)"
-    ]
+    variables, functions, modules = namespace()
+    match = match or search_statement(line.lower(), ASSIGNMENT_KINDS)
+    if not match:
+        return
+    kind = match.lastgroup
+    var_name, value_expr = match.group(kind + '_name', kind + '_value')
     
-    for pattern in patterns:
-        match = re.search(pattern, line.lower())
-        if match:
-            if "assigne" in pattern:
-                value_expr, var_name = match.groups()
-            else:
-                var_name, value_expr = match.groups()
-            
-            value = eval_expr(value_expr.strip(), local_vars)
-            
-            # Assign to local scope if we're in a function, otherwise global
-            if local_vars and var_name in local_vars:
-                local_vars[var_name] = value
-            else:
-                # For assignments, prefer local scope if we have it
-                if local_vars:
-                    local_vars[var_name] = value
-                else:
-                    dav.variables[var_name] = value
-            break
+    value = eval_expr(value_expr.strip(), local_vars)
+    
+    # Assign to local scope if we're in a function, otherwise global
+    if local_vars and var_name in local_vars:
+        local_vars[var_name] = value
+    else:
+        # For assignments, prefer local scope if we have it
+        if local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+
+# Where the user's answers come from; dav_replay swaps in a recording or a replay
+read_input = input
 
 def handle_user_input(line, local_vars):
     """Handle user input"""
+    variables, functions, modules = namespace()
     match = re.search(r"demande à l'utilisateur.*?(?:pour|de donner.*?pour|la valeur de|la valeur pour) (\w+)", line.lower())
     if match:
         var_name = match.group(1)
-        user_input = input(f"Entrez la valeur pour {var_name}: ")
+        user_input = read_input(f"Entrez la valeur pour {var_name}: ")
         
         # Try to convert to appropriate type
         value = user_input
@@ -860,23 +2430,145 @@ def handle_user_input(line, local_vars):
         if var_name in local_vars:
             local_vars[var_name] = value
         else:
-            dav.variables[var_name] = value
+            variables[var_name] = value
 
 def handle_import(line):
-    """Handle imports"""
+    """Handle imports like 'Importe le module math' or 'Importe le fichier utils.dav'"""
+    variables, functions, modules = namespace()
+    match = re.search(r"""importe (?:le )?fichier ("[^"]*"|'[^']*'|[\w./\\-]+?)(?: comme (\w+))?\.?$""", line, re.IGNORECASE)
+    if match:
+        filename, alias = match.groups()
+        import_dav_file(filename.strip('"\''), alias)
+        return
+    
     match = re.search(r"importe (?:le module )?(\w+)", line.lower())
     if match:
         module_name = match.group(1)
         try:
-            if module_name == 'math':
-                dav.modules['math'] = math
-            elif module_name == 'random':
-                dav.modules['random'] = random
-            else:
-                dav.modules[module_name] = importlib.import_module(module_name)
+            import importlib
+            modules[module_name] = importlib.import_module(module_name)
         except ImportError:
             print(f"Attention: Impossible d'importer le module {module_name}")
 
+def handle_file_io(line, local_vars):
+    """Handle file statements like 'Lis le fichier "data.txt" dans texte'"""
+    variables, functions, modules = namespace()
+    path_pattern = r"""("[^"]*"|'[^']*'|\w+)"""
+
+    match = re.search(r"lis (?:les )?nombres du fichier " + path_pattern + r" dans (\w+)", line, re.IGNORECASE)
+    if match:
+        path_operand, var_name = match.groups()
+        value = read_file_numbers(eval_file_path(path_operand, local_vars))
+    else:
+        match = re.search(r"lis (?:le )?fichier " + path_pattern +
+                          r"""(?: avec l'encodage ("[^"]*"|[\w-]+))? dans (\w+)""", line, re.IGNORECASE)
+        if match:
+            path_operand, encoding, var_name = match.groups()
+            encoding = encoding.strip('"') if encoding else 'utf-8'
+            value = read_file_text(eval_file_path(path_operand, local_vars), encoding)
+
+    if match:
+        var_name = var_name.lower()
+        if var_name in local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+        return
+
+    match = re.search(r"ajoute (?:la ligne )?(.+) au fichier " + path_pattern, line, re.IGNORECASE)
+    if match:
+        value_expr, path_operand = match.groups()
+        append_file_line(eval_file_path(path_operand, local_vars), eval_expr(value_expr, local_vars))
+        return
+
+    match = re.search(r"écris (?:la liste )?(.+) dans (?:le )?fichier " + path_pattern, line, re.IGNORECASE)
+    if match:
+        value_expr, path_operand = match.groups()
+        write_file(eval_file_path(path_operand, local_vars), eval_expr(value_expr, local_vars))
+
+def handle_task(line, local_vars):
+    """Handle background tasks like 'Lance la tâche charger avec url comme travail' or 'Attends la tâche travail dans page'"""
+    variables, functions, modules = namespace()
+    lower = line.lower().strip().rstrip('.')
+    
+    match = re.search(r"lance (?:la )?tâche (\w+)(?: avec (.+?))?(?: comme (\w+))?$", lower)
+    if match:
+        func_name, args_expr, var_name = match.groups()
+        args = [eval_expr(part.strip(), local_vars) for part in args_expr.split(" et ")] if args_expr else []
+        value = get_task_runner().start(func_name, args)
+    elif re.search(r"attends toutes les tâches", lower):
+        budget_wait(get_task_runner().take_pending)
+        return
+    else:
+        match = re.search(r"attends (?:la )?tâche (\w+)(?: dans (\w+))?", lower)
+        if match:
+            task_expr, var_name = match.groups()
+            task = eval_expr(task_expr, local_vars)
+            if not isinstance(task, Task):
+                raise TypeError(f"'{task_expr}' n'est pas une tâche")
+            value = budget_wait(get_task_runner().wait, task)
+        else:
+            match = re.search(r"attends (.+?) secondes?$", lower)
+            if match:
+                budget_sleep(to_number(eval_expr(match.group(1), local_vars)))
+            return
+    
+    if var_name:
+        if local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+
+def handle_actor(line, local_vars):
+    """Handle actors like 'Démarre l'acteur ouvrier avec 5 comme o' or 'Exécute les acteurs'"""
+    variables, functions, modules = namespace()
+    lower = line.lower().strip().rstrip('.')
+    
+    match = re.search(r"démarre (?:l'acteur|un acteur) (\w+)(?: avec (.+?))?(?: comme (\w+))?$", lower)
+    if match:
+        func_name, args_expr, var_name = match.groups()
+        args = [eval_expr(part.strip(), local_vars) for part in args_expr.split(" et ")] if args_expr else []
+        actor = get_actor_scheduler().spawn(func_name, args)
+        if var_name:
+            if local_vars:
+                local_vars[var_name] = actor
+            else:
+                variables[var_name] = actor
+    elif lower.startswith("exécute"):
+        get_actor_scheduler().run()
+    # "Cède la main" outside an actor has nothing to give way to
+
+def handle_channel(line, local_vars):
+    """Handle channel statements like 'Envoie x à travaux', 'Reçois de travaux dans élément' or 'Ferme travaux'"""
+    variables, functions, modules = namespace()
+    lower = line.lower().strip().rstrip('.')
+    
+    def get_channel(name):
+        channel = eval_expr(name, local_vars)
+        if not isinstance(channel, Channel):
+            raise TypeError(f"'{name}' n'est pas un canal")
+        return channel
+    
+    match = re.search(r"envoie (.+) (?:à|au canal) (\w+)$", lower)
+    if match:
+        value_expr, channel_name = match.groups()
+        budget_wait(get_channel(channel_name).send, eval_expr(value_expr, local_vars))
+        return
+    
+    match = re.search(r"reçois (?:une valeur )?(?:de|du canal) (\w+) dans (\w+)", lower)
+    if match:
+        channel_name, var_name = match.groups()
+        value = budget_wait(get_channel(channel_name).receive)
+        if local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+        return
+    
+    match = re.search(r"ferme (?:le canal )?(\w+)$", lower)
+    if match:
+        get_channel(match.group(1)).close()
+
 def handle_return(line, local_vars):
     """Handle return statements"""
     if line.lower().startswith("je retourne"):
@@ -889,22 +2581,55 @@ def handle_return(line, local_vars):
 
 def handle_list_add(line, local_vars):
     """Handle adding to lists"""
+    variables, functions, modules = namespace()
     match = re.search(r"ajoute (.+) à (\w+)", line.lower())
     if match:
         value_expr, list_name = match.groups()
+        target = local_vars[list_name] if list_name in local_vars else variables.get(list_name)
+        if isinstance(target, TextBuilder):
+            handle_text_builder_add(line, target, local_vars)
+            return
+        
         value = eval_expr(value_expr, local_vars)
         
         target_list = None
         if list_name in local_vars and isinstance(local_vars[list_name], list):
             target_list = local_vars[list_name]
-        elif list_name in dav.variables and isinstance(dav.variables[list_name], list):
-            target_list = dav.variables[list_name]
+        elif list_name in variables and isinstance(variables[list_name], list):
+            target_list = variables[list_name]
         
         if target_list is not None:
             target_list.append(value)
 
+def handle_text_builder_add(line, builder, local_vars):
+    """Handle appending to a text builder like 'Ajoute la ligne "Total" à rapport'"""
+    # Match on the original line so that string literals keep their case
+    match = re.search(r"ajoute (la ligne )?(.+) à \w+", line, re.IGNORECASE)
+    if match:
+        as_line, value_expr = match.groups()
+        value = eval_expr(value_expr.strip(), local_vars)
+        if as_line:
+            builder.append_line(value)
+        else:
+            builder.append(value)
+
+def handle_text_builder_build(line, local_vars):
+    """Handle text builder finalization like 'Construis rapport dans texte'"""
+    variables, functions, modules = namespace()
+    match = re.search(r"construis (\w+) dans (\w+)", line.lower())
+    if match:
+        builder_name, var_name = match.groups()
+        builder = local_vars[builder_name] if builder_name in local_vars else variables.get(builder_name)
+        value = builder.build() if isinstance(builder, TextBuilder) else str(builder)
+        
+        if var_name in local_vars:
+            local_vars[var_name] = value
+        else:
+            variables[var_name] = value
+
 def handle_list_remove(line, local_vars):
     """Handle removing from lists"""
+    variables, functions, modules = namespace()
     match = re.search(r"enlève (.+) de (\w+)", line.lower())
     if match:
         value_expr, list_name = match.groups()
@@ -913,14 +2638,14 @@ def handle_list_remove(line, local_vars):
         target_list = None
         if list_name in local_vars and isinstance(local_vars[list_name], list):
             target_list = local_vars[list_name]
-        elif list_name in dav.variables and isinstance(dav.variables[list_name], list):
-            target_list = dav.variables[list_name]
+        elif list_name in variables and isinstance(variables[list_name], list):
+            target_list = variables[list_name]
         
         if target_list and value in target_list:
             target_list.remove(value)
 
-def handle_display(line, local_vars):
-    """Handle display operations with user-controlled line breaks"""
+def parse_display(line):
+    """Extract the expression of a display statement and whether it ends the line"""
     line_lower = line.lower()
     
     # Extract what to display
@@ -958,6 +2683,12 @@ def handle_display(line, local_vars):
         # Default behavior: no newline (user controls it)
         add_newline = False
     
+    return expr, add_newline
+
+def handle_display(line, local_vars):
+    """Handle display operations with user-controlled line breaks"""
+    expr, add_newline = parse_display(line)
+    
     if expr:
         result = eval_expr(expr, local_vars)
         if add_newline:
@@ -965,30 +2696,26 @@ def handle_display(line, local_vars):
         else:
             print(result, end='')  # Without newline
 
-def handle_increment_decrement(line, local_vars):
+def handle_increment_decrement(line, local_vars, match=None):
     """Handle increment/decrement operations"""
-    patterns = [
-        (r"augmente (\w+) de (.+)", 1),
-        (r"diminue (\w+) de (.+)", -1)
-    ]
-    
-    for pattern, sign in patterns:
-        match = re.search(pattern, line.lower())
-        if match:
-            var_name, amount_expr = match.groups()
-            amount = eval_expr(amount_expr, local_vars) * sign
-            
-            current_value = 0
-            if var_name in local_vars:
-                current_value = local_vars[var_name] or 0
-                local_vars[var_name] = current_value + amount
-            elif var_name in dav.variables:
-                current_value = dav.variables[var_name] or 0
-                dav.variables[var_name] = current_value + amount
-            break
+    variables, functions, modules = namespace()
+    match = match or search_statement(line.lower(), ('increment',))
+    if not match:
+        return
+    verb, var_name, amount_expr = match.group('increment_verb', 'increment_name', 'increment_amount')
+    amount = eval_expr(amount_expr, local_vars) * (-1 if verb == 'diminue' else 1)
+    
+    current_value = 0
+    if var_name in local_vars:
+        current_value = local_vars[var_name] or 0
+        local_vars[var_name] = current_value + amount
+    elif var_name in variables:
+        current_value = variables[var_name] or 0
+        variables[var_name] = current_value + amount
 
 def handle_function_call(line, local_vars):
     """Handle function calls like 'Appelle fonction avec paramètre'"""
+    variables, functions, modules = namespace()
     # Parse "Appelle nom_fonction avec paramètre"
     match = re.search(r"appelle (\w+) avec (.+)", line.lower())
     if match:
@@ -1011,17 +2738,536 @@ def handle_function_call(line, local_vars):
             args_list.append(arg_value)
         
         # Call the function
-        if func_name in dav.functions:
+        if func_name in functions:
             result = call_function(func_name, args_list, local_vars)
             return result
+        if func_name in native_functions:
+            return native_functions[func_name](*args_list)
     
     # Parse "Appelle nom_fonction" (no parameters)
     match = re.search(r"appelle (\w+)", line.lower())
     if match:
         func_name = match.group(1)
-        if func_name in dav.functions:
+        if func_name in functions:
             result = call_function(func_name, [], local_vars)
             return result
+        if func_name in native_functions:
+            return native_functions[func_name]()
+
+def handle_memory_report():
+    """Print the memory used by the variables in reach, with the records of a running MemoryInspector"""
+    import dav_memory
+    flush_output()
+    interpreter = sys.modules[__name__]
+    inspector = next((hooks for hooks in dav.hooks if isinstance(hooks, dav_memory.MemoryInspector)), None)
+    print(dav_memory.format_report(dav_memory.memory_report(interpreter, inspector), 'fr'))
+
+class Hooks:
+    """Base class for tracing hooks: override the events to watch, the others cost nothing.
+
+    on_statement(line_no, text)     before a statement runs
+    on_call(name, args)             when a user function is entered
+    on_return(name, value)          when a user function returns, or ends with an error (value None)
+    on_error(line_no, text, error)  when a statement raises, before the error goes on
+    line_no is the statement's line in the program source, or None when the
+    program was not loaded by run_dav/run_dav_code while hooks were installed.
+    Hooks run in the process that installed them, not in parallel loop workers.
+    """
+    def on_statement(self, line_no, text):
+        pass
+
+    def on_call(self, name, args):
+        pass
+
+    def on_return(self, name, value):
+        pass
+
+    def on_error(self, line_no, text, error):
+        pass
+
+HOOK_EVENTS = ('on_statement', 'on_call', 'on_return', 'on_error')
+# Control flow travels as exceptions; these are not errors
+CONTROL_FLOW_EXCEPTIONS = (BreakLoop, ContinueLoop, ReturnValue, BudgetExceeded)
+
+# Dispatch lists built from dav.hooks by refresh_hooks()
+statement_hooks = call_hooks = return_hooks = error_hooks = ()
+
+untraced_execute_statement = execute_statement
+untraced_call_function = call_function
+
+def hook_methods(event):
+    """Bound methods of the installed hooks that handle an event, skipping the Hooks no-ops"""
+    methods = []
+    for hooks in dav.hooks:
+        method = getattr(hooks, event, None)
+        if method is not None and getattr(method, '__func__', None) is not getattr(Hooks, event):
+            methods.append(method)
+    return tuple(methods)
+
+def refresh_hooks():
+    """Swap the traced dispatch in while some hook listens, and the plain one back otherwise"""
+    global statement_hooks, call_hooks, return_hooks, error_hooks, execute_statement, call_function
+    statement_hooks, call_hooks, return_hooks, error_hooks = (hook_methods(event) for event in HOOK_EVENTS)
+    execute_statement = traced_execute_statement if statement_hooks or error_hooks else untraced_execute_statement
+    call_function = traced_call_function if call_hooks or return_hooks else untraced_call_function
+
+def install_hooks(hooks):
+    """Start sending execution events to hooks, a Hooks instance or any object with some of its methods"""
+    if not any(hasattr(hooks, event) for event in HOOK_EVENTS):
+        raise TypeError(f"{hooks!r} n'a aucune des méthodes {', '.join(HOOK_EVENTS)}")
+    dav.hooks.append(hooks)
+    refresh_hooks()
+
+def remove_hooks(hooks=None):
+    """Stop sending events to hooks, or to every installed hook when none is given"""
+    if hooks is None:
+        dav.hooks.clear()
+    elif hooks in dav.hooks:
+        dav.hooks.remove(hooks)
+    refresh_hooks()
+
+def index_source_lines(lines):
+    """Remember where each statement text sits in the program source, when hooks need line numbers"""
+    dav.traced_lines = {}
+    dav.last_line_no = None
+    if not dav.hooks:
+        return
+    for line_no, line in enumerate(lines, 1):
+        text = line.strip()
+        if text:
+            dav.traced_lines.setdefault(text, []).append(line_no)
+
+def source_line_number(text):
+    """Line of a statement in the source.
+
+    A text found on several lines is taken at its first line after the last
+    statement traced, wrapping around to the top as loops and calls do.
+    """
+    line_nos = dav.traced_lines.get(text)
+    if line_nos is None:
+        return None
+    if len(line_nos) == 1 or dav.last_line_no is None:
+        dav.last_line_no = line_nos[0]
+    else:
+        import bisect
+        position = bisect.bisect_right(line_nos, dav.last_line_no)
+        dav.last_line_no = line_nos[position if position < len(line_nos) else 0]
+    return dav.last_line_no
+
+def traced_execute_statement(line, local_vars=None):
+    """execute_statement with the statement and error events sent out"""
+    text = line.strip()
+    line_no = source_line_number(text)
+    for hook in statement_hooks:
+        hook(line_no, text)
+    try:
+        untraced_execute_statement(line, local_vars)
+    except CONTROL_FLOW_EXCEPTIONS:
+        raise
+    except Exception as e:
+        for hook in error_hooks:
+            hook(line_no, text, e)
+        raise
+
+def traced_call_function(name, args, caller_local_vars=None):
+    """call_function with the call and return events sent out"""
+    variables, functions, modules = namespace()
+    if name not in functions:
+        return None
+    for hook in call_hooks:
+        hook(name, args)
+    value = None
+    try:
+        value = untraced_call_function(name, args, caller_local_vars)
+        return value
+    finally:
+        # Also sent when the call raises, so hooks that track the call stack stay in step
+        for hook in return_hooks:
+            hook(name, value)
+
+class ExecutionStats(Hooks):
+    """Counters of what the interpreter did, collected in dav.stats while enabled by enable_stats().
+
+    Counters add up over every program run until clear() is called. The
+    statement kinds are the statement grammar's kinds (declaration, set,
+    increment, ...) and otherwise the statement's first word. Loop
+    iterations do not include parallel loops run by worker processes.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.statements = {}
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.function_calls = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.loop_iterations = 0
+        self.output_bytes = 0
+        self.parse_seconds = 0.0
+        self.execution_seconds = 0.0
+
+    def on_statement(self, line_no, text):
+        kind = statement_kind(text)
+        self.statements[kind] = self.statements.get(kind, 0) + 1
+
+    def on_call(self, name, args):
+        self.function_calls += 1
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+    def on_return(self, name, value):
+        self.depth -= 1
+
+    def as_dict(self):
+        """The counters as plain data, ready for json.dumps"""
+        return {
+            'statements': sum(self.statements.values()),
+            'statements_by_kind': dict(sorted(self.statements.items(), key=lambda item: (-item[1], item[0]))),
+            'evaluations': self.evaluations,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'function_calls': self.function_calls,
+            'max_call_depth': self.max_depth,
+            'loop_iterations': self.loop_iterations,
+            'output_bytes': self.output_bytes,
+            'parse_seconds': round(self.parse_seconds, 6),
+            'execution_seconds': round(self.execution_seconds, 6),
+        }
+
+    def format(self, style='table'):
+        """The counters as a table for people, or as JSON with style='json'"""
+        report = self.as_dict()
+        if style == 'json':
+            import json
+            return json.dumps(report, indent=2)
+        lookups = report['cache_hits'] + report['cache_misses']
+        rows = [("instructions", f"{report['statements']:,}")]
+        rows += [(f"  {kind}", f"{count:,}") for kind, count in report['statements_by_kind'].items()]
+        rows += [
+            ("évaluations d'expressions", f"{report['evaluations']:,}"),
+            ("expressions déjà compilées", f"{report['cache_hits']:,} sur {lookups:,}"),
+            ("appels de fonctions", f"{report['function_calls']:,}"),
+            ("profondeur d'appel maximale", f"{report['max_call_depth']:,}"),
+            ("itérations de boucles", f"{report['loop_iterations']:,}"),
+            ("octets affichés", f"{report['output_bytes']:,}"),
+            ("temps d'analyse", f"{report['parse_seconds'] * 1000:.2f} ms"),
+            ("temps d'exécution", f"{report['execution_seconds'] * 1000:.2f} ms"),
+        ]
+        width = max(len(label) for label, _ in rows)
+        return "\n".join(f"{label:<{width}}  {value:>12}" for label, value in rows)
+
+class CountingWriter:
+    """Stand-in for sys.stdout that counts the bytes written through it"""
+    def __init__(self, stream, stats):
+        self.stream = stream
+        self.stats = stats
+
+    def write(self, text):
+        self.stats.output_bytes += len(text.encode('utf-8'))
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class StatsPhase:
+    """Times one phase of a run ('parse' or 'execution') and counts its output, while stats are enabled"""
+    __slots__ = ('phase', 'stats', 'started', 'stdout')
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.stats = dav.stats
+
+    def __enter__(self):
+        if self.stats is not None:
+            import time
+            self.stdout = sys.stdout
+            sys.stdout = CountingWriter(sys.stdout, self.stats)
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.stats is not None:
+            import time
+            elapsed = time.perf_counter() - self.started
+            sys.stdout = self.stdout
+            if self.phase == 'parse':
+                self.stats.parse_seconds += elapsed
+            else:
+                self.stats.execution_seconds += elapsed
+
+# Filler words skipped when a statement's kind is taken from its first word
+STATEMENT_KIND_FILLERS = {'je', 'vais', 'maintenant', 'puis', 'alors'}
+
+def statement_kind(text):
+    lowered = text.lower()
+    statement = STATEMENT_PATTERN.match(lowered)
+    if statement is not None:
+        return statement.lastgroup
+    for word in lowered.split():
+        if word not in STATEMENT_KIND_FILLERS:
+            return word.strip('.:,;!')
+    return 'empty'
+
+uncounted_eval_expr = eval_expr
+uncounted_compile_expression = compile_expression
+uncounted_execute_loop_body = execute_loop_body
+
+def counted_eval_expr(expr, local_vars=None):
+    dav.stats.evaluations += 1
+    return uncounted_eval_expr(expr, local_vars)
+
+def counted_compile_expression(expr):
+    if expr in expression_cache:
+        dav.stats.cache_hits += 1
+    else:
+        dav.stats.cache_misses += 1
+    return uncounted_compile_expression(expr)
+
+def counted_execute_loop_body(lines, local_vars=None):
+    dav.stats.loop_iterations += 1
+    return uncounted_execute_loop_body(lines, local_vars)
+
+def enable_stats(stats=None):
+    """Start counting what the interpreter does, into stats or a new ExecutionStats, and return it.
+
+    Like the tracing hooks, counting swaps in instrumented functions, so
+    runs without statistics pay nothing for them.
+    """
+    global eval_expr, compile_expression, execute_loop_body
+    if dav.stats is not None:
+        disable_stats()
+    dav.stats = stats or ExecutionStats()
+    install_hooks(dav.stats)
+    eval_expr = counted_eval_expr
+    compile_expression = counted_compile_expression
+    execute_loop_body = counted_execute_loop_body
+    return dav.stats
+
+def disable_stats():
+    """Stop counting and return the statistics collected, or None when they were not enabled"""
+    global eval_expr, compile_expression, execute_loop_body
+    stats, dav.stats = dav.stats, None
+    if stats is not None:
+        remove_hooks(stats)
+    eval_expr = uncounted_eval_expr
+    compile_expression = uncounted_compile_expression
+    execute_loop_body = uncounted_execute_loop_body
+    return stats
+
+def statement_bindings(line):
+    """Return (names written, names read, expressions read) for one statement.
+
+    The operands are extracted the way the matching handler extracts them, so
+    the expressions are exactly the ones eval_expr will see at run time.
+    """
+    lower = line.lower().strip()
+    written, read, expressions = [], [], []
+    
+    if lower.startswith("si "):
+        condition = line.strip()[3:].rstrip(':').strip()
+        if condition.endswith(" alors"):
+            condition = condition[:-6].strip()
+        expressions.append(condition)
+    elif lower.startswith("tant que "):
+        expressions.append(line.strip()[9:].rstrip(':').strip())
+    elif lower.startswith("pour "):
+        match = re.search(r"pour (?:chaque )?(\w+) dans (?:la plage |)(\w+)", lower)
+        if match:
+            written.append(match.group(1))
+            if " fichier " not in lower:
+                read.append(match.group(2))
+    elif lower.startswith(("démarre l'acteur ", "démarre un acteur ")):
+        match = re.search(r"démarre (?:l'acteur|un acteur) (\w+)(?: avec (.+?))?(?: comme (\w+))?$", lower.rstrip('.'))
+        if match:
+            read.append(match.group(1))
+            if match.group(2):
+                expressions.extend(part.strip() for part in match.group(2).split(" et "))
+            if match.group(3):
+                written.append(match.group(3))
+    elif lower.startswith(("lance la tâche ", "lance tâche ", "attends ")):
+        lower = lower.rstrip('.')
+        match = re.search(r"lance (?:la )?tâche (\w+)(?: avec (.+?))?(?: comme (\w+))?$", lower)
+        if match:
+            read.append(match.group(1))
+            if match.group(2):
+                expressions.extend(part.strip() for part in match.group(2).split(" et "))
+            if match.group(3):
+                written.append(match.group(3))
+        elif not re.search(r"attends toutes les tâches", lower):
+            match = re.search(r"attends (?:la )?tâche (\w+)(?: dans (\w+))?", lower)
+            if match:
+                read.append(match.group(1))
+                if match.group(2):
+                    written.append(match.group(2))
+            else:
+                match = re.search(r"attends (.+?) secondes?$", lower)
+                if match:
+                    expressions.append(match.group(1))
+    elif lower.startswith(("envoie ", "reçois ", "ferme ")):
+        lower = lower.rstrip('.')
+        match = re.search(r"envoie (.+) (?:à|au canal) (\w+)$", lower)
+        if match:
+            expressions.append(match.group(1))
+            read.append(match.group(2))
+        match = re.search(r"reçois (?:une valeur )?(?:de|du canal) (\w+) dans (\w+)", lower)
+        if match:
+            read.append(match.group(1))
+            written.append(match.group(2))
+        match = re.search(r"ferme (?:le canal )?(\w+)$", lower)
+        if match:
+            read.append(match.group(1))
+    elif lower.startswith(("lis ", "construis ")):
+        match = re.search(r"dans (\w+)\.?$", lower)
+        if match:
+            written.append(match.group(1))
+    elif any(phrase in lower for phrase in ["j'ai un", "j'ai une", "créer un", "créer une"]):
+        match = re.search(r"(?:appelée?|nommée?) (\w+)", lower)
+        if match:
+            written.append(match.group(1))
+    elif search_statement(lower, ASSIGNMENT_KINDS):
+        for pattern, target_first in ((r"mets (\w+) à (.+)", True), (r"définis (\w+) à (.+)", True), (r"assigne (.+) à (\w+)", False)):
+            match = re.search(pattern, lower)
+            if match:
+                target, value_expr = match.groups() if target_first else reversed(match.groups())
+                written.append(target)
+                expressions.append(value_expr.strip())
+                break
+    elif "demande à l'utilisateur" in lower:
+        match = re.search(r"demande à l'utilisateur.*?(?:pour|de donner.*?pour|la valeur de|la valeur pour) (\w+)", lower)
+        if match:
+            written.append(match.group(1))
+    elif lower.startswith("importe "):
+        match = re.search(r"""importe (?:le )?fichier ("[^"]*"|'[^']*'|[\w./\\-]+?)(?: comme (\w+))?\.?$""", lower)
+        if match:
+            written.append(match.group(2) or os.path.splitext(os.path.basename(match.group(1).strip('"\'')))[0])
+        else:
+            match = re.search(r"importe (?:le module )?(\w+)", lower)
+            if match:
+                written.append(match.group(1))
+    elif lower.startswith("je retourne") or lower.startswith("retourne"):
+        expressions.append(line.strip()[12:] if lower.startswith("je retourne") else line.strip()[8:])
+    elif ("ajoute " in lower and " à " in lower) or ("enlève " in lower and " de " in lower):
+        match = re.search(r"(?:ajoute|enlève) (?:la ligne )?(.+) (?:à|de) (\w+)", lower)
+        if match:
+            expressions.append(match.group(1))
+            read.append(match.group(2))
+    elif any(word in lower for word in ["affiche ", "montre ", "imprime "]):
+        expr, _ = parse_display(line)
+        if expr:
+            expressions.append(expr)
+    elif "augmente " in lower or "diminue " in lower:
+        match = re.search(r"(?:augmente|diminue) (\w+) de (.+)", lower)
+        if match:
+            read.append(match.group(1))
+            expressions.append(match.group(2))
+    elif lower.startswith("appelle "):
+        match = re.search(r"appelle (\w+)(?: avec (.+))?", lower)
+        if match:
+            read.append(match.group(1))
+            if match.group(2):
+                expressions.extend(part.strip() for part in match.group(2).rstrip('.').split(" et "))
+    
+    return written, read, expressions
+
+def expression_names(expr):
+    """Names an expression reads, as eval_expr will see it (empty if it is not Python)"""
+    import ast
+    
+    expr = expr.strip()
+    if expr.endswith('.'):
+        expr = expr[:-1].strip()
+    if not expr or expr[0] in '"\'' or expr.lower() in ('vrai', 'faux'):
+        return []
+    try:
+        tree = ast.parse(translate_expression(expr), mode='eval')
+    except (SyntaxError, ValueError):
+        return []
+    return [node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)]
+
+def iter_block_statements(blocks):
+    """Yield every statement line of a list of blocks, descending into bodies"""
+    for block in blocks:
+        if isinstance(block, str):
+            yield block
+        elif block.type == 'statement':
+            yield block.line
+        elif block.type == 'if':
+            yield "si " + block.condition
+            yield from iter_block_statements(block.if_body)
+            yield from iter_block_statements(block.else_body)
+        elif block.type == 'while_loop':
+            yield "tant que " + block.condition
+            yield from iter_block_statements(block.body)
+        elif block.type == 'for_loop':
+            yield block.loop_line
+            yield from iter_block_statements(block.body)
+        elif block.type == 'do_while_loop':
+            yield from iter_block_statements(block.body)
+            if block.condition:
+                yield "tant que " + block.condition
+
+def find_undefined_names(blocks):
+    """Warn about names a parsed program reads but never binds.
+
+    A lint pass run before execution; it does not change how names are
+    looked up. Inside a function, its parameters and the names its body
+    assigns or loops over are local. Declarations, top-level writes and
+    function names are global. Returns one warning per unbound name and
+    statement.
+    """
+    variables, functions, modules = namespace()
+    global_names = set(variables) | set(functions) | set(native_functions) | set(modules)
+    global_names.update(builtin_functions, math_functions, ('None', 'True', 'False'))
+    function_blocks = [block for block in blocks if block.type == 'function']
+    global_names.update(block.name for block in function_blocks)
+    
+    for line in iter_block_statements([block for block in blocks if block.type != 'function']):
+        written, _, _ = statement_bindings(line)
+        global_names.update(written)
+    
+    local_names = []
+    for block in function_blocks:
+        names = set(block.params)
+        for line in iter_block_statements(block.body):
+            written, _, _ = statement_bindings(line)
+            lower = line.lower()
+            if any(phrase in lower for phrase in ["assigne ", "définis ", "mets "]) or lower.startswith("pour "):
+                names.update(written)
+            else:
+                global_names.update(written)
+        local_names.append(names)
+    
+    warnings = []
+    
+    def check(lines, bound):
+        for line in lines:
+            _, read, expressions = statement_bindings(line)
+            for expr in expressions:
+                read = read + expression_names(expr)
+            for name in dict.fromkeys(read):
+                if name not in bound and name not in global_names:
+                    warnings.append(f"Attention: '{name}' n'est pas défini (dans: {line.strip()})")
+    
+    check(iter_block_statements([block for block in blocks if block.type != 'function']), set())
+    for block, names in zip(function_blocks, local_names):
+        check(iter_block_statements(block.body), names)
+    
+    return warnings
+
+def report_undefined_names(blocks, source=None):
+    """Print the warnings of find_undefined_names on stderr when dav.show_warnings is set.
+
+    Off by default: the warnings would land in the output of programs run by
+    dav_batch, dav_daemon and dav_cluster, which treat stderr as failure.
+    """
+    if not dav.show_warnings:
+        return
+    for warning in find_undefined_names(blocks):
+        print(f"{source}: {warning}" if source else warning, file=sys.stderr)
 
 def flush_output():
     """Flush any pending output"""
@@ -1029,56 +3275,89 @@ def flush_output():
         print("".join(dav.output_buffer))
         dav.output_buffer = []
 
-def run_dav(filename):
-    """Run a .dav program from a file"""
+def execute_program(blocks, budget=None):
+    """Run parsed top-level blocks, under an execution budget if one is given"""
+    if budget is not None:
+        budget.start()
+    previous, dav.budget = dav.budget, budget
+    try:
+        execute_blocks(blocks)
+        finish_tasks()
+    except BudgetExceeded as e:
+        flush_output()
+        print(f"Budget dépassé: {e}")
+    finally:
+        dav.budget = previous
+
+def run_dav(filename, budget=None, prelude=None, snapshot=None):
+    """Run a .dav program from a file, optionally limited by an ExecutionBudget.
+
+    With a prelude, the program starts from the state the prelude leaves,
+    restored from its snapshot when possible (see boot_prelude).
+    """
     try:
         with open(filename, 'r', encoding='utf-8') as f:
             lines = f.readlines()
+        index_source_lines(lines)
         
         lines = [line.rstrip() for line in lines]
         lines = [line for line in lines if line.strip()]
         
         # Reset interpreter state
         dav.reset()
+        dav.program_path = os.path.abspath(filename)
+        if prelude:
+            boot_prelude(prelude, snapshot)
         
-        # Parse and execute
-        blocks = parse_logical_blocks(lines)
-        execute_blocks(blocks)
-        
-        # Flush any remaining output
-        flush_output()
+        # Parse, report unbound names (--warnings), then execute
+        with StatsPhase('parse'):
+            blocks = parse_logical_blocks(lines)
+            report_undefined_names(blocks)
+        with StatsPhase('execution'):
+            execute_program(blocks, budget)
+            
+            # Flush any remaining output
+            flush_output()
         
-    except FileNotFoundError:
-        print(f"Erreur: Fichier '{filename}' non trouvé.")
+    except FileNotFoundError as e:
+        report_error(f"Erreur: Fichier '{e.filename or filename}' non trouvé.")
     except ReturnValue:
         # Top-level return should just end execution
         flush_output()
     except Exception as e:
         import traceback
-        print(f"Erreur lors de l'exécution du programme: {e}")
+        report_error(f"Erreur lors de l'exécution du programme: {e}")
         print("Trace:")
         traceback.print_exc()
         flush_output()
+    finally:
+        flush_file_buffers()
 
-def run_dav_code(code):
-    """Run .dav code from a string"""
+def run_dav_code(code, budget=None):
+    """Run .dav code from a string, optionally limited by an ExecutionBudget"""
     try:
         lines = [line.rstrip() for line in code.split('\n')]
+        index_source_lines(lines)
         lines = [line for line in lines if line.strip()]
         
         # Reset interpreter state
         dav.reset()
         
-        # Parse and execute
-        blocks = parse_logical_blocks(lines)
-        execute_blocks(blocks)
-        
-        # Flush any remaining output
-        flush_output()
+        # Parse, report unbound names (--warnings), then execute
+        with StatsPhase('parse'):
+            blocks = parse_logical_blocks(lines)
+            report_undefined_names(blocks)
+        with StatsPhase('execution'):
+            execute_program(blocks, budget)
+            
+            # Flush any remaining output
+            flush_output()
         
     except Exception as e:
-        print(f"Erreur lors de l'exécution: {e}")
+        report_error(f"Erreur lors de l'exécution: {e}")
         flush_output()
+    finally:
+        flush_file_buffers()
 
 def test_pierre_papier_ciseaux():
     """Test the fixed conditional logic with Pierre-Papier-Ciseaux"""
@@ -1210,6 +3489,529 @@ Affiche trier(nombres).
     run_dav_code(code)
     print()
 
+def test_text_builder():
+    """Test linear-time text assembly with a text builder"""
+    code = '''
+J'ai un constructeur de texte appelé rapport.
+Ajoute "Total: " à rapport.
+Ajoute 3 plus 4 à rapport.
+Ajoute la ligne "." à rapport.
+Construis rapport dans texte.
+Affiche texte.
+'''
+    print("Test Constructeur de Texte (devrait afficher 'Total: 7.'):")
+    run_dav_code(code)
+    print()
+
+def test_file_lines():
+    """Test streaming iteration over the lines of a file"""
+    import os
+    import tempfile
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+        f.write("alpha\n  beta  \ngamma\n")
+        path = f.name
+
+    code = f'''
+J'ai un nombre appelé compte.
+Pour chaque ligne dans le fichier "{path}" sans espaces:
+    Affiche ligne.
+    Augmente compte de 1.
+Affiche " -> lignes: ".
+Affiche compte.
+'''
+    print("Test Lecture de Fichier Ligne par Ligne (devrait afficher 3 lignes):")
+    try:
+        run_dav_code(code)
+    finally:
+        os.remove(path)
+    print()
+
+def test_appended_lines():
+    """Test iterating over lines appended to a file earlier in the program"""
+    import os
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "journal.txt")
+        code = f'''
+J'ai un nombre appelé compte.
+J'ai un constructeur de texte appelé titre.
+Ajoute "lignes du fichier lu: " à titre.
+Ajoute la ligne "un" au fichier "{path}".
+Ajoute la ligne "deux" au fichier "{path}".
+Pour chaque ligne dans le fichier "{path}":
+    Augmente compte de 1.
+Ajoute compte à titre.
+Construis titre dans texte.
+Affiche texte.
+'''
+        print("Test Lignes Ajoutées puis Parcourues (devrait afficher 'lignes du fichier lu: 2'):")
+        run_dav_code(code)
+    print()
+
+def test_imports():
+    """Test importing the functions and variables of another .dav file"""
+    import os
+    import tempfile
+    global MODULE_CACHE_DIR
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "outils.dav")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("J'ai un nombre appelé facteur.\nMets facteur à 3.\n"
+                    "Crée une fonction nommée échelle qui prend n.\n    Attends 0.2 secondes.\n"
+                    "    Retourne n fois facteur.\n")
+        # The task reads facteur while outils.échelle runs: it must see the program's
+        code = f'''
+J'ai un nombre appelé facteur.
+Mets facteur à 100.
+Créer une fonction nommée lire qui prend délai.
+    Attends délai secondes.
+    Je retourne facteur.
+Importe le fichier "{path}".
+Lance la tâche lire avec 0.1 comme lecture.
+Affiche [outils.échelle(2), outils.facteur, facteur].
+Attends la tâche lecture dans vu.
+Affiche vu.
+'''
+        print("Test Import de Fichier DAV (devrait afficher [6, 3, 100]100):")
+        saved, MODULE_CACHE_DIR = MODULE_CACHE_DIR, os.path.join(directory, "cache")
+        try:
+            run_dav_code(code)
+        finally:
+            MODULE_CACHE_DIR = saved
+    print()
+
+def test_snapshot():
+    """Test booting a program from the snapshot of its prelude"""
+    import os
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        prelude = os.path.join(directory, "prelude.dav")
+        program = os.path.join(directory, "programme.dav")
+        snapshot = os.path.join(directory, "prelude.snapshot")
+        with open(prelude, 'w', encoding='utf-8') as f:
+            f.write("J'ai un nombre appelé base.\nMets base à 40.\n"
+                    "Crée une fonction nommée ajoute qui prend n.\n    Retourne n plus base.\n")
+        with open(program, 'w', encoding='utf-8') as f:
+            f.write("Affiche ajoute(2).\n")
+        print("Test Instantané du Prélude (devrait afficher 42 deux fois, la seconde depuis l'instantané):")
+        run_dav(program, prelude=prelude, snapshot=snapshot)
+        print()
+        print(f"instantané utilisé: {load_snapshot(snapshot)}")
+        run_dav(program, prelude=prelude, snapshot=snapshot)
+    print()
+
+def test_cluster_messages():
+    """Test that the cluster coordinator answers malformed messages with an error"""
+    import json
+    import socket
+    import dav_cluster
+
+    coordinator = dav_cluster.Coordinator('127.0.0.1', 0).start()
+    token = coordinator.token
+    messages = [
+        {'type': 'submit', 'token': token},
+        {'type': 'submit', 'token': token, 'jobs': ["Affiche 1."]},
+        {'type': 'submit', 'token': token, 'jobs': [{'source': "Affiche 1.", 'limits': {'max_stepz': 1}}]},
+        {'type': 'bonjour', 'token': token},
+        [token],
+    ]
+    print("Test Messages Mal Formés du Cluster (devrait afficher 5 réponses error):")
+    try:
+        for message in messages:
+            with socket.create_connection(coordinator.address, timeout=5) as conn:
+                conn.sendall(json.dumps(message).encode('utf-8') + b"\n")
+                reply = json.loads(conn.makefile('rb').readline())
+            print(f"{reply['type']}: {reply['message']}")
+    finally:
+        coordinator.stop()
+    print()
+
+def test_native_functions():
+    """Test a Python function registered for both languages with dav_native"""
+    import dav_native
+    import interpreteur_anglais
+    # dav_native registers in the imported modules, which are not __main__ when this file runs as a script
+    import interpreteur_francais
+
+    @dav_native.native(en='area', fr='aire')
+    def area(width: float, height: float) -> float:
+        return width * height
+
+    print("Test Fonctions Natives (devrait afficher [6.0, 5.0], deux erreurs, [6.0, 5.0], une erreur, puis False False):")
+    try:
+        interpreteur_francais.run_dav_code('Affiche [aire(2, 3), aire("2.5", 2)].')
+        print()
+        interpreteur_francais.run_dav_code('Affiche aire(2).')
+        interpreteur_francais.run_dav_code('Affiche aire("deux", 2).')
+        interpreteur_anglais.reset()
+        interpreteur_anglais.run_dav_code('Show [area(2, 3), area("2.5", 2)] line.')
+        try:
+            interpreteur_anglais.native_functions['area'](1, 2, 3)
+        except interpreteur_anglais.NativeCallError as e:
+            print(e)
+    finally:
+        dav_native.unregister(en='area', fr='aire')
+    print('aire' in interpreteur_francais.native_functions, 'area' in interpreteur_anglais.native_functions)
+    print()
+
+def test_hooks():
+    """Test that every traced call gets its return event, even when it raises, and that removing the hooks restores the plain dispatch"""
+    class Journal(Hooks):
+        def __init__(self):
+            self.events = []
+
+        def on_call(self, name, args):
+            self.events.append(f"appel {name}{list(args)}")
+
+        def on_return(self, name, value):
+            self.events.append(f"retour {name} {value}")
+
+    code = '''
+Crée une fonction nommée double qui prend n.
+    Je retourne n fois 2.
+Crée une fonction nommée descend qui prend n.
+    Je retourne descend(n plus 1).
+Affiche double(4).
+Affiche descend(0).
+'''
+    journal = Journal()
+    print("Test Crochets de Traçage (devrait afficher 8, le budget dépassé, 4 appels de descend suivis de 4 retours, puis True True):")
+    install_hooks(journal)
+    try:
+        # The depth budget makes the innermost call raise, and every call above it with it
+        run_dav_code(code, ExecutionBudget(max_depth=3))
+    finally:
+        remove_hooks(journal)
+    print(journal.events)
+    print(execute_statement is untraced_execute_statement, call_function is untraced_call_function)
+    print()
+
+def test_stats():
+    """Test the execution statistics of a small program: statements by kind, calls, loop iterations and output"""
+    code = '''
+J'ai un nombre appelé total.
+Crée une fonction nommée double qui prend n.
+    Je retourne n fois 2.
+J'ai une liste appelée nombres.
+Ajoute 1 à nombres.
+Ajoute 2 à nombres.
+Ajoute 3 à nombres.
+Pour chaque élément dans nombres:
+    Mets doublé à double(élément).
+    Mets total à total plus doublé.
+Affiche total.
+'''
+    print("Test Statistiques d'Exécution (devrait afficher 12, puis 15 instructions, 3 appels à la profondeur 1, 3 itérations et 2 octets):")
+    stats = enable_stats()
+    try:
+        run_dav_code(code)
+    finally:
+        disable_stats()
+    print()
+    report = stats.as_dict()
+    print({key: report[key] for key in ('statements', 'statements_by_kind', 'function_calls', 'max_call_depth', 'loop_iterations', 'output_bytes')})
+    print()
+
+def test_memory():
+    """Test that the memory inspector names the largest variable, counts calls, samples the timeline and finds the locals of a running function"""
+    import sys
+    import dav_memory
+
+    class LocalNames(Hooks):
+        def __init__(self):
+            self.seen = set()
+
+        def on_statement(self, line_no, text):
+            self.seen.update((scope, name) for scope, name, size in dav_memory.variable_sizes(interpreter) if scope != 'global')
+
+    code = '''
+J'ai une liste appelée nombres.
+J'ai un nombre appelé i.
+Tant que i est inférieur à 200:
+    Ajoute i à nombres.
+    Augmente i de 1.
+Crée une fonction nommée double qui prend n.
+    Je retourne n fois 2.
+Mets a à double(1).
+Mets b à double(2).
+'''
+    print("Test Inspecteur Mémoire (devrait afficher nombres en premier, 2 appels de double, un relevé toutes les 100 instructions, la variable locale n de double, puis True):")
+    interpreter = sys.modules[__name__]
+    local_names = LocalNames()
+    inspector = dav_memory.MemoryInspector(interpreter, every=100).start()
+    install_hooks(local_names)
+    try:
+        run_dav_code(code)
+    finally:
+        remove_hooks(local_names)
+        inspector.stop()
+    report = inspector.report()
+    print([(row['scope'], row['name']) for row in report['variables']])
+    print({name: record['calls'] for name, record in report['functions'].items()}, [sample['statements'] for sample in report['timeline']])
+    print(sorted(local_names.seen))
+    print(report['variables'][0]['bytes'] == dav_memory.deep_size(dav.variables['nombres']))
+    print()
+
+def test_replay():
+    """Test that replaying a recorded session gives the same answers and random numbers without reading the keyboard"""
+    import contextlib
+    import io
+    import json
+    import os
+    import sys
+    import tempfile
+    import dav_replay
+
+    code = '''
+Demande à l'utilisateur la valeur de essai.
+Mets tirage à entier_aleatoire(1, 1000000).
+Affiche tirage.
+Affiche essai fois 2.
+'''
+    interpreter = sys.modules[__name__]
+    print("Test Enregistrement et Rejeu (devrait afficher True, la réponse enregistrée et 0 réponse inutilisée):")
+    keyboard = sys.stdin
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'session.json')
+        outputs = []
+        try:
+            for options, answers in (({'record': path}, "21\n"), ({'replay': path}, "")):
+                sys.stdin = io.StringIO(answers)
+                session = dav_replay.start_session(interpreter, program='guess.dav', **options)
+                out = io.StringIO()
+                try:
+                    with contextlib.redirect_stdout(out):
+                        run_dav_code(code)
+                finally:
+                    unused = session.stop()
+                outputs.append(out.getvalue())
+        finally:
+            sys.stdin = keyboard
+        with open(path, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+    print(outputs[0] == outputs[1], recorded['inputs'], unused)
+    print()
+
+def test_statement_grammar():
+    """Test that the statement grammar dispatches on the statement's first words, not on a substring found anywhere"""
+    lignes = ["Augmente sommets de 1.", "Créer une liste nommée l.", "Assigne 42 à réponse.", "Affiche sommets plus 1."]
+    code = '''
+J'ai un nombre appelé sommets.
+Mets sommets à 5.
+Augmente sommets de 1.
+Affiche sommets plus 1.
+'''
+    print("Test Grammaire des Instructions (devrait afficher increment, declaration, assign et None, puis True, puis 7):")
+    print([statement.lastgroup if statement else None for statement in map(STATEMENT_PATTERN.match, map(str.lower, lignes))])
+    # The elif chain this grammar replaced tested for "mets " anywhere in the line, and took the increment and the output below for assignments
+    print("mets " in lignes[0].lower())
+    run_dav_code(code)
+    print()
+    print()
+
+def test_parsed_nodes():
+    """Test that parsed blocks are slotted nodes with frozen bodies and shared statement strings, and that they survive pickling"""
+    import pickle
+
+    def describe(value):
+        if isinstance(value, Node):
+            return (type(value).__name__,) + tuple(describe(getattr(value, slot)) for cls in type(value).__mro__ for slot in getattr(cls, '__slots__', ()))
+        if isinstance(value, tuple):
+            return tuple(describe(item) for item in value)
+        return value
+
+    code = '''
+Mets n à 3.
+Crée une fonction nommée double qui prend n.
+    Je retourne n fois 2.
+Si n est supérieur à 2:
+    Affiche "grand".
+Sinon:
+    Affiche "petit".
+Tant que n est supérieur à 0:
+    Diminue n de 1.
+Mets n à 3.
+'''
+    print("Test Nœuds du Programme Analysé (devrait afficher les classes des blocs, False, tuple partout, puis True True):")
+    blocks = parse_logical_blocks(code.split('\n'))
+    print([type(block).__name__ for block in blocks])
+    print(any(hasattr(block, '__dict__') for block in blocks))
+    print([type(block.body).__name__ for block in blocks if hasattr(block, 'body')], type(blocks[2].if_body).__name__, type(blocks[2].else_body).__name__)
+    # The first and last statements are the same line, stored once
+    print(blocks[0].line is blocks[-1].line, describe(tuple(pickle.loads(pickle.dumps(blocks)))) == describe(tuple(blocks)))
+    print()
+
+def test_flame_profile():
+    """Test the collapsed stacks of a recursive program, weighted by statements so they do not depend on the machine"""
+    import io
+    import dav_profile
+
+    code = '''
+Crée une fonction nommée fact qui prend n.
+    Si n est inférieur à 2:
+        Je retourne 1.
+    Je retourne n fois fact(n moins 1).
+Mets x à fact(3).
+Affiche x.
+'''
+    print("Test Profil en Piles Repliées (devrait afficher 6, puis une pile par ligne, fact:5 deux fois sous fact.dav:6 et fact:4 au bout, puis fact.dav:7):")
+    profiler = dav_profile.FlameProfiler('fact.dav', 'statements')
+    install_hooks(profiler)
+    try:
+        run_dav_code(code)
+    finally:
+        remove_hooks(profiler)
+        profiler.finish()
+    print()
+    out = io.StringIO()
+    profiler.write_collapsed(out)
+    print(out.getvalue())
+
+def test_parallel_for():
+    """Test a parallel for-each loop that collects into an output list"""
+    code = '''
+J'ai une liste appelée nombres.
+J'ai une liste appelée carrés.
+Ajoute 1 à nombres.
+Ajoute 2 à nombres.
+Ajoute 3 à nombres.
+Ajoute 4 à nombres.
+Ajoute 5 à nombres.
+Ajoute 6 à nombres.
+Créer une fonction nommée carre qui prend x.
+    Je retourne x fois x.
+Pour chaque élément dans nombres en parallèle en collectant dans carrés:
+    Ajoute carre(élément) à carrés.
+Affiche carrés.
+'''
+    print("Test Boucle Parallèle (devrait afficher [1, 4, 9, 16, 25, 36]):")
+    run_dav_code(code)
+    print()
+
+def test_parallel_rules():
+    """Test that a parallel loop refuses bodies whose result would depend on the worker processes"""
+    code = '''
+J'ai une liste appelée nombres.
+J'ai une liste appelée carrés.
+Ajoute 1 à nombres.
+Ajoute 2 à nombres.
+Ajoute 3 à nombres.
+Pour chaque élément dans nombres en parallèle en collectant dans carrés:
+    Mets carré à élément fois élément.
+    Ajoute carré à carrés.
+Affiche carrés.
+'''
+    print("Test Règles de la Boucle Parallèle (devrait afficher [1, 4, 9] puis deux refus):")
+    run_dav_code(code)
+    print()
+    for body in (["Augmente total de élément."], ["Si élément est supérieur à 1:", "Arrête"]):
+        try:
+            check_parallel_body(body, 'élément', 'carrés', {'total': 0})
+        except ValueError as e:
+            print(e)
+    print()
+
+def test_tasks():
+    """Test background tasks that overlap their waits"""
+    code = '''
+Créer une fonction nommée attendre qui prend nom et délai.
+    Attends délai secondes.
+    Je retourne nom.
+Lance la tâche attendre avec "b" et 0.2 comme premiere.
+Lance la tâche attendre avec "a" et 0.1 comme seconde.
+Attends la tâche premiere dans x.
+Attends la tâche seconde dans y.
+Affiche y plus x.
+'''
+    print("Test Tâches en Arrière-plan (devrait afficher 'ab'):")
+    run_dav_code(code)
+    print()
+
+def test_channels():
+    """Test a producer and a consumer task that pass values through a bounded channel"""
+    code = '''
+J'ai un canal appelé travaux de capacité 1.
+J'ai une liste appelée reçus.
+Créer une fonction nommée producteur qui prend n.
+    Envoie "a" à travaux.
+    Envoie "b" à travaux.
+    Envoie "c" à travaux.
+    Ferme travaux.
+Lance la tâche producteur avec 0.
+Pour chaque valeur dans travaux:
+    Ajoute valeur à reçus.
+Affiche reçus.
+'''
+    print("Test Canaux (devrait afficher ['a', 'b', 'c']):")
+    run_dav_code(code)
+    print()
+
+def test_map_parallel():
+    """Test the parallel map and reduce built-ins with user functions"""
+    code = '''
+J'ai une liste appelée nombres.
+Ajoute 1 à nombres.
+Ajoute 2 à nombres.
+Ajoute 3 à nombres.
+Créer une fonction nommée double qui prend n.
+    Je retourne n fois 2.
+Créer une fonction nommée addition qui prend x et y.
+    Je retourne x plus y.
+Mets doubles à appliquer_parallele(nombres, double).
+Affiche doubles.
+Affiche " ".
+Affiche reduire_parallele(doubles, addition, 0).
+'''
+    print("Test Appliquer/Réduire en Parallèle (devrait afficher [2, 4, 6] 12):")
+    run_dav_code(code)
+    print()
+
+def test_budget():
+    """Test that an execution budget stops an infinite loop"""
+    code = '''
+J'ai un nombre appelé x.
+Tant que vrai:
+    Augmente x de 1.
+'''
+    print("Test Budget d'Exécution (devrait s'arrêter après 100 instructions):")
+    budget = ExecutionBudget(max_steps=100)
+    run_dav_code(code, budget)
+    print(f"x = {dav.variables['x']}")
+    print("Test Budget sur une Attente (devrait s'arrêter après 0.2s au lieu de 30s):")
+    run_dav_code("J'ai un canal appelé c.\nAttends 30 secondes.\nReçois de c dans x.\n", ExecutionBudget(timeout=0.2))
+    print()
+
+def test_actors():
+    """Test two actors that take turns and a third that waits on a channel"""
+    code = '''
+J'ai une liste appelée journal.
+J'ai un canal appelé boîte de capacité 1.
+Créer une fonction nommée ping qui prend n.
+    Ajoute "ping" à journal.
+    Cède la main.
+    Ajoute "ping" à journal.
+Créer une fonction nommée pong qui prend n.
+    Ajoute "pong" à journal.
+    Cède la main.
+    Ajoute "pong" à journal.
+Créer une fonction nommée lecteur qui prend n.
+    Reçois de boîte dans message.
+    Ajoute message à journal.
+Démarre l'acteur lecteur avec 0.
+Démarre l'acteur ping avec 0.
+Démarre l'acteur pong avec 0.
+Envoie "fin" à boîte.
+Exécute les acteurs.
+Affiche journal.
+'''
+    print("Test Acteurs (devrait afficher ['fin', 'ping', 'pong', 'ping', 'pong']):")
+    run_dav_code(code)
+    print()
+
 def test_debug_factorial():
     """Special debug test for factorial to see what's happening"""
     print("=== Test Debug Factorielle ===")
@@ -1266,11 +4068,72 @@ def main():
             test_list_access()
             test_string_manipulation()
             test_advanced_features()
+            test_text_builder()
+            test_file_lines()
+            test_appended_lines()
+            test_parallel_for()
+            test_parallel_rules()
+            test_tasks()
+            test_channels()
+            test_map_parallel()
+            test_budget()
+            test_actors()
+            test_imports()
+            test_snapshot()
+            test_cluster_messages()
+            test_native_functions()
+            test_hooks()
+            test_stats()
+            test_memory()
+            test_replay()
+            test_statement_grammar()
+            test_parsed_nodes()
+            test_flame_profile()
         elif sys.argv[1] == "--debug":
             test_debug_factorial()
+        elif sys.argv[1] == "--batch":
+            from dav_batch import main as batch_main
+            sys.exit(batch_main(sys.argv[1:]))
         else:
-            filename = sys.argv[1]
-            run_dav(filename)
+            # [--stats[=json]] [--memory[=threshold]] [--warnings] [--record|--replay session.json] [--prelude prelude.dav [--snapshot prelude.snapshot]] programme.dav
+            args, options, session, stats_style, memory = sys.argv[1:], {}, {}, None, None
+            while len(args) > 1 and args[0].startswith("--"):
+                if args[0] == "--warnings":
+                    dav.show_warnings = True
+                    args = args[1:]
+                elif args[0] in ("--stats", "--stats=table", "--stats=json"):
+                    stats_style = args[0].partition("=")[2] or 'table'
+                    args = args[1:]
+                elif args[0] == "--memory" or args[0].startswith("--memory="):
+                    memory = args[0].partition("=")[2]
+                    args = args[1:]
+                elif len(args) > 2 and args[0] in ("--prelude", "--snapshot"):
+                    options[args[0][2:]] = args[1]
+                    args = args[2:]
+                elif len(args) > 2 and args[0] in ("--record", "--replay"):
+                    session[args[0][2:]] = args[1]
+                    args = args[2:]
+                else:
+                    break
+            filename = args[0]
+            stats = enable_stats() if stats_style else None
+            if memory is not None:
+                import dav_memory
+                inspector = dav_memory.MemoryInspector(sys.modules[__name__], memory or None).start()
+            if session:
+                import dav_replay
+                session = dav_replay.start_session(sys.modules[__name__], program=filename, **session)
+            try:
+                run_dav(filename, **options)
+            finally:
+                if session:
+                    dav_replay.stop_session(session)
+            if memory is not None:
+                inspector.stop()
+                print(inspector.format(), file=sys.stderr)
+            if stats is not None:
+                disable_stats()
+                print(stats.format(stats_style), file=sys.stderr)
     else:
         # Interactive mode
         print("Interpréteur du Langage DAV Français - Version COMPLÈTEMENT Corrigée")
@@ -1289,6 +4152,27 @@ def main():
                     test_list_access()
                     test_string_manipulation()
                     test_advanced_features()
+                    test_text_builder()
+                    test_file_lines()
+                    test_appended_lines()
+                    test_parallel_for()
+                    test_parallel_rules()
+                    test_tasks()
+                    test_channels()
+                    test_map_parallel()
+                    test_budget()
+                    test_actors()
+                    test_imports()
+                    test_snapshot()
+                    test_cluster_messages()
+                    test_native_functions()
+                    test_hooks()
+                    test_stats()
+                    test_memory()
+                    test_replay()
+                    test_statement_grammar()
+                    test_parsed_nodes()
+                    test_flame_profile()
                 elif line.lower() == 'debug':
                     test_debug_factorial()
                 elif line.lower() == 'aide':
@@ -1347,7 +4231,7 @@ CORRECTIONS MAJEURES APPORTÉES:
             except KeyboardInterrupt:
                 break
             except Exception as e:
-                print(f"Erreur: {e}")
+                report_error(f"Erreur: {e}")
                 flush_output()
         
         print("Au revoir!")